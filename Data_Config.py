@@ -15,6 +15,7 @@ import duckdb
 import pandas as pd
 from datetime import datetime, timezone
 from dataset_config import DatasetConfig, get_default_config
+from metric_store import fetch_frame
 
 DB_NAME = "osis_strategic_archives.db"
 
@@ -61,7 +62,7 @@ def run_logic_audit(
         # ── STEP 2: Compute rolling Z-scores ─────────────────────────────────
         print(f"🔍 Step 2: Computing rolling {config.rolling_window}-period Z-scores...")
 
-        df = con.execute(f"""
+        df = fetch_frame(con, f"""
             WITH base AS (
                 SELECT
                     time_period,
@@ -97,7 +98,7 @@ def run_logic_audit(
             FROM base
             WHERE rolling_mean IS NOT NULL
               AND rolling_std  IS NOT NULL
-        """, [config.domain, config.metric_name, config.entity_filter]).df()
+        """, [config.domain, config.metric_name, config.entity_filter])
 
         print(f"   ✅ Computed Z-scores for {len(df):,} observations\n")
 
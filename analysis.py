@@ -1,12 +1,17 @@
 import json
-import duckdb
-import pandas as pd
 from datetime import datetime, timezone
+from pathlib import Path
 from dataset_config import DatasetConfig, get_default_config
+from tracing import span
 
 DB_NAME = "osis_strategic_archives.db"
 
-def run_logic_audit(config=None, export_json=True):
+def run_logic_audit(config=None, export_json=True, output_dir=".", as_of=None):
+    """
+    Rolling z-score audit of one entity. as_of (date or timestamp, UTC)
+    audits the series as it had been ingested at that moment, rebuilt from
+    metric_vintages, so later revisions of lagging weeks are not seen.
+    """
     if config is None:
         config = get_default_config()
     print("="*55)
@@ -15,27 +20,36 @@ def run_logic_audit(config=None, export_json=True):
     print(f"  Domain  : {config.domain}")
     print(f"  Metric  : {config.metric_name}")
     print(f"  Entity  : {config.entity_filter}")
+    if as_of is not None:
+        print(f"  As of   : {as_of}")
     print("="*55)
+    import duckdb  # lazy: keeps `import main` cheap for cached / --help runs
+    from metric_store import fetch_frame, series_sql
+    series, as_of_params = series_sql(as_of)
+    params = [config.domain, config.metric_name, config.entity_filter] + as_of_params
     con = duckdb.connect(DB_NAME, read_only=True)
     try:
-        count = con.execute("SELECT COUNT(*) FROM canonical_metrics WHERE domain=? AND metric_name=? AND state=?",
-            [config.domain, config.metric_name, config.entity_filter]).fetchone()[0]
+        with span("count_entity_rows", kind="duckdb"):
+            count = con.execute(f"SELECT COUNT(*) FROM {series}", params).fetchone()[0]
         if count == 0:
             available = con.execute("SELECT DISTINCT state FROM canonical_metrics WHERE domain=? AND metric_name=? LIMIT 10",
                 [config.domain, config.metric_name]).fetchall()
-            raise ValueError(f"No data for entity={config.entity_filter}. Available: {[r[0] for r in available]}")
+            when = f" as of {as_of}" if as_of is not None else ""
+            raise ValueError(f"No data for entity={config.entity_filter}{when}. Available: {[r[0] for r in available]}")
         print(f"Found {count} records for {config.entity_filter}")
-        df = con.execute(f"""
-            WITH base AS (
+        with span("rolling_zscores", kind="duckdb", rows_in=count) as sp:
+            df = fetch_frame(con, f"""
+                WITH base AS (
+                    SELECT time_period, metric_value, state,
+                    AVG(metric_value) OVER (PARTITION BY state ORDER BY time_period ROWS BETWEEN {config.rolling_window} PRECEDING AND 1 PRECEDING) AS rolling_mean,
+                    STDDEV(metric_value) OVER (PARTITION BY state ORDER BY time_period ROWS BETWEEN {config.rolling_window} PRECEDING AND 1 PRECEDING) AS rolling_std
+                    FROM {series} ORDER BY time_period)
                 SELECT time_period, metric_value, state,
-                AVG(metric_value) OVER (PARTITION BY state ORDER BY time_period ROWS BETWEEN {config.rolling_window} PRECEDING AND 1 PRECEDING) AS rolling_mean,
-                STDDEV(metric_value) OVER (PARTITION BY state ORDER BY time_period ROWS BETWEEN {config.rolling_window} PRECEDING AND 1 PRECEDING) AS rolling_std
-                FROM canonical_metrics WHERE domain=? AND metric_name=? AND state=? ORDER BY time_period)
-            SELECT time_period, metric_value, state,
-            ROUND(rolling_mean,2) AS rolling_mean, ROUND(rolling_std,2) AS rolling_std,
-            CASE WHEN rolling_std>0 THEN ROUND((metric_value-rolling_mean)/rolling_std,4) ELSE 0.0 END AS z_score
-            FROM base WHERE rolling_mean IS NOT NULL AND rolling_std IS NOT NULL
-        """, [config.domain, config.metric_name, config.entity_filter]).df()
+                ROUND(rolling_mean,2) AS rolling_mean, ROUND(rolling_std,2) AS rolling_std,
+                CASE WHEN rolling_std>0 THEN ROUND((metric_value-rolling_mean)/rolling_std,4) ELSE 0.0 END AS z_score
+                FROM base WHERE rolling_mean IS NOT NULL AND rolling_std IS NOT NULL
+            """, params)
+            sp.rows_out = len(df)
         def classify(z):
             az = abs(z)
             if az >= config.critical_threshold: return "CRITICAL"
@@ -66,12 +80,90 @@ def run_logic_audit(config=None, export_json=True):
                 "top_anomalies": [{"date": str(r["time_period"]), "value": float(r["metric_value"]), "z_score": float(r["z_score"]), "severity": str(r["severity"])} for _,r in anomalies.sort_values("z_score",ascending=False).head(5).iterrows()]
             }
         }
+        if as_of is not None:
+            fact_packet["as_of"] = str(as_of)
         if export_json:
-            with open("logic_output.json","w") as f: json.dump(fact_packet,f,indent=2)
-            print("Fact Packet saved -> logic_output.json")
+            out_path = Path(output_dir) / "logic_output.json"
+            with open(out_path,"w") as f: json.dump(fact_packet,f,indent=2)
+            print(f"Fact Packet saved -> {out_path}")
         return fact_packet
     except Exception as e:
         import traceback; traceback.print_exc()
         return {"status": "error", "message": str(e)}
     finally:
         con.close()
+
+def run_multi_entity_audit(config=None, entities=None, export_path=None):
+    """
+    Fact packets for every entity (or the given ones) in one pass:
+    {entity: fact_packet}. Payloads match run_logic_audit field for field,
+    so their hashes do too. export_path writes one packet per line (JSONL).
+    """
+    if config is None:
+        config = get_default_config()
+    import duckdb
+    from datetime import datetime as _dt, time as _time
+    rw, anomaly, critical = int(config.rolling_window), float(config.anomaly_threshold), float(config.critical_threshold)
+    entity_sql = "AND list_contains(?::VARCHAR[], state)" if entities else ""
+    params = [config.domain, config.metric_name] + ([list(entities)] if entities else [])
+    con = duckdb.connect(DB_NAME, read_only=True)
+    try:
+        with span("multi_entity_audit", kind="duckdb") as sp:
+            rows = con.execute(f"""
+                WITH base AS (
+                    SELECT time_period, metric_value, state,
+                    AVG(metric_value) OVER w AS rolling_mean, STDDEV(metric_value) OVER w AS rolling_std
+                    FROM canonical_metrics WHERE domain=? AND metric_name=? {entity_sql}
+                    WINDOW w AS (PARTITION BY state ORDER BY time_period ROWS BETWEEN {rw} PRECEDING AND 1 PRECEDING)),
+                scored AS (
+                    SELECT time_period, metric_value, state,
+                    ROUND(rolling_mean,2) AS rolling_mean, ROUND(rolling_std,2) AS rolling_std,
+                    CASE WHEN rolling_std>0 THEN ROUND((metric_value-rolling_mean)/rolling_std,4) ELSE 0.0 END AS z_score
+                    FROM base WHERE rolling_mean IS NOT NULL AND rolling_std IS NOT NULL)
+                SELECT state,
+                    arg_max({{'time_period': time_period, 'metric_value': metric_value, 'rolling_mean': rolling_mean,
+                              'rolling_std': rolling_std, 'z_score': z_score}}, time_period) AS latest,
+                    COUNT(*) AS n_obs,
+                    COUNT(*) FILTER (WHERE ABS(z_score) >= {anomaly}) AS n_anomalies,
+                    COUNT(*) FILTER (WHERE ABS(z_score) >= {critical}) AS n_critical,
+                    max_by({{'time_period': time_period, 'metric_value': metric_value, 'z_score': z_score}},
+                           z_score, 5) FILTER (WHERE ABS(z_score) >= {anomaly}) AS top_anomalies
+                FROM scored GROUP BY state ORDER BY state
+            """, params).fetchall()
+            sp.rows_out = len(rows)
+    finally:
+        con.close()
+
+    def classify(z):
+        az = abs(z)
+        if az >= config.critical_threshold: return "CRITICAL"
+        elif az >= config.anomaly_threshold: return "WARNING"
+        return "NORMAL"
+
+    def ts(d):   # run_logic_audit stringifies pandas Timestamps
+        return str(_dt.combine(d, _time()))
+
+    generated_at = datetime.now(timezone.utc).isoformat()
+    packets = {}
+    for state, latest, n_obs, n_anom, n_crit, top in rows:
+        severity = classify(latest["z_score"])
+        packets[state] = {
+            "status": "success",
+            "schema_version": config.schema_version,
+            "generated_at": generated_at,
+            "payload": {
+                "domain": config.domain,
+                "metric_name": config.metric_name,
+                "state": state,
+                "timestamp": ts(latest["time_period"]),
+                "observed_value": float(latest["metric_value"]),
+                "baseline_stats": {"rolling_mean": float(latest["rolling_mean"]), "rolling_std": float(latest["rolling_std"]), "window_periods": config.rolling_window, "total_observations": n_obs},
+                "analysis": {"z_score": float(latest["z_score"]), "anomaly_detected": severity != "NORMAL", "severity": severity, "total_anomalies_in_history": n_anom, "total_critical_in_history": n_crit},
+                "top_anomalies": [{"date": ts(a["time_period"]), "value": float(a["metric_value"]), "z_score": float(a["z_score"]), "severity": classify(a["z_score"])} for a in top or []]
+            }
+        }
+    if export_path:
+        with open(export_path, "w") as f:
+            for packet in packets.values():
+                f.write(json.dumps(packet) + "\n")
+    return packets
@@ -1,10 +1,11 @@
 import streamlit as st
 import json
-import subprocess
-import sys
+import time
 from pathlib import Path
-from dataset_config import get_default_config
 from conversation_agent import translate_query, contextualize
+from dashboard import POINT_BUDGET, query_series, timeseries_figure
+from query_engine import execute_query
+from glossary import load_glossary
 
 st.set_page_config(page_title="OSIS — Epistemic Truth Engine", layout="wide")
 
@@ -15,13 +16,85 @@ def load_registry():
         return [{"id":"cdc_mortality","label":"CDC NVSS Weekly Mortality","domain":"public_health","status":"active"}]
     return json.loads(p.read_text())["datasets"]
 
+@st.cache_data(max_entries=64)
+def _load_json_cached(path, mtime_ns):
+    try: return json.loads(Path(path).read_text())
+    except: return None
+
 def load_json(path):
+    """Parsed JSON, re-read only when the file's mtime changes."""
     p = Path(path)
     if p.exists():
-        try: return json.loads(p.read_text())
-        except: return None
+        return _load_json_cached(str(p), p.stat().st_mtime_ns)
     return None
 
+# ── Job queue ──────────────────────────────────────────────────────────────
+# Runs go through one shared job_queue.JobQueue: identical requests from any
+# session collapse into one job, finished jobs are reused while the data
+# version is unchanged, and the page polls per-stage progress instead of
+# blocking inside a spinner. A (dataset, entity, data version) that already
+# has a finished run is served from st.cache_data without touching the queue.
+POLL_S = 1.0
+
+@st.cache_resource
+def get_job_queue():
+    from job_queue import JobQueue
+    return JobQueue().start()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def run_analysis_cached(dataset_id, entity, data_version, use_llm=True):
+    """
+    Finished job for (dataset id, entity, data version). data_version is part
+    of the key only — a new ingest changes it. Raises LookupError while no run
+    exists; exceptions are not cached, so the next call looks again.
+    """
+    job = get_job_queue().finished(dataset_id, entity, use_llm, data_version)
+    if job is None:
+        raise LookupError(f"no finished run for {dataset_id}/{entity}")
+    return job
+
+def run_analysis(dataset_id, entity, skip_db=True, use_llm=True):
+    """Job id for the selection: a cached finished run on a hit, a queued job on a miss."""
+    import stage_cache
+    if skip_db:
+        cfg = resolve_config(dataset_id, entity)
+        try:
+            data_ver = stage_cache.data_version(cfg)
+        except Exception:
+            data_ver = None   # table missing or mid-ingest — let the queue decide
+        if data_ver:
+            try:
+                return run_analysis_cached(dataset_id, cfg.entity_filter, data_ver, use_llm)["job_id"]
+            except LookupError:
+                pass
+    return get_job_queue().submit(dataset_id, entity, use_llm=use_llm, refresh=not skip_db)
+
+def resolve_config(dataset_id, entity=None):
+    import fanout_runner
+    registry = fanout_runner.load_registry()
+    return fanout_runner.resolve_config(fanout_runner.Target(dataset_id, entity), registry)
+
+@st.cache_data(ttl=300)
+def list_entities(dataset_id):
+    import fanout_runner
+    try:
+        return fanout_runner.list_entities(resolve_config(dataset_id))
+    except Exception:
+        return []
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_series(dataset_id, entity, compare, version, grain=None):
+    """Downsampled series; `version` (the fact packet's generated_at) only keys the cache."""
+    return query_series(resolve_config(dataset_id, entity), entities=(entity, *compare), grain=grain)
+
+def render_progress(job):
+    progress = job.get("progress") or {}
+    finished = sum(1 for s in progress.values() if s not in ("pending", "running"))
+    st.progress(finished / max(len(progress), 1),
+                text=f"Job {job['job_id']} — {job['status']} ({finished}/{len(progress) or '?'} stages)")
+    icons = {"pending":"⏳","running":"🔄","ok":"✅","failed":"❌","skipped":"⏭️","cancelled":"🚫"}
+    st.caption("  ".join(f"{icons.get(state,'⚪')} {stage}" for stage, state in progress.items()))
+
 # ── Sidebar ────────────────────────────────────────────────────────────────
 with st.sidebar:
     st.title("⚔️ OSIS")
@@ -33,6 +106,9 @@ with st.sidebar:
     selected_label = st.selectbox("📊 Select Dataset", list(dataset_labels.keys()))
     selected_ds = dataset_labels[selected_label]
 
+    entities = list_entities(selected_ds["id"])
+    selected_entity = st.selectbox("📍 Entity", entities) if entities else None
+
     st.markdown(f"**Domain:** {selected_ds['domain']}")
     st.markdown(f"**Status:** {selected_ds['status']}")
     st.markdown("---")
@@ -42,11 +118,16 @@ with st.sidebar:
 
     if user_query:
         with st.spinner("Translating query..."):
-            structured = translate_query(user_query, datasets)
+            # selected dataset first — it is the default when the query names none
+            offered = [selected_ds] + [d for d in datasets if d["id"] != selected_ds["id"]]
+            structured = translate_query(user_query, offered, entities=entities or None)
         st.caption("🔄 Translated to structured query:")
         st.json(structured)
         if structured.get("ambiguous"):
             st.warning(f"Clarification needed: {structured.get('clarification_needed')}")
+        elif (selected_entity and structured.get("dataset_id") == selected_ds["id"]
+              and structured.get("entity_filter") in (None, "default")):
+            structured["entity_filter"] = selected_entity
 
     st.markdown("---")
     run_btn = st.button("▶ Run Analysis", type="primary", use_container_width=True)
@@ -57,27 +138,60 @@ with st.sidebar:
     explain_term = st.text_input("", placeholder="e.g. z-score, tamas, reporting lag", key="explain")
     if explain_term:
         st.info(contextualize(explain_term))
+        related = [e.term for e in load_glossary().complete(explain_term, k=6)]
+        if len(related) > 1:
+            st.caption("Also: " + ", ".join(related))
 
 # ── Main panel ─────────────────────────────────────────────────────────────
 st.title("OSIS — Organizational Strategy Intelligence System")
 st.caption("LLM = Vocal Cord Only | All reasoning is deterministic | Every claim is auditable")
 
+# ── Query result ───────────────────────────────────────────────────────────
+if user_query and not structured.get("ambiguous"):
+    st.subheader("🔎 Query Result")
+    try:
+        qr = execute_query(structured)
+        st.info(qr["answer"])
+        st.caption(f"{qr['dataset_id']} · {qr['entity']} · window {qr['time_filter']} · "
+                   f"{qr['source']} · {qr['elapsed_ms']:.1f} ms")
+        summary_cols = ["state", "as_of", "n_obs", "mean_value", "min_value", "max_value",
+                        "latest_value", "latest_z", "latest_severity", "n_anomalies", "n_critical"]
+        st.dataframe([{k: r.get(k) for k in summary_cols} for r in qr["rows"]], use_container_width=True)
+        worst = [{"state": r["state"], **a} for r in qr["rows"] for a in (r.get("top_anomalies") or [])]
+        if worst and qr["analysis_type"] != "forecast":
+            st.caption("Top anomalies in window")
+            st.dataframe(sorted(worst, key=lambda a: -abs(a["z_score"]))[:10], use_container_width=True)
+    except Exception as e:
+        st.warning(f"Query could not be executed: {type(e).__name__}: {e}")
+    st.markdown("---")
+
+queue = get_job_queue()
 if run_btn:
-    with st.spinner("Running OSIS pipeline..."):
-        cmd = [sys.executable, "main.py"]
-        if skip_db:
-            cmd.append("--skip-db")
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=".")
-    if result.returncode != 0:
-        st.error("Pipeline error:")
-        st.code(result.stderr)
-    else:
-        st.success("Pipeline complete")
+    try:
+        st.session_state["job_id"] = run_analysis(selected_ds["id"], selected_entity, skip_db=skip_db)
+    except Exception as e:
+        st.error(f"Could not queue run: {type(e).__name__}: {e}")
+
+job = queue.get(st.session_state["job_id"]) if st.session_state.get("job_id") else None
+if job and job["status"] in ("queued", "running"):
+    render_progress(job)
+    time.sleep(POLL_S)
+    st.rerun()
+elif job and job["status"] == "failed":
+    st.error("Pipeline error:")
+    st.code(job.get("error") or "unknown error")
+elif job and run_btn:
+    st.success(f"Pipeline complete — job {job['job_id']}")
 
 # ── Load outputs ───────────────────────────────────────────────────────────
-logic    = load_json("logic_output.json")
-forecast = load_json("forecast_output.json")
-chanakya = load_json("chanakya_output.json")
+# this session's job if it finished, else the latest shared result for the selection
+if not (job and job["status"] == "done"
+        and job["dataset_id"] == selected_ds["id"] and (not selected_entity or job["entity"] == selected_entity)):
+    job = queue.latest(selected_ds["id"], selected_entity)
+run_dir  = Path(job["run_dir"]) if job else Path(".")
+logic    = load_json(run_dir / "logic_output.json")
+forecast = load_json(run_dir / "forecast_output.json")
+chanakya = load_json(run_dir / "chanakya_output.json")
 
 if not logic:
     st.info("Select a dataset and click **Run Analysis** to begin.")
@@ -97,6 +211,25 @@ col2.metric("Severity", f"{sev_color} {sev}")
 col3.metric("Rolling Mean", f"{baseline.get('rolling_mean',0):,.0f}")
 col4.metric("Anomalies (total)", payload.get("total_anomalies","—"))
 
+# ── Row 1b: Observed series ────────────────────────────────────────────────
+st.markdown("---")
+st.subheader("📉 Observed Series")
+primary = payload.get("state") or selected_entity
+compare = st.multiselect("Compare with", [e for e in entities if e != primary], key="compare")
+resolution = st.radio("Resolution", ["week", "month", "quarter", "year"], horizontal=True, key="resolution")
+grain = None if resolution == "week" else resolution
+try:
+    series = load_series(selected_ds["id"], primary, tuple(compare), logic.get("generated_at"), grain)
+    st.plotly_chart(timeseries_figure(series, resolve_config(selected_ds["id"], primary), forecast, primary),
+                    use_container_width=True)
+    if grain:
+        st.caption(f"{len(series):,} {grain}ly means from period_rollups")
+    else:
+        st.caption(f"{len(series):,} points shown — M4 + anomaly downsampling in DuckDB, "
+                   f"≤{POINT_BUDGET:,} per entity")
+except Exception as e:
+    st.warning(f"Series chart unavailable: {e}")
+
 # ── Row 2: Chanakya urgency ────────────────────────────────────────────────
 if chanakya:
     urgency = chanakya.get("urgency","—")
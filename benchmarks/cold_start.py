@@ -0,0 +1,85 @@
+"""
+OSIS – Cold-start Benchmark
+============================
+Times fresh-interpreter starts and asserts a budget, so heavy imports that
+creep back into module load show up as a failing number.
+
+  1. `import main`                       — CLI startup before any work
+  2. `main.py --skip-db --no-llm`        — a quick re-run (stage cache warm)
+
+Each is run in a new subprocess REPEATS times; the median is compared with
+the budget. Exits 1 when any budget is exceeded or the pipeline run fails.
+
+pipeline_bench.py --cold-start folds the `import main` timing into the
+pipeline benchmark table and its stored baselines.
+
+Usage (from the repo root, after at least one ingest):
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --import-budget 0.4 --run-budget 2.5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_BUDGET_S = 0.35   # `import main` in a fresh interpreter
+RUN_BUDGET_S    = 3.0    # `main.py --skip-db --no-llm` with a warm stage cache
+REPEATS         = 5
+
+
+def time_cmd(args: list, repeats: int) -> tuple[float, int]:
+    """Median wall seconds over `repeats` fresh subprocesses, plus the last exit code."""
+    samples, code = [], 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, *args], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - t0)
+        code = proc.returncode
+    return statistics.median(samples), code
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_S)
+    parser.add_argument("--run-budget", type=float, default=RUN_BUDGET_S)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args()
+
+    print("="*55)
+    print("  OSIS Cold-start Benchmark")
+    print("="*55)
+
+    failures = []
+    imp, code = time_cmd(["-c", "import main"], args.repeats)
+    print(f"  import main            : {imp*1000:8.1f} ms  (budget {args.import_budget*1000:.0f} ms)")
+    if code != 0:
+        failures.append("import main failed")
+    elif imp > args.import_budget:
+        failures.append(f"import main {imp:.3f}s > {args.import_budget:.3f}s")
+
+    # Warm the stage cache once so the timed runs measure a quick re-run
+    subprocess.run([sys.executable, "main.py", "--skip-db", "--no-llm"], cwd=ROOT,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    run, code = time_cmd(["main.py", "--skip-db", "--no-llm"], args.repeats)
+    print(f"  --skip-db --no-llm run : {run*1000:8.1f} ms  (budget {args.run_budget*1000:.0f} ms)")
+    if code != 0:
+        failures.append(f"pipeline run exited {code}")
+    elif run > args.run_budget:
+        failures.append(f"pipeline run {run:.3f}s > {args.run_budget:.3f}s")
+
+    if failures:
+        print("\n  ❌ Budget exceeded: " + "; ".join(failures))
+        print("     Run `python main.py --startup-report` to see which imports regressed.")
+        return 1
+    print("\n  ✅ Within cold-start budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""
+OSIS – Pipeline Benchmark Suite
+================================
+Times every hot path of the pipeline on synthetic data at several scales and
+compares the best-of-N timings with stored baselines, so regressions show up as
+numbers rather than impressions.
+
+    ingest          database_init.initialize_osis_db (CSV → canonical_metrics,
+                    window + period rollups, precedent windows)
+    audit_entity    analysis.run_logic_audit for one entity
+    audit_all       analysis.run_multi_entity_audit over every entity
+    forecast        forecast_agent.run_forecast_agent (skipped and reported when the
+                    agent does not succeed, e.g. Prophet is not installed)
+    briefs_batch    summarization.generate_batch_briefs for every entity
+    firewall_x1000  narration_firewall.run_full_firewall, 1000 narrations
+    citta_x50       citta.append_memory, 50 writes
+    dashboard       dashboard.query_series, 5 entities, M4-downsampled
+    dashboard_year  dashboard.query_series, 5 entities, yearly from period_rollups
+    query_rollup    query_engine.execute_query against window_rollups
+    precedents      precedent_index.find_precedents (warm index)
+    import_main     cold `import main` in a fresh interpreter (--cold-start,
+                    from cold_start.py)
+
+Every benchmark gets one untimed warm-up call. A fixed calibration workload
+is timed alongside the suite, and ratios are normalized by the machine's
+speed relative to when the baselines were recorded.
+
+Each scale runs in a throwaway working directory, so the repo's own
+archives, Citta database and caches are never touched. Data comes from
+synthetic_data.generate with a fixed seed, so every run measures the same
+input.
+
+Usage (from the repo root):
+    python benchmarks/pipeline_bench.py                      # small + medium vs baselines
+    python benchmarks/pipeline_bench.py --scales small medium large --cold-start
+    python benchmarks/pipeline_bench.py --save               # record new baselines
+
+Exits 1 when any benchmark is slower than REGRESSION_RATIO × its baseline.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+BASELINE_FILE    = Path(__file__).resolve().parent / "baselines.json"
+SCALES           = {"small": (10, 104), "medium": (50, 260), "large": (200, 520)}   # entities × weeks
+DEFAULT_SCALES   = ("small", "medium")
+REPEATS          = 5
+REGRESSION_RATIO = 1.5
+NOISE_FLOOR_MS   = 2.0      # sub-floor timings never count as regressions
+SEED             = 7
+
+
+def timed(fn, repeats: int, warmup: bool = True) -> float:
+    """
+    Best-of-repeats wall milliseconds of fn(), agents' console output suppressed.
+    The minimum (as timeit recommends) tracks the code's cost; means and
+    medians mostly track whatever else the machine was doing.
+    """
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        if warmup:
+            fn()   # first-call imports and DuckDB catalog loads are not what we are tracking
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return round(min(samples), 2)
+
+
+def calibrate(repeats: int = 7) -> float:
+    """
+    Fixed mixed workload (Python loop, NumPy, DuckDB). Ratios are divided by
+    this run's calibration ratio, so a uniformly slower or busier machine
+    does not read as a regression.
+    """
+    import duckdb
+    import numpy as np
+    con = duckdb.connect()
+
+    def work():
+        sum(i * i for i in range(200_000))
+        a = np.random.default_rng(0).random((300, 300))
+        a @ a
+        con.execute("SELECT SUM(range * 2) FROM range(2000000)").fetchone()
+    try:
+        return timed(work, repeats)
+    finally:
+        con.close()
+
+
+def run_scale(scale: str, repeats: int) -> dict:
+    import analysis
+    import citta
+    import dashboard
+    import database_init
+    import forecast_agent
+    import precedent_index
+    import query_engine
+    import summarization
+    import synthetic_data
+    from narration_firewall import run_full_firewall
+
+    n_entities, n_weeks = SCALES[scale]
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"osis_bench_{scale}_") as ws:
+        os.chdir(ws)
+        try:
+            rows, _ = synthetic_data.generate(n_entities, n_weeks, seed=SEED)
+            cfg = synthetic_data.synthetic_config(synthetic_data.write(rows, "synthetic.csv"))
+            entity = synthetic_data.entity_names(n_entities)[0]
+            one = replace(cfg, entity_filter=entity)
+
+            # ingest rebuilds canonical_metrics; the warm-up builds precedent windows, timed runs are incremental
+            results["ingest"] = timed(lambda: database_init.initialize_osis_db(replace(cfg)), max(1, repeats // 2))
+            results["audit_entity"] = timed(lambda: analysis.run_logic_audit(one, export_json=False), repeats)
+            results["audit_all"] = timed(lambda: analysis.run_multi_entity_audit(cfg), repeats)
+            # only a real fit is worth timing; the "Prophet not installed" early return is not
+            with contextlib.redirect_stdout(io.StringIO()):
+                probe = forecast_agent.run_forecast_agent(one, output_dir=ws)   # doubles as the warm-up
+            if probe.get("status") == "success":
+                results["forecast"] = timed(lambda: forecast_agent.run_forecast_agent(one, output_dir=ws),
+                                            max(1, repeats // 2), warmup=False)
+            else:
+                print(f"    forecast skipped — {probe.get('message') or probe.get('status')}")
+
+            packets = analysis.run_multi_entity_audit(cfg)
+            results["briefs_batch"] = timed(lambda: summarization.generate_batch_briefs(packets, output_file=None), repeats)
+
+            proof = {"urgency": "CRITICAL", "justification_block": {
+                "pratijna": "The 4.31sigma drop in weekly_deaths_all_cause is reporting lag",
+                "hetu": "Z-score -4.3100 (CRITICAL). Rolling mean: 51,351 over 4 periods.",
+                "nigamana": "Therefore: do not act until the reporting pipeline is validated."}}
+            text = ("Analysis shows a CRITICAL reporting lag in weekly deaths. "
+                    "Validate the reporting pipeline before acting; reassess when the data matures.")
+            results["firewall_x1000"] = timed(lambda: [run_full_firewall(text, proof) for _ in range(1000)], repeats)
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                citta.init_citta()
+            results["citta_x50"] = timed(lambda: [citta.append_memory(
+                "bench", cfg.domain, cfg.metric_name, entity, "1.0", "in", "out", "PASSED", "SATTVA",
+                urgency="LOW", z_score=0.5, severity="NORMAL") for _ in range(50)], repeats)
+
+            series_entities = synthetic_data.entity_names(min(5, n_entities))
+            results["dashboard"] = timed(lambda: dashboard.query_series(one, entities=series_entities), repeats)
+            results["dashboard_year"] = timed(lambda: dashboard.query_series(one, entities=series_entities,
+                                                                             grain="year"), repeats)
+            results["query_rollup"] = timed(lambda: query_engine.execute_query(
+                {"dataset_id": "synthetic", "entity_filter": entity, "time_filter": "1y", "analysis_type": "anomaly"},
+                config=one, registry={"synthetic": {}}), repeats)
+
+            latest = packets[entity]["payload"]
+            find = lambda: precedent_index.find_precedents(cfg.domain, cfg.metric_name, entity, latest["timestamp"],
+                                                           latest["analysis"]["z_score"],
+                                                           anomaly_threshold=cfg.anomaly_threshold)
+            find()   # build the in-memory index once; the benchmark is the lookup
+            results["precedents"] = timed(find, repeats)
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def load_baselines() -> dict:
+    try:
+        return json.loads(BASELINE_FILE.read_text())
+    except (OSError, ValueError):
+        return {"results": {}}
+
+
+def save_baselines(results: dict, calibration: float) -> None:
+    """Replace the measured scales' baselines; a benchmark skipped this run loses its stale entry."""
+    baselines = load_baselines()
+    baselines["calibration_ms"] = calibration
+    for scale, benches in results.items():
+        baselines["results"][scale] = dict(benches)
+    baselines["updated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    baselines["machine"] = {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()}
+    BASELINE_FILE.write_text(json.dumps(baselines, indent=2) + "\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="OSIS pipeline benchmarks")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(DEFAULT_SCALES))
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--cold-start", action="store_true", help="also time a fresh `import main`")
+    parser.add_argument("--save", action="store_true", help="write these results as the new baselines")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args()
+
+    print("="*72)
+    print("  OSIS Pipeline Benchmarks")
+    print("="*72)
+    calibration = calibrate()
+    print(f"  calibration: {calibration:.2f} ms")
+    results = {}
+    for scale in args.scales:
+        n_entities, n_weeks = SCALES[scale]
+        print(f"  {scale}: {n_entities} entities × {n_weeks} weeks ...", flush=True)
+        results[scale] = run_scale(scale, args.repeats)
+    if args.cold_start:
+        from cold_start import time_cmd
+        median_s, code = time_cmd(["-c", "import main"], args.repeats)   # fresh interpreters: no warm-up
+        if code == 0:
+            results["startup"] = {"import_main": round(median_s * 1000, 2)}
+
+    stored = load_baselines()
+    baseline = stored["results"]
+    speed = calibration / stored["calibration_ms"] if stored.get("calibration_ms") else 1.0
+    regressions = []
+    print(f"  machine speed vs baseline: {speed:.2f}× time (ratios below are normalized)")
+    print(f"\n  {'scale':<8} {'benchmark':<16} {'best ms':>11} {'baseline':>10} {'ratio':>7}")
+    for scale, benches in results.items():
+        for name, ms in benches.items():
+            base = baseline.get(scale, {}).get(name)
+            ratio = ms / base / speed if base else None
+            flag = ""
+            if ratio and ratio > args.ratio and ms > NOISE_FLOOR_MS:
+                flag = "  ❌ regression"
+                regressions.append(f"{scale}/{name} {ratio:.2f}×")
+            print(f"  {scale:<8} {name:<16} {ms:>11.2f} {base if base is not None else '-':>10} "
+                  f"{f'{ratio:.2f}×' if ratio else '-':>7}{flag}")
+
+    if args.save:
+        save_baselines(results, calibration)
+        print(f"\n  Baselines saved → {BASELINE_FILE.relative_to(ROOT)}")
+        return 0
+    if regressions:
+        print(f"\n  ❌ Slower than {args.ratio}× baseline: " + ", ".join(regressions))
+        return 1
+    print("\n  ✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
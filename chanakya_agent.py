@@ -1,8 +1,10 @@
 
-import json, hashlib
+import json, hashlib, dataclasses
 from datetime import datetime, timezone
 from pathlib import Path
 from dataset_config import DatasetConfig, get_default_config
+from prompt_builder import PromptSpec, build_prompt, timed
+from tracing import span
 
 URGENCY_MATRIX = {
     ("CRITICAL","increasing"):"CRITICAL",("CRITICAL","decreasing"):"HIGH",
@@ -22,12 +24,12 @@ POLICY_SIGNALS = {
     ("_default","flag_normal"):{"primary":"Normal parameters — continue monitoring.","secondary":"No action required.","resource":"No resource action.","escalate":False},
 }
 
-def load_inputs():
-    for f in ["logic_output.json","forecast_output.json"]:
-        if not Path(f).exists():
-            raise FileNotFoundError(f"{f} not found — run pipeline first")
-    with open("logic_output.json") as f: logic = json.load(f)
-    with open("forecast_output.json") as f: forecast = json.load(f)
+def load_inputs(output_dir="."):
+    for name in ["logic_output.json","forecast_output.json"]:
+        if not (Path(output_dir) / name).exists():
+            raise FileNotFoundError(f"{name} not found in {output_dir} — run pipeline first")
+    with open(Path(output_dir) / "logic_output.json") as f: logic = json.load(f)
+    with open(Path(output_dir) / "forecast_output.json") as f: forecast = json.load(f)
     return logic, forecast
 
 def determine_urgency(severity, direction):
@@ -36,58 +38,115 @@ def determine_urgency(severity, direction):
 def get_policy_signals(domain, action):
     return POLICY_SIGNALS.get((domain,action), POLICY_SIGNALS.get(("_default",action), {"primary":"Anomaly detected — investigate.","secondary":"Consult domain expert.","resource":"No action defined.","escalate":False}))
 
-def build_pancavayava(z_score, severity, action, interpretation, hetu, domain, metric, timestamp):
+def find_udaharana(config, payload):
+    """Nearest historical windows from precedent_index; [] when the index is unavailable."""
+    try:
+        from precedent_index import find_precedents
+        return [{"entity": p["state"], "time_period": str(p["time_period"])[:10], "z_score": p["z_score"],
+                 "observed": p["metric_value"], "rolling_mean": p["rolling_mean"],
+                 "trend_pct": round(p["trend"] * 100, 1), "distance": p["distance"]}
+                for p in find_precedents(payload["domain"], payload["metric_name"], payload.get("state"),
+                                         payload["timestamp"], payload["analysis"]["z_score"],
+                                         observed=payload.get("observed_value"),
+                                         rolling_mean=payload.get("baseline_stats", {}).get("rolling_mean"),
+                                         anomaly_threshold=config.anomaly_threshold)]
+    except Exception as e:
+        print(f"  Udāharaṇa: precedent index unavailable ({str(e)[:60]})")
+        return []
+
+def build_pancavayava(z_score, severity, action, interpretation, hetu, domain, metric, timestamp, precedents=None):
     abs_z = abs(z_score)
     direction = "drop" if z_score < 0 else "spike"
+    if precedents:
+        cited = "; ".join(f"{p['entity']} {p['time_period']} (z={p['z_score']:+.2f}, baseline trend {p['trend_pct']:+.1f}%)"
+                          for p in precedents)
+        udaharana = f"Historical precedent: the {len(precedents)} nearest past {domain} episodes are {cited}."
+    else:
+        udaharana = f"Historical precedent: prior {severity} events in {domain} with similar Z-scores matched this classification."
     return {
         "pratijna": f"The {abs_z:.2f}sigma {direction} in {metric} on {timestamp[:10]} is: {interpretation}",
         "hetu": hetu or f"Z-score of {z_score:.4f} exceeds {severity} threshold.",
-        "udaharana": f"Historical precedent: prior {severity} events in {domain} with similar Z-scores matched this classification.",
+        "udaharana": udaharana,
         "upanaya": f"Current observation ({abs_z:.2f}sigma {direction}) matches the historical pattern for {action.replace('_',' ')}.",
         "nigamana": f"Therefore: {interpretation} Confidence grounded in deterministic analysis, not LLM inference.",
     }
 
-def narration_firewall(text, data):
-    forbidden = ["because of","due to the fact","research shows","studies indicate","it is likely that","this implies","i recommend","i suggest","it appears","this could indicate"]
-    tl = text.lower()
-    for p in forbidden:
-        if p in tl:
-            return False, f"REJECTED: forbidden pattern '{p}'"
-    if len(text.split()) > 150:
-        return False, f"REJECTED: too long ({len(text.split())} words)"
-    return True, "PASSED"
-
-def narrate(render_request, chanakya_data):
+NARRATE_INSTRUCTION = ("Render this validated strategic analysis as professional prose, max 120 words. "
+                       "You are a speech synthesizer, not a reasoning engine: do not add, modify or invent "
+                       "causal claims.")
+NARRATE_SPEC = PromptSpec(
+    instruction=NARRATE_INSTRUCTION,
+    fields=(("urgency", "urgency"), ("severity", "finding.severity"), ("z_score", "finding.z_score"),
+            ("claim", "justification.pratijna"), ("conclusion", "justification.nigamana"),
+            ("actions", "recommendations.action"), ("reason", "justification.hetu"),
+            ("forecast", "finding.forecast_direction"), ("forecast_pct", "finding.forecast_pct"),
+            ("precedent", "justification.udaharana"), ("application", "justification.upanaya"),
+            ("system_state", "finding.systemic_state")),
+    required=("urgency", "severity", "z_score", "claim", "conclusion"),
+    suffix="PROSE:",
+)
+STRICTER_NOTE = " Use only the words and numbers given below; no speculation."
+
+def render_request_for(chanakya_data):
+    return {"render_request":{"mode":"executive_brief","instruction":"Render the following validated strategic analysis into professional prose. You are a speech synthesizer not a reasoning engine. Do NOT add modify or invent any causal claims not present in this JSON. Max 120 words.","finding":chanakya_data["finding"],"urgency":chanakya_data["urgency"],"recommendations":chanakya_data["recommendations"],"justification":chanakya_data["justification_block"]}}
+
+def legacy_prompt(render_request):
+    """The pre-compaction prompt — kept only to report what compaction saves."""
+    rr = render_request["render_request"]
+    return rr["instruction"] + "\n\nVALIDATED ANALYSIS:\n" + json.dumps(rr, indent=2) + "\n\nRENDER AS PROSE (max 120 words):"
+
+def render_narration(render_request, stricter=False, budget=None, timeout=120):
+    """One Ollama generation over the compact prompt → (text or None, PromptStats). Raises on transport errors."""
+    import requests
+    spec = NARRATE_SPEC if not stricter else dataclasses.replace(NARRATE_SPEC, instruction=NARRATE_INSTRUCTION + STRICTER_NOTE)
+    prompt, stats = build_prompt(spec, render_request["render_request"], budget=budget,
+                                 baseline=legacy_prompt(render_request))
+    with span("ollama_narrate", kind="llm", model="phi3:mini", payload_bytes=len(prompt)) as sp:
+        with timed(stats):
+            r = requests.post("http://127.0.0.1:11434/api/generate", json={"model":"phi3:mini","prompt":prompt,"stream":False,"options":{"temperature":0.1,"num_predict":200}}, timeout=timeout)
+        body = r.json()
+        stats.eval_tokens = body.get("prompt_eval_count")
+        sp.attrs.update(response_bytes=len(r.content), prompt_tokens=stats.prompt_tokens,
+                        baseline_tokens=stats.baseline_tokens, eval_tokens=stats.eval_tokens,
+                        latency_ms=stats.latency_ms)
+    return body.get("response","").strip() or None, stats
+
+def narrate(chanakya_data):
+    """
+    (text or None, firewall message, PromptStats or None). Goes through
+    llm_scheduler like batch narration: queued behind more urgent requests,
+    and a shed, expired or failed request yields narrate_with_budget's
+    deterministic fallback rather than no narration.
+    """
     try:
         import requests
         requests.get("http://127.0.0.1:11434/", timeout=3)
     except:
-        return None, "SKIPPED — Ollama unavailable"
+        return None, "SKIPPED — Ollama unavailable", None
     try:
-        import requests
-        rr = render_request["render_request"]
-        prompt = rr["instruction"] + "\n\nVALIDATED ANALYSIS:\n" + json.dumps(rr, indent=2) + "\n\nRENDER AS PROSE (max 120 words):"
-        r = requests.post("http://127.0.0.1:11434/api/generate", json={"model":"phi3:mini","prompt":prompt,"stream":False,"options":{"temperature":0.1}}, timeout=120)
-        text = r.json().get("response","").strip()
-        if not text: return None, "SKIPPED — empty response"
-        passed, msg = narration_firewall(text, chanakya_data)
-        return (text if passed else None), msg
+        from llm_scheduler import schedule_narration
+        stats = []
+        ticket = schedule_narration(chanakya_data, stats=stats)
+        text, msg = ticket.result() or (None, f"ERROR: {ticket.error or 'no fallback'}")
+        if ticket.status != "done":
+            msg = f"{msg} (narration {ticket.status}{': ' + ticket.error if ticket.error else ''})"
+        return text, msg, (stats[-1] if stats else None)
     except Exception as e:
-        return None, f"ERROR: {str(e)[:60]}"
+        return None, f"ERROR: {str(e)[:60]}", None
 
 def derive_guna(z_score, action):
     if "lag" in action or "reporting" in action: return "TAMAS"
     elif abs(z_score) > 2.0: return "RAJAS"
     return "SATTVA"
 
-def run_chanakya_agent(config=None):
+def run_chanakya_agent(config=None, output_dir="."):
     if config is None: config = get_default_config()
     print("="*55)
     print("  OSIS Chanakya Layer — Mimamsa Minister v1.0")
     print("="*55)
     print(f"  LLM role: VOCAL CORD ONLY — narration not reasoning")
 
-    logic, forecast = load_inputs()
+    logic, forecast = load_inputs(output_dir)
     payload = logic["payload"]
     analysis = payload["analysis"]
     z_score = analysis["z_score"]
@@ -105,7 +164,9 @@ def run_chanakya_agent(config=None):
     signals = get_policy_signals(domain, sutra_action)
 
     hetu = f"Z-score {z_score:.4f} ({severity}). Rolling mean: {baseline.get('rolling_mean',0):,.0f} over {baseline.get('window_periods',4)} periods."
-    justification = build_pancavayava(z_score, severity, sutra_action, sutra_interp, hetu, domain, metric, timestamp)
+    precedents = find_udaharana(config, payload)
+    justification = build_pancavayava(z_score, severity, sutra_action, sutra_interp, hetu, domain, metric, timestamp,
+                                      precedents=precedents)
 
     recs = [
         {"priority":1,"action":signals["primary"],"category":"immediate","escalate":signals["escalate"]},
@@ -122,26 +183,30 @@ def run_chanakya_agent(config=None):
         "domain":domain,"metric_name":metric,"entity_filter":config.entity_filter,
         "finding":{"z_score":z_score,"severity":severity,"forecast_direction":trend_dir,"forecast_pct":pct_chg,"systemic_state":derive_guna(z_score,sutra_action)},
         "urgency":urgency,"sutra_applied":{"action":sutra_action,"interpretation":sutra_interp},
-        "recommendations":recs,"justification_block":justification,"pancavayava_complete":True,"escalate":signals["escalate"],
+        "recommendations":recs,"justification_block":justification,"precedents":precedents,"pancavayava_complete":True,"escalate":signals["escalate"],
         "narration":None,"narration_firewall":None,
     }
 
-    render_req = {"render_request":{"mode":"executive_brief","instruction":"Render the following validated strategic analysis into professional prose. You are a speech synthesizer not a reasoning engine. Do NOT add modify or invent any causal claims not present in this JSON. Max 120 words.","finding":output["finding"],"urgency":urgency,"recommendations":recs,"justification":justification}}
-    narration, fw_result = narrate(render_req, output)
+    narration, fw_result, prompt_stats = narrate(output)
     output["narration"] = narration
     output["narration_firewall"] = fw_result
+    output["narration_prompt"] = prompt_stats.to_dict() if prompt_stats else None
 
     payload_hash = hashlib.sha256(json.dumps(output, sort_keys=True, default=str).encode()).hexdigest()
     output["payload_hash"] = payload_hash
 
-    with open("chanakya_output.json","w") as f: json.dump(output, f, indent=2)
+    out_path = Path(output_dir) / "chanakya_output.json"
+    with open(out_path,"w") as f: json.dump(output, f, indent=2)
 
     print(f"  Urgency:   {urgency}")
     print(f"  Escalate:  {signals['escalate']}")
     print(f"  Guṇa:      {output['finding']['systemic_state']}")
+    print(f"  Udāharaṇa: {len(precedents)} precedents cited")
     print(f"  Firewall:  {fw_result}")
+    if prompt_stats:
+        print(f"  Prompt:    {prompt_stats.prompt_tokens} tokens (was {prompt_stats.baseline_tokens}), {prompt_stats.latency_ms} ms")
     print(f"  Hash:      {payload_hash[:16]}...")
-    print(f"  Saved  ->  chanakya_output.json")
+    print(f"  Saved  ->  {out_path}")
     return output
 
 if __name__ == "__main__":
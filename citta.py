@@ -1,18 +1,25 @@
 
-import json, hashlib
-try:
-    import duckdb
-    CITTA_AVAILABLE = True
-except ImportError:
-    duckdb = None
-    CITTA_AVAILABLE = False
-from datetime import datetime, timezone
+import json, hashlib, os, shutil
+import importlib.util
+# duckdb is imported on first connection, not at module load (see _connect)
+CITTA_AVAILABLE = importlib.util.find_spec("duckdb") is not None
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 DB_PATH = "osis.db"
+ARCHIVE_DIR = "citta_archive"
+RETENTION_DAYS = 90          # rows older than this leave the hot database
+ARCHIVED_TABLES = ("agent_memory", "narration_log", "trace_spans")
+ARCHIVE_KEYS = {"agent_memory": ("id",), "narration_log": ("id",),
+                "trace_spans": ("run_id", "span_id")}
+STAGING = "_staging"            # per-table dir for Parquet not yet committed to the archive
+
+def _connect():
+    import duckdb
+    return duckdb.connect(DB_PATH)
 
 def init_citta():
-    con = duckdb.connect(DB_PATH)
+    con = _connect()
     con.execute("""
         CREATE TABLE IF NOT EXISTS agent_memory (
             id            VARCHAR DEFAULT gen_random_uuid(),
@@ -44,9 +51,12 @@ def init_citta():
             unmapped_streak INTEGER DEFAULT 0,
             last_seen_ts  TIMESTAMP,
             last_z_score  DOUBLE,
-            guna_state    VARCHAR DEFAULT 'UNMAPPED'
+            guna_state    VARCHAR DEFAULT 'UNMAPPED',
+            last_period   VARCHAR
         )
     """)
+    # last_period: the observation the streak last counted; re-runs over it are not new evidence
+    con.execute("ALTER TABLE sutra_streak ADD COLUMN IF NOT EXISTS last_period VARCHAR")
     con.execute("""
         CREATE TABLE IF NOT EXISTS narration_log (
             id            VARCHAR DEFAULT gen_random_uuid(),
@@ -59,8 +69,25 @@ def init_citta():
             word_count    INTEGER
         )
     """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS trace_spans (
+            run_id        VARCHAR,
+            span_id       VARCHAR,
+            parent_id     VARCHAR,
+            execution_ts  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            domain        VARCHAR,
+            name          VARCHAR,
+            kind          VARCHAR,
+            wall_ms       DOUBLE,
+            cpu_ms        DOUBLE,
+            rows_in       BIGINT,
+            rows_out      BIGINT,
+            payload_bytes BIGINT,
+            error         VARCHAR
+        )
+    """)
     con.close()
-    print("Citta v1.0 initialized — agent_memory, sutra_streak, narration_log tables ready")
+    print("Citta v1.0 initialized — agent_memory, sutra_streak, narration_log, trace_spans tables ready")
 
 def append_memory(agent_id, domain, metric, entity, schema_version,
                   input_hash, output_hash, tarka_result, guna_state,
@@ -68,7 +95,7 @@ def append_memory(agent_id, domain, metric, entity, schema_version,
                   anomalies_found=None, escalate=False,
                   sutra_action=None, pancavayava_complete=False,
                   execution_ms=None, notes=None):
-    con = duckdb.connect(DB_PATH)
+    con = _connect()
     con.execute("""
         INSERT INTO agent_memory (
             agent_id, domain, metric_name, entity_filter, schema_version,
@@ -83,7 +110,7 @@ def append_memory(agent_id, domain, metric, entity, schema_version,
     con.close()
 
 def log_narration(agent_id, domain, proof_hash, narration, firewall_result):
-    con = duckdb.connect(DB_PATH)
+    con = _connect()
     con.execute("""
         INSERT INTO narration_log (agent_id, domain, proof_hash, narration, firewall_result, word_count)
         VALUES (?,?,?,?,?,?)
@@ -91,42 +118,244 @@ def log_narration(agent_id, domain, proof_hash, narration, firewall_result):
           len(narration.split()) if narration else 0])
     con.close()
 
+def log_spans(run_id, domain, spans):
+    """Persist one run's tracing spans (tracing.Span objects) so stage timings trend across runs."""
+    if not spans:
+        return 0
+    con = _connect()
+    con.executemany("""
+        INSERT INTO trace_spans (run_id, span_id, parent_id, domain, name, kind,
+                                 wall_ms, cpu_ms, rows_in, rows_out, payload_bytes, error)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+    """, [[run_id, s.span_id, s.parent_id, domain, s.name, s.kind, s.wall_ms, s.cpu_ms,
+           s.rows_in, s.rows_out, s.payload_bytes, s.error] for s in spans])
+    con.close()
+    return len(spans)
+
+def span_trend(name, kind="stage", limit=20):
+    """Recent wall/CPU timings for one span name, newest first — for regression spotting."""
+    con = _connect()
+    rows = con.execute("""
+        SELECT run_id, MIN(execution_ts) AS ts, SUM(wall_ms), SUM(cpu_ms), SUM(rows_out)
+        FROM trace_spans WHERE name=? AND kind=?
+        GROUP BY run_id ORDER BY ts DESC LIMIT ?
+    """, [name, kind, int(limit)]).fetchall()
+    con.close()
+    return rows
+
 def get_streak(metric_key):
-    con = duckdb.connect(DB_PATH)
+    con = _connect()
     row = con.execute("SELECT unmapped_streak FROM sutra_streak WHERE metric_key=?", [metric_key]).fetchone()
     con.close()
     return row[0] if row else 0
 
-def update_streak(metric_key, domain, z_score, increment=True):
-    con = duckdb.connect(DB_PATH)
-    existing = con.execute("SELECT unmapped_streak FROM sutra_streak WHERE metric_key=?", [metric_key]).fetchone()
+def update_streak(metric_key, domain, z_score, increment=True, period=None):
+    """
+    Advance one metric's streak. period identifies the observation (the fact
+    packet's timestamp); a second call for the period the streak already
+    counted leaves it unchanged, so re-runs over the same data never escalate.
+    """
+    con = _connect()
+    existing = con.execute("SELECT unmapped_streak, guna_state, last_period FROM sutra_streak WHERE metric_key=?",
+                           [metric_key]).fetchone()
     now = datetime.now(timezone.utc)
-    if increment:
+    if existing and period is not None and existing[2] == str(period):
+        new_streak, guna = existing[0], existing[1]
+    elif increment:
         new_streak = (existing[0] + 1) if existing else 1
         guna = "RAJAS" if new_streak >= 3 else "UNMAPPED"
     else:
         new_streak = 0
         guna = "SATTVA"
+    period = None if period is None else str(period)
     if existing:
-        con.execute("UPDATE sutra_streak SET unmapped_streak=?, last_seen_ts=?, last_z_score=?, guna_state=? WHERE metric_key=?",
-                    [new_streak, now, z_score, guna, metric_key])
+        con.execute("UPDATE sutra_streak SET unmapped_streak=?, last_seen_ts=?, last_z_score=?, guna_state=?, "
+                    "last_period=COALESCE(?, last_period) WHERE metric_key=?",
+                    [new_streak, now, z_score, guna, period, metric_key])
     else:
-        con.execute("INSERT INTO sutra_streak (metric_key, domain, unmapped_streak, last_seen_ts, last_z_score, guna_state) VALUES (?,?,?,?,?,?)",
-                    [metric_key, domain, new_streak, now, z_score, guna])
+        con.execute("INSERT INTO sutra_streak (metric_key, domain, unmapped_streak, last_seen_ts, last_z_score, guna_state, last_period) VALUES (?,?,?,?,?,?,?)",
+                    [metric_key, domain, new_streak, now, z_score, guna, period])
     con.close()
     return new_streak, guna
 
-def query_memory(agent_id=None, domain=None, limit=20):
-    con = duckdb.connect(DB_PATH)
+def update_streaks(observations, domain, rajas_threshold=3):
+    """
+    Batch form of update_streak for a whole set of metric keys.
+    observations: iterable of (metric_key, z_score, increment[, period]).
+    A key whose period equals the one its streak last counted is left as is.
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE inside one transaction —
+    streak arithmetic happens in SQL, so there is no read-modify-write race.
+    Returns {metric_key: (streak, guna_state)}.
+    """
+    keys, z_scores, increments, periods = [], [], [], []
+    for metric_key, z_score, increment, *period in observations:
+        keys.append(metric_key)
+        z_scores.append(z_score)
+        increments.append(bool(increment))
+        periods.append(str(period[0]) if period and period[0] is not None else None)
+    if not keys:
+        return {}
+    if len(set(keys)) != len(keys):
+        raise ValueError("update_streaks: duplicate metric_key in batch — one observation per key per period")
+    now = datetime.now(timezone.utc)
+    con = _connect()
+    try:
+        con.begin()
+        rows = con.execute("""
+            INSERT INTO sutra_streak (metric_key, domain, unmapped_streak, last_seen_ts, last_z_score,
+                                      guna_state, last_period)
+            SELECT metric_key, ?,
+                   CASE WHEN increment THEN 1 ELSE 0 END,
+                   ?, z_score,
+                   CASE WHEN NOT increment THEN 'SATTVA'
+                        WHEN 1 >= ? THEN 'RAJAS' ELSE 'UNMAPPED' END,
+                   period
+            FROM (SELECT UNNEST(?::VARCHAR[]) AS metric_key,
+                         UNNEST(?::DOUBLE[])  AS z_score,
+                         UNNEST(?::BOOLEAN[]) AS increment,
+                         UNNEST(?::VARCHAR[]) AS period)
+            ON CONFLICT (metric_key) DO UPDATE SET
+                unmapped_streak = CASE WHEN EXCLUDED.last_period = sutra_streak.last_period
+                                       THEN sutra_streak.unmapped_streak
+                                       WHEN EXCLUDED.unmapped_streak > 0
+                                       THEN sutra_streak.unmapped_streak + 1 ELSE 0 END,
+                last_seen_ts    = EXCLUDED.last_seen_ts,
+                last_z_score    = EXCLUDED.last_z_score,
+                guna_state      = CASE WHEN EXCLUDED.last_period = sutra_streak.last_period
+                                       THEN sutra_streak.guna_state
+                                       WHEN EXCLUDED.unmapped_streak = 0 THEN 'SATTVA'
+                                       WHEN sutra_streak.unmapped_streak + 1 >= ? THEN 'RAJAS'
+                                       ELSE 'UNMAPPED' END,
+                last_period     = COALESCE(EXCLUDED.last_period, sutra_streak.last_period)
+            RETURNING metric_key, unmapped_streak, guna_state
+        """, [domain, now, rajas_threshold, keys, z_scores, increments, periods, rajas_threshold]).fetchall()
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+def query_memory(agent_id=None, domain=None, limit=20, start=None, end=None,
+                 include_archive=None, archive_dir=None):
+    """
+    Read agent_memory, newest first. start/end bound execution_ts (end exclusive).
+    include_archive defaults to True when a start bound is given — archived
+    Parquet partitions are read alongside the hot table, pruned by domain and month.
+    archive_dir defaults to ARCHIVE_DIR, as in compact_citta.
+    """
+    if include_archive is None:
+        include_archive = start is not None
     where = []
     params = []
-    if agent_id: where.append("agent_id=?"); params.append(agent_id)
-    if domain:   where.append("domain=?");   params.append(domain)
+    if agent_id: where.append("agent_id=?");         params.append(agent_id)
+    if domain:   where.append("domain=?");           params.append(domain)
+    if start:    where.append("execution_ts >= ?");  params.append(start)
+    if end:      where.append("execution_ts < ?");   params.append(end)
     clause = "WHERE " + " AND ".join(where) if where else ""
-    rows = con.execute(f"SELECT * FROM agent_memory {clause} ORDER BY execution_ts DESC LIMIT {limit}", params).fetchall()
+    sql = f"SELECT * FROM agent_memory {clause}"
+    all_params = list(params)
+    archive_glob = _archive_glob("agent_memory", archive_dir)
+    if include_archive and archive_glob:
+        arch_where = list(where)
+        arch_params = list(params)
+        # month partition filters let DuckDB skip whole directories
+        if start: arch_where.append("month >= strftime(?::TIMESTAMP, '%Y-%m')"); arch_params.append(start)
+        if end:   arch_where.append("month <= strftime(?::TIMESTAMP, '%Y-%m')"); arch_params.append(end)
+        arch_clause = "WHERE " + " AND ".join(arch_where) if arch_where else ""
+        sql += f"""
+            UNION ALL BY NAME
+            SELECT * EXCLUDE (month) FROM read_parquet('{archive_glob}', hive_partitioning=true,
+                hive_types={{'domain': VARCHAR, 'month': VARCHAR}})
+            {arch_clause}"""
+        all_params += arch_params
+    con = _connect()
+    rows = con.execute(f"{sql} ORDER BY execution_ts DESC LIMIT ?", all_params + [int(limit)]).fetchall()
     con.close()
     return rows
 
+def compact_citta(retention_days=None, archive_dir=None):
+    """
+    Roll agent_memory, narration_log and trace_spans rows older than retention_days into
+    Parquet files under archive_dir/<table>/domain=<d>/month=<YYYY-MM>/, then
+    delete them from the hot database. Safe to run every pipeline execution.
+    Returns {table: rows_archived}.
+
+    Files are written to archive_dir/<table>/_staging/ first and only moved into
+    the archive once the DELETE has committed, so a crash never leaves a row both
+    hot and archived. A leftover _staging/ is resolved on the next run: promoted
+    if its rows are gone from the hot table, discarded if they are still there.
+    """
+    retention_days = RETENTION_DAYS if retention_days is None else retention_days
+    archive_dir = ARCHIVE_DIR if archive_dir is None else archive_dir
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=retention_days)
+    moved = {}
+    con = _connect()
+    try:
+        for table in ARCHIVED_TABLES:
+            target = Path(archive_dir) / table
+            staging = target / STAGING
+            _recover_staging(con, table, target)
+            n = con.execute(f"SELECT COUNT(*) FROM {table} WHERE execution_ts < ?", [cutoff]).fetchone()[0]
+            moved[table] = n
+            if n == 0:
+                continue
+            staging.mkdir(parents=True, exist_ok=True)
+            con.execute(f"""
+                COPY (SELECT *, strftime(execution_ts, '%Y-%m') AS month
+                      FROM {table} WHERE execution_ts < ?)
+                TO '{staging.as_posix()}'
+                (FORMAT PARQUET, PARTITION_BY (domain, month),
+                 OVERWRITE_OR_IGNORE true, FILENAME_PATTERN 'part_{{uuid}}')
+            """, [cutoff])
+            con.begin()
+            try:
+                con.execute(f"DELETE FROM {table} WHERE execution_ts < ?", [cutoff])
+                con.commit()
+            except Exception:
+                con.rollback()
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            _promote_staging(target)
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+    return moved
+
+def _recover_staging(con, table, target):
+    """Finish or undo a compaction that stopped between its COPY and its file moves."""
+    staging = target / STAGING
+    if not staging.exists():
+        return
+    if not any(staging.rglob("*.parquet")):
+        shutil.rmtree(staging)
+        return
+    key = ARCHIVE_KEYS[table]
+    still_hot = con.execute(f"""
+        SELECT COUNT(*) FROM {table}
+        WHERE ({", ".join(key)}) IN (
+            SELECT ({", ".join(key)}) FROM read_parquet('{(staging / "**" / "*.parquet").as_posix()}'))
+    """).fetchone()[0]
+    if still_hot:
+        shutil.rmtree(staging)      # DELETE never committed: the hot rows are authoritative
+    else:
+        _promote_staging(target)    # DELETE committed: the staged files are the only copy
+
+def _promote_staging(target):
+    staging = target / STAGING
+    for f in staging.rglob("*.parquet"):
+        dest = target / f.relative_to(staging)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(f, dest)
+    shutil.rmtree(staging)
+
+def _archive_glob(table, archive_dir=None):
+    root = Path(ARCHIVE_DIR if archive_dir is None else archive_dir) / table
+    if not root.exists() or not any(root.glob("*/*/*.parquet")):
+        return None
+    return (root / "*" / "*" / "*.parquet").as_posix()
+
 if __name__ == "__main__":
     init_citta()
     # Test write
@@ -136,3 +365,6 @@ if __name__ == "__main__":
     # Test streak
     streak, guna = update_streak("public_health:weekly_deaths", "public_health", -4.31, increment=False)
     print(f"Streak reset: {streak}, Guna: {guna}")
+    # Test retention
+    moved = compact_citta()
+    print(f"Compaction: {moved}")
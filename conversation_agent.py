@@ -1,5 +1,7 @@
 
-import json, re
+import copy, json, os, re, threading, time
+from collections import OrderedDict
+from pathlib import Path
 from dataset_config import get_default_config
 
 TRANSLATION_PROMPT = """You are a query translator for a statistical anomaly detection system.
@@ -17,14 +19,60 @@ User query: {query}
 
 JSON only:"""
 
-def translate_query(user_query: str, available_datasets: list) -> dict:
-    """LLM Role 1 — translate free text to structured query. Vocal cord discipline applies."""
+TRANSLATION_CACHE = ".osis_cache/translations.json"   # LLM results, survives restarts
+LRU_SIZE          = 256
+PERSIST_MAX       = 2000
+PROBE_TTL_S       = 30.0
+WINDOWS           = ("7d", "30d", "90d", "1y", "all")
+
+# CDC NVSS jurisdictions — default entity vocabulary when the caller passes none
+US_JURISDICTIONS = [
+    "United States", "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado",
+    "Connecticut", "Delaware", "District of Columbia", "Florida", "Georgia", "Hawaii", "Idaho",
+    "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine", "Maryland",
+    "Massachusetts", "Michigan", "Minnesota", "Mississippi", "Missouri", "Montana", "Nebraska",
+    "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York", "New York City",
+    "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Puerto Rico",
+    "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+]
+ENTITY_ALIASES = {"us": "United States", "u.s.": "United States", "usa": "United States",
+                  "nationwide": "United States", "national": "United States", "the nation": "United States",
+                  "nyc": "New York City", "dc": "District of Columbia", "d.c.": "District of Columbia",
+                  # longer than "washington", so matched first — the state is not meant
+                  "washington dc": "District of Columbia", "washington d.c.": "District of Columbia",
+                  "washington, dc": "District of Columbia", "washington, d.c.": "District of Columbia"}
+ALL_ENTITY_PHRASES = ("all states", "every state", "each state", "all entities", "all jurisdictions",
+                      "across states", "which state", "what state")
+
+_lru = OrderedDict()
+_persisted = None
+_cache_lock = threading.Lock()
+_probe = {"at": 0.0, "ok": False}
+
+def translate_query(user_query: str, available_datasets: list, entities: list = None) -> dict:
+    """
+    LLM Role 1 — translate free text to structured query. Vocal cord discipline applies.
+    Order: LRU → persistent cache → deterministic parser → LLM → fallback.
+    Unchanged input never reaches the LLM twice; common phrasings never reach it at all.
+    Parser results are cheap to recompute and only kept in the in-memory LRU,
+    so a parser fix takes effect on the next restart instead of being shadowed
+    by an old answer on disk.
+    """
     dataset_ids = [d["id"] for d in available_datasets]
-    try:
-        import requests
-        requests.get("http://127.0.0.1:11434/", timeout=3)
-    except:
-        return _fallback_translation(user_query, dataset_ids)
+    key = _cache_key(user_query, dataset_ids, entities)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    parsed = _parse_query(user_query, available_datasets, entities)
+    if parsed is not None:
+        return _cache_put(key, parsed, persist=False)
+
+    if not _llm_available():
+        # not persisted: once Ollama is back the LLM should get its turn
+        return _cache_put(key, _fallback_translation(user_query, dataset_ids, available_datasets, entities),
+                          persist=False)
     try:
         import requests
         prompt = TRANSLATION_PROMPT.format(
@@ -42,52 +90,198 @@ def translate_query(user_query: str, available_datasets: list) -> dict:
         required = ["dataset_id","entity_filter","time_filter","analysis_type"]
         for field in required:
             if field not in parsed:
-                return _fallback_translation(user_query, dataset_ids)
+                return _cache_put(key, _fallback_translation(user_query, dataset_ids, available_datasets, entities),
+                                  persist=False)
         if parsed["dataset_id"] not in dataset_ids:
             parsed["dataset_id"] = dataset_ids[0]
-        return parsed
+        parsed.setdefault("translation_method", "llm")
+        return _cache_put(key, parsed, persist=True)
     except Exception as e:
-        return _fallback_translation(user_query, dataset_ids)
+        return _cache_put(key, _fallback_translation(user_query, dataset_ids, available_datasets, entities),
+                          persist=False)
 
-def _fallback_translation(query: str, dataset_ids: list) -> dict:
+def _fallback_translation(query: str, dataset_ids: list, available_datasets: list = None,
+                          entities: list = None) -> dict:
     """Deterministic fallback when LLM unavailable or output invalid."""
-    q = query.lower()
-    time_filter = "30d"
-    if any(w in q for w in ["year","annual","12 month"]): time_filter = "1y"
-    elif any(w in q for w in ["week","7 day"]): time_filter = "7d"
-    elif any(w in q for w in ["quarter","90"]): time_filter = "90d"
-    analysis = "both"
-    if "forecast" in q or "predict" in q: analysis = "forecast"
-    elif "anomaly" in q or "spike" in q or "drop" in q: analysis = "anomaly"
+    fields, _ = _extract_fields(query, available_datasets or [{"id": d} for d in dataset_ids], entities)
     return {
-        "dataset_id": dataset_ids[0] if dataset_ids else "cdc_mortality",
-        "entity_filter": "default",
-        "time_filter": time_filter,
-        "analysis_type": analysis,
+        "dataset_id": fields["dataset_id"] or (dataset_ids[0] if dataset_ids else "cdc_mortality"),
+        "entity_filter": fields["entity_filter"],
+        "time_filter": fields["time_filter"] or "30d",
+        "analysis_type": fields["analysis_type"] or "both",
         "ambiguous": False,
         "clarification_needed": None,
         "translation_method": "deterministic_fallback"
     }
 
-def contextualize(term: str) -> str:
-    """LLM Role 4 — explain domain terms. Returns plain explanation."""
-    CONTEXT = {
-        "z-score": "A Z-score measures how many standard deviations a value is from the mean. Above +2.0 or below -2.0 is unusual. Above +3.0 or below -3.0 is rare.",
-        "z_score": "A Z-score measures how many standard deviations a value is from the mean. Above +2.0 or below -2.0 is unusual.",
-        "critical": "CRITICAL severity means the Z-score exceeds 3.0 standard deviations — a statistically rare event requiring investigation.",
-        "warning": "WARNING severity means the Z-score is between 2.0 and 3.0 — unusual but not yet at the critical threshold.",
-        "tamas": "TAMAS (inertia) indicates a suppressed or lagged signal — often a reporting artifact rather than a real event.",
-        "rajas": "RAJAS (activity) indicates an active, unexplained anomaly that has persisted beyond the normal threshold.",
-        "sattva": "SATTVA (clarity) indicates the system is operating within normal parameters.",
-        "reporting lag": "A reporting lag occurs when death certificates or records are delayed in processing, causing a temporary artificial drop in reported numbers.",
-        "prophet": "Prophet is a time-series forecasting model developed by Meta. It decomposes trends, seasonality, and holidays to produce forward-looking estimates with confidence intervals.",
-        "pancavayava": "Pañcavayava is a five-member logical proof from Nyāya philosophy: Proposition, Reason, Historical Example, Application, and Conclusion.",
+# ── Deterministic parser ──────────────────────────────────────────────────────
+_NUM_WORDS = {"a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+              "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12}
+_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "quarter": 91, "year": 365}
+_RELATIVE  = re.compile(r"\b(?:last|past|previous|recent)\s+(\d+|" + "|".join(_NUM_WORDS)
+                        + r")?\s*(day|week|month|quarter|year)s?\b")
+_PHRASES = [   # checked in order — more specific first
+    (("all time", "ever", "history", "historical", "since records", "on record", "all data"), "all"),
+    (("this year", "ytd", "year to date", "12 month", "twelve month", "annual", "yearly", "year"), "1y"),
+    (("this quarter", "quarter", "90 day", "3 month", "three month"), "90d"),
+    (("this month", "month", "30 day", "4 week", "four week"), "30d"),
+    (("this week", "today", "yesterday", "week", "7 day", "seven day"), "7d"),
+]
+# whole words only: "expected" must not fire inside "unexpected"; \w* admits inflections
+_FORECAST_WORDS = re.compile(r"\b(?:forecast\w*|predict\w*|projections?|projected|project|outlook"
+                             r"|next|expected|upcoming)\b")
+_ANOMALY_WORDS  = re.compile(r"\b(?:anomal\w*|spike[sd]?|drop(?:s|ped)?|surge[sd]?|worst|unusual"
+                             r"|outliers?|abnormal\w*|jump(?:s|ed)?|dips?)\b")
+
+def _window_for_days(days: int) -> str:
+    for tf, limit in (("7d", 7), ("30d", 31), ("90d", 92), ("1y", 366)):
+        if days <= limit:
+            return tf
+    return "all"
+
+def _extract_fields(query: str, datasets: list, entities: list = None):
+    """Pull dataset, entity, window and analysis type out of free text. Returns (fields, n_matched)."""
+    q = " " + re.sub(r"\s+", " ", query.lower()) + " "
+    matched = 0
+
+    dataset_id = None
+    for d in datasets:
+        words = {d["id"].lower(), d["id"].replace("_", " ").lower(), str(d.get("label", "")).lower(),
+                 str(d.get("domain", "")).replace("_", " ").lower()}
+        words |= {w for w in d["id"].lower().split("_") if len(w) > 3}
+        if any(w and re.search(rf"\b{re.escape(w)}\b", q) for w in words):
+            dataset_id = d["id"]
+            matched += 1
+            break
+
+    entity = "default"
+    if any(p in q for p in ALL_ENTITY_PHRASES):
+        entity, matched = "all", matched + 1
+    else:
+        vocab = {e.lower(): e for e in (entities or US_JURISDICTIONS)}
+        vocab.update({a: c for a, c in ENTITY_ALIASES.items() if not entities or c in entities})
+        for name in sorted(vocab, key=len, reverse=True):   # "new york city" before "new york"
+            if re.search(rf"(?<![\w.]){re.escape(name)}(?![\w])", q):
+                entity, matched = vocab[name], matched + 1
+                break
+
+    time_filter = None
+    m = _RELATIVE.search(q)
+    if m:
+        n = m.group(1)
+        n = int(n) if n and n.isdigit() else _NUM_WORDS.get(n, 1)
+        time_filter = _window_for_days(n * _UNIT_DAYS[m.group(2)])
+    else:
+        for phrases, tf in _PHRASES:
+            if any(re.search(rf"\b{re.escape(p)}s?\b", q) for p in phrases):   # "ever" ≠ "every"
+                time_filter = tf
+                break
+    matched += time_filter is not None
+
+    forecast = _FORECAST_WORDS.search(q) is not None
+    anomaly = _ANOMALY_WORDS.search(q) is not None
+    analysis = "forecast" if forecast and not anomaly else "anomaly" if anomaly and not forecast \
+        else "both" if forecast else None
+    matched += analysis is not None
+
+    return {"dataset_id": dataset_id, "entity_filter": entity,
+            "time_filter": time_filter, "analysis_type": analysis}, matched
+
+def _parse_query(query: str, available_datasets: list, entities: list = None):
+    """
+    Fast deterministic translation. Returns None unless the query states what
+    to analyse (anomaly/forecast) — anything vaguer is left to the LLM.
+    An unnamed dataset defaults to the first one offered (the caller's selection).
+    """
+    fields, _ = _extract_fields(query, available_datasets, entities)
+    if fields["analysis_type"] is None:
+        return None
+    return {
+        "dataset_id": fields["dataset_id"] or (available_datasets[0]["id"] if available_datasets else "cdc_mortality"),
+        "entity_filter": fields["entity_filter"],
+        "time_filter": fields["time_filter"] or "30d",
+        "analysis_type": fields["analysis_type"],
+        "ambiguous": False,
+        "clarification_needed": None,
+        "translation_method": "deterministic_parser",
     }
-    term_lower = term.lower().strip()
-    for key, explanation in CONTEXT.items():
-        if key in term_lower or term_lower in key:
-            return explanation
-    return f"Term '{term}' is not in the contextualization registry. Add it to conversation_agent.py CONTEXT dict."
+
+# ── Translation cache ─────────────────────────────────────────────────────────
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.")
+
+def _cache_key(query: str, dataset_ids: list, entities: list = None) -> str:
+    # ids in offered order: the first is the default dataset, so it is part of the answer;
+    # entities decide which names the parser can resolve, so they are part of it too
+    import hashlib
+    raw = json.dumps([_normalize(query), list(dataset_ids), sorted(entities or [])])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _load_persisted() -> dict:
+    global _persisted
+    if _persisted is None:
+        try:
+            _persisted = json.loads(Path(TRANSLATION_CACHE).read_text())
+        except (OSError, ValueError):
+            _persisted = {}
+        # older releases persisted parser output; drop it so today's parser answers
+        _persisted = {k: v for k, v in _persisted.items()
+                      if v.get("translation_method") != "deterministic_parser"}
+    return _persisted
+
+def _cache_get(key: str):
+    with _cache_lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return copy.deepcopy(_lru[key])
+        hit = _load_persisted().get(key)
+        if hit is not None:
+            _lru[key] = hit
+            _trim_lru()
+            return copy.deepcopy(hit)
+    return None
+
+def _cache_put(key: str, result: dict, persist: bool) -> dict:
+    with _cache_lock:
+        _lru[key] = result
+        _trim_lru()
+        if persist:
+            store = _load_persisted()
+            store[key] = result
+            while len(store) > PERSIST_MAX:
+                store.pop(next(iter(store)))   # oldest insertion first
+            path = Path(TRANSLATION_CACHE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(store))
+            tmp.replace(path)
+    return copy.deepcopy(result)
+
+def _trim_lru():
+    while len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+def _llm_available() -> bool:
+    """Ollama health probe, remembered for PROBE_TTL_S so reruns don't each pay the 3 s timeout."""
+    now = time.monotonic()
+    if now - _probe["at"] < PROBE_TTL_S:
+        return _probe["ok"]
+    try:
+        import requests
+        requests.get("http://127.0.0.1:11434/", timeout=3)
+        ok = True
+    except:
+        ok = False
+    _probe.update(at=now, ok=ok)
+    return ok
+
+def contextualize(term: str) -> str:
+    """LLM Role 4 — explain domain terms. Returns plain explanation from glossary.json."""
+    from glossary import load_glossary
+    entry, _ = load_glossary().lookup(term)
+    if entry is not None:
+        return entry.definition
+    return f"Term '{term}' is not in the contextualization registry. Add it to glossary.json."
 
 if __name__ == "__main__":
     datasets = [{"id":"cdc_mortality"},{"id":"demo_hospital"}]
@@ -1,9 +1,137 @@
-import matplotlib.pyplot as plt
-
-def plot_covid_deaths(incidence_summary):
-    plt.plot(incidence_summary['Year'], incidence_summary['COVID-19 Deaths'], marker='o')
-    plt.title('Yearly COVID-19 Mortality')
-    plt.xlabel('Year')
-    plt.ylabel('COVID-19 Deaths')
-    plt.grid(True)
-    plt.show()
+def plot_covid_deaths(incidence_summary):
+    import matplotlib.pyplot as plt  # lazy: app.py imports this module for the plotly chart
+    plt.plot(incidence_summary['Year'], incidence_summary['COVID-19 Deaths'], marker='o')
+    plt.title('Yearly COVID-19 Mortality')
+    plt.xlabel('Year')
+    plt.ylabel('COVID-19 Deaths')
+    plt.grid(True)
+    plt.show()
+
+
+# ── Interactive series chart (Streamlit) ───────────────────────────────────
+# Downsampling happens inside DuckDB: each entity's history is split into
+# POINT_BUDGET/5 equal time buckets and only the first, last, min and max
+# point of every bucket (M4) is returned, plus the worst anomaly per bucket
+# so no flagged week disappears. At most five points per bucket, so peaks and
+# troughs survive at any zoom-out and the browser never receives more than
+# POINT_BUDGET points per entity.
+DB_NAME      = "osis_strategic_archives.db"
+POINT_BUDGET = 1200
+
+_SERIES_SQL = """
+WITH scored AS (
+    SELECT state, time_period, metric_value,
+           AVG(metric_value)    OVER w AS rolling_mean,
+           STDDEV(metric_value) OVER w AS rolling_std
+    FROM canonical_metrics
+    WHERE domain = ? AND metric_name = ? AND list_contains(?::VARCHAR[], state)
+    WINDOW w AS (PARTITION BY state ORDER BY time_period
+                 ROWS BETWEEN {window} PRECEDING AND 1 PRECEDING)
+),
+bucketed AS (
+    SELECT *,
+           CASE WHEN rolling_std > 0 THEN (metric_value - rolling_mean) / rolling_std END AS z_score,
+           LEAST(FLOOR((epoch(time_period) - MIN(epoch(time_period)) OVER (PARTITION BY state))
+                       / GREATEST(MAX(epoch(time_period)) OVER (PARTITION BY state)
+                                  - MIN(epoch(time_period)) OVER (PARTITION BY state), 1)
+                       * ?)::INTEGER, ? - 1) AS bucket
+    FROM scored
+),
+keep AS (
+    SELECT state, bucket,
+           MIN(time_period)                      AS t_first,
+           MAX(time_period)                      AS t_last,
+           arg_min(time_period, metric_value)    AS t_min,
+           arg_max(time_period, metric_value)    AS t_max,
+           arg_max(time_period, ABS(z_score)) FILTER (WHERE ABS(z_score) >= ?) AS t_anomaly
+    FROM bucketed GROUP BY state, bucket
+)
+SELECT b.state, b.time_period, b.metric_value, b.rolling_mean, b.rolling_std, b.z_score
+FROM bucketed b JOIN keep k ON b.state = k.state AND b.bucket = k.bucket
+WHERE b.time_period IN (k.t_first, k.t_last, k.t_min, k.t_max, k.t_anomaly)
+ORDER BY b.state, b.time_period
+"""
+
+
+def query_series(config, entities=None, points=POINT_BUDGET, db_path=DB_NAME, grain=None):
+    """
+    Downsampled observed series with rolling stats for one or more entities,
+    as a DataFrame (state, time_period, metric_value, rolling_mean, rolling_std, z_score).
+    Defaults to the config's entity. grain ("month" | "quarter" | "year")
+    reads period means from period_rollups instead of weekly rows; its
+    rolling columns are empty and n_anomalies counts the flagged weeks.
+    """
+    import duckdb
+    from metric_store import fetch_frame
+    entities = list(entities or [config.entity_filter])
+    buckets = max(points // 5, 1)   # ≤5 kept points per bucket: M4 + worst anomaly
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        if grain:
+            from period_rollups import query_periods
+            df = query_periods(con, config, grain, entities)
+            return df.rename(columns={"period_start": "time_period"}).assign(
+                metric_value=df["mean_value"], rolling_mean=float("nan"), rolling_std=float("nan"),
+                z_score=float("nan"))
+        return fetch_frame(con, _SERIES_SQL.format(window=int(config.rolling_window)),
+                           [config.domain, config.metric_name, entities,
+                            buckets, buckets, config.anomaly_threshold])
+    finally:
+        con.close()
+
+
+def timeseries_figure(series, config, forecast=None, primary=None):
+    """
+    Plotly figure: one line per entity, the rolling mean ± anomaly-threshold
+    band and anomaly markers for the primary entity, and the forecast fan.
+    `forecast` is a forecast_output.json dict.
+    """
+    import plotly.graph_objects as go
+    primary = primary or config.entity_filter
+    fig = go.Figure()
+
+    main = series[series["state"] == primary]
+    if not main.empty:
+        band = main.dropna(subset=["rolling_mean", "rolling_std"])
+        k = config.anomaly_threshold
+        fig.add_trace(go.Scatter(x=band["time_period"], y=band["rolling_mean"] + k * band["rolling_std"],
+                                 mode="lines", line=dict(width=0), hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(x=band["time_period"], y=band["rolling_mean"] - k * band["rolling_std"],
+                                 mode="lines", line=dict(width=0), fill="tonexty",
+                                 fillcolor="rgba(120,120,120,0.18)", name=f"Rolling mean ±{k:g}σ"))
+        fig.add_trace(go.Scatter(x=band["time_period"], y=band["rolling_mean"], mode="lines",
+                                 line=dict(color="gray", dash="dot", width=1), name="Rolling mean"))
+
+    for state, grp in series.groupby("state", sort=False):
+        fig.add_trace(go.Scatter(x=grp["time_period"], y=grp["metric_value"], mode="lines", name=state,
+                                 line=dict(width=2 if state == primary else 1)))
+
+    z = main["z_score"].abs()
+    for label, mask, color in (
+        ("Critical", z >= config.critical_threshold, "#d62728"),
+        ("Warning", (z >= config.anomaly_threshold) & (z < config.critical_threshold), "#ff7f0e"),
+    ):
+        pts = main[mask]
+        if not pts.empty:
+            fig.add_trace(go.Scatter(x=pts["time_period"], y=pts["metric_value"], mode="markers", name=label,
+                                     marker=dict(color=color, size=8, symbol="diamond"),
+                                     customdata=pts["z_score"], hovertemplate="%{x|%Y-%m-%d}<br>%{y:,.0f}<br>z=%{customdata:.2f}"))
+
+    if forecast and forecast.get("status") == "success" and forecast.get("forecast"):
+        fc = forecast["forecast"]
+        xs = [r["period_ending"][:10] for r in fc]
+        last = forecast.get("last_known") or {}
+        if last.get("date"):
+            # anchor the fan on the last observation so it joins the series
+            xs = [str(last["date"])[:10]] + xs
+            fc = [{"forecast": last["value"], "lower_95": last["value"], "upper_95": last["value"]}] + fc
+        fig.add_trace(go.Scatter(x=xs, y=[r["upper_95"] for r in fc], mode="lines",
+                                 line=dict(width=0), hoverinfo="skip", showlegend=False))
+        fig.add_trace(go.Scatter(x=xs, y=[r["lower_95"] for r in fc], mode="lines", line=dict(width=0),
+                                 fill="tonexty", fillcolor="rgba(31,119,180,0.2)", name="Forecast 95%"))
+        fig.add_trace(go.Scatter(x=xs, y=[r["forecast"] for r in fc], mode="lines",
+                                 line=dict(color="#1f77b4", dash="dash"), name="Forecast"))
+
+    fig.update_layout(height=420, margin=dict(l=10, r=10, t=30, b=10), hovermode="x unified",
+                      yaxis_title=config.metric_name, legend=dict(orientation="h", y=-0.15))
+    return fig
@@ -6,11 +6,13 @@ CDC is now just a default config — not hardcoded logic.
 
 SOVEREIGNTY RULE: Only this module writes to canonical_metrics.
 All other agents use read_only=True connections.
+
+canonical_metrics is a view over the dictionary-encoded tables in
+metric_store; an ingest replaces only its own (domain, metric) and logs
+the rows whose value changed as a new vintage (run_logic_audit(as_of=...)).
 """
 
-import duckdb
 from dataset_config import DatasetConfig, get_default_config
-from schema_adapter import load_dataframe
 
 DB_NAME = "osis_strategic_archives.db"
 
@@ -30,6 +32,10 @@ def initialize_osis_db(config: DatasetConfig = None):
     print(f"  Metric  : {config.metric_name}")
     print(f"  Source  : {config.source_label}\n")
 
+    # Heavy imports deferred to first use — `main.py --skip-db` never pays for pandas here
+    import duckdb
+    from schema_adapter import load_dataframe
+
     con = duckdb.connect(DB_NAME)
 
     try:
@@ -90,27 +96,12 @@ def initialize_osis_db(config: DatasetConfig = None):
         # ── STEP 4: Project into canonical_metrics ────────────────────────────
         print("🏗️  Step 4: Projecting into canonical_metrics...")
 
-        con.execute("DROP TABLE IF EXISTS canonical_metrics;")
-        con.execute("""
-            CREATE TABLE canonical_metrics (
-                domain        VARCHAR,
-                metric_name   VARCHAR,
-                time_period   DATE,
-                metric_value  DOUBLE,
-                state         VARCHAR,
-                source_table  VARCHAR,
-                schema_version VARCHAR DEFAULT '1.0',
-                ingested_at   TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-        # Build INSERT dynamically from config
+        # Build the projection dynamically from config; metric_store encodes it
         entity_expr = f'"{config.entity_col}"' if config.entity_col \
                       else f"'{config.entity_filter}'"
 
-        con.execute(f"""
-            INSERT INTO canonical_metrics
-                (domain, metric_name, time_period, metric_value, state, source_table)
+        from metric_store import write_metric
+        n = write_metric(con, f"""
             SELECT
                 '{config.domain}'       AS domain,
                 '{config.metric_name}'  AS metric_name,
@@ -121,10 +112,8 @@ def initialize_osis_db(config: DatasetConfig = None):
             FROM raw_source_data
             WHERE TRY_CAST("{config.date_col}"  AS DATE)   IS NOT NULL
               AND TRY_CAST("{config.value_col}" AS DOUBLE) IS NOT NULL
-              AND TRY_CAST("{config.value_col}" AS DOUBLE) > 0;
-        """)
-
-        n = con.execute("SELECT COUNT(*) FROM canonical_metrics").fetchone()[0]
+              AND TRY_CAST("{config.value_col}" AS DOUBLE) > 0
+        """, config.domain, config.metric_name)
         print(f"   ✅ {config.metric_name} : {n:,} rows\n")
 
         # ── STEP 5: Verification ──────────────────────────────────────────────
@@ -132,16 +121,33 @@ def initialize_osis_db(config: DatasetConfig = None):
         print(f"   Total canonical rows : {n:,}")
 
         date_range = con.execute(
-            "SELECT MIN(time_period), MAX(time_period) FROM canonical_metrics"
+            "SELECT MIN(time_period), MAX(time_period) FROM canonical_metrics WHERE domain = ? AND metric_name = ?",
+            [config.domain, config.metric_name]
         ).fetchone()
         print(f"   Date range           : {date_range[0]} → {date_range[1]}")
 
         if config.entity_col:
             entity_count = con.execute(
-                "SELECT COUNT(DISTINCT state) FROM canonical_metrics"
+                "SELECT COUNT(DISTINCT state) FROM canonical_metrics WHERE domain = ? AND metric_name = ?",
+                [config.domain, config.metric_name]
             ).fetchone()[0]
             print(f"   Entities             : {entity_count:,} unique")
 
+        # ── STEP 6: Precompute window rollups ─────────────────────────────────
+        print("\n📐 Step 6: Window rollups (7d/30d/90d/1y/all)")
+        from query_engine import build_window_rollups
+        print(f"   ✅ window_rollups: {build_window_rollups(con, config):,} rows")
+
+        # ── STEP 7: Month / quarter / year rollups ────────────────────────────
+        print("\n🗓️  Step 7: Period rollups (touched periods only)")
+        from period_rollups import build_period_rollups
+        print(f"   ✅ period_rollups: {build_period_rollups(con, config):,} rows refreshed")
+
+        # ── STEP 8: Extend the Udāharaṇa precedent index ──────────────────────
+        print("\n📚 Step 8: Precedent windows (incremental)")
+        from precedent_index import build_precedent_windows
+        print(f"   ✅ precedent_windows: {build_precedent_windows(con, config):,} new windows")
+
         print(f"\n✅ OSIS Strategic Archive ready: {DB_NAME}")
         print(f"   Schema version: {config.schema_version}\n")
 
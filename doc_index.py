@@ -0,0 +1,180 @@
+"""
+OSIS – Run Document Indexer (v1.0)
+===================================
+Incremental retrieval index over past pipeline runs.
+
+Each run directory contributes up to three documents:
+
+    fact_packet    logic_output.json     the Logic Agent finding
+    justification  chanakya_output.json  the Pañcavayava justification block
+    brief          strategic_brief.txt   the governed strategic brief
+
+Documents are keyed "<doc_type>:<payload_hash>". The fact packet and brief
+use summarization.hash_payload over the fact-packet payload (the brief
+already records it). The justification hashes its own finding and proof,
+because chanakya_output.json's payload_hash covers generated_at. Identical
+findings therefore collapse to one document however many times they are
+re-run. Ids already in the index are skipped before embedding, and new
+documents are embedded in one batched add_texts call.
+
+main.log_run_to_citta indexes every logged run. Backfill or search from the CLI:
+    python doc_index.py runs/ .
+    python doc_index.py --query "critical drop Texas reporting lag"
+    python doc_index.py --query "Texas week ending 2023-01-07" --vector-only
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Optional
+
+from summarization import hash_payload
+
+INDEX_DIR = "vector_store/runs"
+DOC_TYPES = ("fact_packet", "justification", "brief")
+
+_index = None
+
+
+def get_index(path: str = INDEX_DIR):
+    """Process-wide LocalVectorIndex for run documents."""
+    global _index
+    if _index is None or str(_index.path) != str(Path(path)):
+        from local_vectors import LocalVectorIndex
+        _index = LocalVectorIndex(path)
+    return _index
+
+
+def _load(path: Path) -> Optional[dict]:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def run_documents(output_dir: str) -> list:
+    """Documents for one run directory: [{"id", "text", "metadata"}]. Missing files are skipped."""
+    out = Path(output_dir)
+    docs = []
+    logic = _load(out / "logic_output.json")
+    payload = (logic or {}).get("payload")
+    if not payload:
+        return docs
+    analysis, baseline = payload.get("analysis", {}), payload.get("baseline_stats", {})
+    base_md = {
+        "domain": payload.get("domain"),
+        "metric_name": payload.get("metric_name"),
+        "entity": payload.get("state"),
+        "timestamp": str(payload.get("timestamp", ""))[:10],
+        "z_score": analysis.get("z_score"),
+        "severity": analysis.get("severity"),
+        "run_dir": str(out),
+    }
+    fp_hash = hash_payload(payload)
+    top = "; ".join(f"{a['date'][:10]} z={a['z_score']:+.2f} {a['severity']}"
+                    for a in payload.get("top_anomalies", []))
+    docs.append({
+        "id": f"fact_packet:{fp_hash}",
+        "text": (f"{payload.get('state')} {payload.get('metric_name')} week ending {base_md['timestamp']}: "
+                 f"observed {payload.get('observed_value', 0):,.0f} vs rolling mean "
+                 f"{baseline.get('rolling_mean', 0):,.0f}, z-score {analysis.get('z_score', 0):+.2f} "
+                 f"{analysis.get('severity')}. {analysis.get('total_anomalies_in_history')} anomalies, "
+                 f"{analysis.get('total_critical_in_history')} critical in history. Top anomalies: {top}."),
+        "metadata": {**base_md, "doc_type": "fact_packet", "payload_hash": fp_hash},
+    })
+
+    chanakya = _load(out / "chanakya_output.json")
+    jb = (chanakya or {}).get("justification_block")
+    if jb:
+        body = {"entity": payload.get("state"), "timestamp": base_md["timestamp"],
+                "finding": chanakya.get("finding"), "justification_block": jb}
+        jb_hash = hash_payload(body)
+        docs.append({
+            "id": f"justification:{jb_hash}",
+            "text": " ".join(str(jb.get(k, "")) for k in ("pratijna", "hetu", "udaharana", "upanaya", "nigamana")),
+            "metadata": {**base_md, "doc_type": "justification", "payload_hash": jb_hash,
+                         "urgency": chanakya.get("urgency"), "escalate": chanakya.get("escalate"),
+                         "guna": (chanakya.get("finding") or {}).get("systemic_state"),
+                         "sutra_action": (chanakya.get("sutra_applied") or {}).get("action"),
+                         "source_hash": chanakya.get("payload_hash")},
+        })
+
+    brief = _load(out / "strategic_brief.txt")
+    # a brief left over from an earlier run (LLM down this time) describes another fact packet
+    if brief and brief.get("brief") and brief.get("payload_hash") == fp_hash:
+        docs.append({
+            "id": f"brief:{fp_hash}",
+            "text": brief["brief"],
+            "metadata": {**base_md, "doc_type": "brief", "payload_hash": fp_hash,
+                         "model": brief.get("model"), "tarka_passed": (brief.get("tarka_validation") or {}).get("passed")},
+        })
+    return docs
+
+
+def index_runs(output_dirs, index=None, batch_size: int = 256) -> dict:
+    """Index every run directory given. Returns {"seen", "added", "skipped"}."""
+    index = index or get_index()
+    all_docs = [doc for d in output_dirs for doc in run_documents(d)]
+    docs, seen_ids = [], set()
+    for doc in all_docs:
+        if doc["id"] in seen_ids or doc["id"] in index:
+            continue
+        seen_ids.add(doc["id"])
+        docs.append(doc)
+    added = index.add_texts([d["text"] for d in docs], ids=[d["id"] for d in docs],
+                            metadatas=[d["metadata"] for d in docs], batch_size=batch_size) if docs else []
+    return {"seen": len(all_docs), "added": len(added), "skipped": len(all_docs) - len(added)}
+
+
+def index_run(output_dir: str, index=None) -> dict:
+    return index_runs([output_dir], index=index)
+
+
+def find_run_dirs(*roots: str) -> list:
+    """Every directory under roots holding a logic_output.json."""
+    dirs = []
+    for root in roots:
+        r = Path(root)
+        if (r / "logic_output.json").exists():
+            dirs.append(str(r))
+        dirs.extend(str(p.parent) for p in sorted(r.rglob("*/logic_output.json")))
+    return list(dict.fromkeys(dirs))
+
+
+def search_runs(query: str, k: int = 5, doc_type: Optional[str] = None, index=None,
+                hybrid: bool = True, **filters) -> list:
+    """
+    Top-k past-run documents, optionally restricted by doc_type and metadata
+    equality filters. hybrid fuses BM25 with vector similarity, so entity names
+    and dates ("Texas week ending 2023-01-07") match literally.
+    """
+    index = index or get_index()
+    want = {"doc_type": doc_type, **filters} if doc_type else filters
+    if hybrid:
+        from hybrid_retrieval import get_retriever
+        return get_retriever(index).search(query, k=k, **want)
+    if not want:
+        return index.search(query, k=k)
+    hits = index.search(query, k=max(k * 8, 32))
+    return [h for h in hits if all((h.get("metadata") or {}).get(f) == v for f, v in want.items())][:k]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index past OSIS runs for retrieval")
+    parser.add_argument("roots", nargs="*", default=[".", "runs"])
+    parser.add_argument("--query")
+    parser.add_argument("--type", choices=DOC_TYPES)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--vector-only", action="store_true", help="skip BM25 fusion")
+    args = parser.parse_args()
+
+    if args.query:
+        for hit in search_runs(args.query, k=args.k, doc_type=args.type, hybrid=not args.vector_only):
+            md = hit.get("metadata") or {}
+            print(f"  {hit['score']:.3f}  {md.get('doc_type'):<13} {md.get('entity')} {md.get('timestamp')}  "
+                  f"{hit['text'][:90]}")
+    else:
+        dirs = find_run_dirs(*args.roots)
+        stats = index_runs(dirs)
+        print(f"  Indexed {len(dirs)} run dirs: {stats['added']} new documents, "
+              f"{stats['skipped']} already indexed → {INDEX_DIR}")
@@ -0,0 +1,268 @@
+"""
+OSIS – Fan-out Runner (v1.0)
+=============================
+Runs the pipeline for many (dataset, entity, metric) targets in a process
+pool, each into its own versioned run directory, and writes one combined
+index of results.
+
+    runs/<batch_id>/
+        index.json                               ← combined results
+        cdc_mortality__texas__weekly_deaths.../  ← one isolated run per target
+            logic_output.json  forecast_output.json
+            chanakya_output.json  strategic_brief.txt  pipeline.log
+    runs/batches.jsonl                           ← one line per batch
+
+Design:
+  - Workers run main.run_pipeline(skip_db=True, citta=False) against the
+    current canonical_metrics archive. Ingestion is not fanned out — only
+    database_init writes canonical_metrics, and it rebuilds the table.
+  - DuckDB allows one writer process per file, so workers never open
+    osis.db; the parent logs each finished run to Citta serially.
+  - Stage caching still applies per target, so an unchanged target is cheap.
+
+Usage:
+    python fanout_runner.py --all-entities --workers 4
+    python fanout_runner.py --target cdc_mortality:Texas --target cdc_mortality:Ohio
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import json
+import multiprocessing
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import dataset_config
+from dataset_config import DatasetConfig
+
+REGISTRY_PATH = "dataset_registry.json"
+RUNS_DIR      = "runs"
+DB_NAME       = "osis_strategic_archives.db"
+
+
+@dataclass
+class Target:
+    dataset_id: str
+    entity: Optional[str] = None
+    metric: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Target":
+        """'dataset[:entity[:metric]]' → Target."""
+        parts = spec.split(":")
+        return cls(*[p or None for p in parts[:3]])
+
+
+def load_registry(path: str = REGISTRY_PATH) -> dict:
+    p = Path(path)
+    if not p.exists():
+        return {"cdc_mortality": {"id": "cdc_mortality", "config_key": "CDC_MORTALITY", "status": "active"}}
+    return {d["id"]: d for d in json.loads(p.read_text())["datasets"]}
+
+
+def resolve_config(target: Target, registry: dict) -> DatasetConfig:
+    """Registry entry → DatasetConfig, with the target's entity/metric applied."""
+    entry = registry.get(target.dataset_id)
+    if entry is None:
+        raise ValueError(f"Unknown dataset '{target.dataset_id}'. Registry: {list(registry)}")
+    base = getattr(dataset_config, entry.get("config_key", ""), None)
+    if base is None:
+        # No named config — build one from the registry fields
+        base = DatasetConfig(
+            domain=entry["domain"],
+            metric_name=entry.get("metric_col", "value"),
+            source_label=entry.get("label", entry["id"]),
+            date_col=entry.get("date_col", "date"),
+            value_col=entry.get("metric_col", "value"),
+            entity_col=entry.get("entity_col"),
+            entity_filter=entry.get("default_entity", "default"),
+            source_type=entry.get("source_type", "csv"),
+            source_path=entry.get("source_path", ""),
+        )
+    overrides = {}
+    if target.entity:
+        overrides["entity_filter"] = target.entity
+    if target.metric:
+        overrides["metric_name"] = target.metric
+    return dataclasses.replace(base, **overrides)
+
+
+def list_entities(config: DatasetConfig) -> list:
+    """Every entity present in canonical_metrics for the config's domain + metric."""
+    import duckdb
+    con = duckdb.connect(DB_NAME, read_only=True)
+    try:
+        rows = con.execute(
+            "SELECT DISTINCT state FROM canonical_metrics WHERE domain=? AND metric_name=? ORDER BY state",
+            [config.domain, config.metric_name]).fetchall()
+    finally:
+        con.close()
+    return [r[0] for r in rows]
+
+
+def targets_from_registry(registry: dict, all_entities: bool = False) -> list:
+    targets = []
+    for ds_id, entry in registry.items():
+        if entry.get("status") != "active":
+            continue
+        if not all_entities:
+            targets.append(Target(ds_id))
+            continue
+        try:
+            entities = list_entities(resolve_config(Target(ds_id), registry))
+        except Exception as e:
+            print(f"  ⚠️  {ds_id}: cannot list entities — {e}")
+            entities = []
+        targets.extend(Target(ds_id, entity=e) for e in entities)
+    return targets
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", str(text).lower()).strip("_") or "default"
+
+
+def _run_target(config: DatasetConfig, run_dir: str, use_llm: bool, force: bool,
+                skip_db: bool = True, progress=None) -> dict:
+    """Worker process: one isolated pipeline run. stdout goes to run_dir/pipeline.log."""
+    import main
+    import tracing
+    Path(run_dir).mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(Path(run_dir) / "pipeline.log", "w") as log, contextlib.redirect_stdout(log):
+        try:
+            report = main.run_pipeline(config=config, skip_db=skip_db, use_llm=use_llm, force=force,
+                                       output_dir=run_dir, citta=False, progress=progress)
+        except Exception as e:
+            return {"status": "error", "error": f"{type(e).__name__}: {e}",
+                    "wall_ms": int((time.perf_counter() - t0) * 1000)}
+    logic = report.results.get("logic") or {}
+    return {
+        "status": "aborted" if report.aborted else ("ok" if report.ok else "partial"),
+        "stages": report.status,
+        "errors": report.errors,
+        "fact_packet": logic.get("fact_packet"),
+        "data_version": report.results.get("fingerprint"),
+        "run_id": tracing.run_id(),
+        "spans": tracing.export_spans(),
+        "wall_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+
+def run_fanout(targets: list, workers: int = 4, runs_dir: str = RUNS_DIR,
+               registry: Optional[dict] = None, use_llm: bool = True, force: bool = False) -> dict:
+    """Run every target in a process pool. Returns (and writes) the combined index."""
+    import main
+    import tracing
+    from citta import init_citta
+
+    registry = registry or load_registry()
+    batch_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}_{uuid.uuid4().hex[:6]}"
+    batch_dir = Path(runs_dir) / batch_id
+    batch_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n{'='*55}")
+    print(f"  🏛️  OSIS Fan-out Runner — {len(targets)} targets, {workers} workers")
+    print(f"{'='*55}")
+    print(f"  Batch: {batch_dir}\n")
+
+    init_citta()
+    entries, finished = [], []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {}
+        for t in targets:
+            try:
+                cfg = resolve_config(t, registry)
+            except ValueError as e:
+                entries.append({**dataclasses.asdict(t), "status": "error", "error": str(e)})
+                continue
+            run_dir = batch_dir / f"{_slug(t.dataset_id)}__{_slug(cfg.entity_filter)}__{_slug(cfg.metric_name)}"
+            futures[pool.submit(_run_target, cfg, str(run_dir), use_llm, force)] = (t, cfg, run_dir)
+
+        for fut in as_completed(futures):
+            t, cfg, run_dir = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            entry = _index_entry(t, cfg, run_dir, res)
+            entries.append(entry)
+            if res.get("fact_packet") and res["fact_packet"].get("status") == "success":
+                finished.append((cfg, res["fact_packet"], str(run_dir)))
+                # serial Citta write — the only process with osis.db open
+                with open(run_dir / "pipeline.log", "a") as log, contextlib.redirect_stdout(log):
+                    main.log_run_to_citta(cfg, res["fact_packet"], str(run_dir), res["wall_ms"],
+                                          res["run_id"], [tracing.Span(**d) for d in res["spans"]])
+            print(f"  {entry['status']:<8} {t.dataset_id:<16} {cfg.entity_filter:<24} "
+                  f"{entry.get('urgency') or '—':<9} {res.get('wall_ms', 0)/1000:6.2f}s")
+
+    # every entity × metric of the batch in one streak transaction per domain
+    main.evaluate_rajas_runs(finished)
+
+    index = {
+        "batch_id": batch_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "workers": workers,
+        "wall_s": round(time.perf_counter() - t0, 3),
+        "targets": sorted(entries, key=lambda e: (e["dataset_id"], str(e.get("entity")))),
+    }
+    (batch_dir / "index.json").write_text(json.dumps(index, indent=2, default=str))
+    with open(Path(runs_dir) / "batches.jsonl", "a") as f:
+        f.write(json.dumps({k: index[k] for k in ("batch_id", "created_at", "wall_s")}
+                           | {"targets": len(entries), "dir": str(batch_dir)}) + "\n")
+
+    ok = sum(1 for e in entries if e["status"] == "ok")
+    print(f"\n  ✅ {ok}/{len(entries)} targets ok in {index['wall_s']:.1f}s → {batch_dir / 'index.json'}\n")
+    return index
+
+
+def _index_entry(t: Target, cfg: DatasetConfig, run_dir: Path, res: dict) -> dict:
+    entry = {
+        "dataset_id": t.dataset_id,
+        "entity": cfg.entity_filter,
+        "metric": cfg.metric_name,
+        "run_dir": str(run_dir),
+        "status": res.get("status"),
+        "stages": res.get("stages"),
+        "errors": res.get("errors") or res.get("error"),
+        "wall_ms": res.get("wall_ms"),
+    }
+    analysis = ((res.get("fact_packet") or {}).get("payload") or {}).get("analysis") or {}
+    entry["z_score"] = analysis.get("z_score")
+    entry["severity"] = analysis.get("severity")
+    chanakya_path = run_dir / "chanakya_output.json"
+    if chanakya_path.exists():
+        try:
+            ch = json.loads(chanakya_path.read_text())
+            entry["urgency"] = ch.get("urgency")
+            entry["escalate"] = ch.get("escalate")
+            entry["payload_hash"] = ch.get("payload_hash")
+        except ValueError:
+            pass
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the OSIS pipeline for many targets in parallel")
+    parser.add_argument("--registry", default=REGISTRY_PATH)
+    parser.add_argument("--target", action="append", default=[],
+                        help="dataset[:entity[:metric]] — repeatable; default: every active registry dataset")
+    parser.add_argument("--all-entities", action="store_true",
+                        help="expand each registry dataset to every entity in canonical_metrics")
+    parser.add_argument("--workers", type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument("--runs-dir", default=RUNS_DIR)
+    parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    registry = load_registry(args.registry)
+    targets = [Target.parse(s) for s in args.target] or targets_from_registry(registry, args.all_entities)
+    run_fanout(targets, workers=args.workers, runs_dir=args.runs_dir, registry=registry,
+               use_llm=not args.no_llm, force=args.force)
@@ -1,23 +1,28 @@
 import json
 import warnings
-import duckdb
-import pandas as pd
 from datetime import datetime, timezone
+from pathlib import Path
 from dataset_config import DatasetConfig, get_default_config
+from tracing import span
 
 warnings.filterwarnings("ignore")
 DB_PATH = "osis_strategic_archives.db"
 OUTPUT_FILE = "forecast_output.json"
 
 def load_data(config):
+    import duckdb
+    import pandas as pd
+    from metric_store import fetch_frame
     con = duckdb.connect(DB_PATH, read_only=True)
-    df = con.execute("SELECT time_period, metric_value FROM canonical_metrics WHERE state=? AND metric_name=? AND domain=? ORDER BY time_period ASC",
-        [config.entity_filter, config.metric_name, config.domain]).fetchdf()
+    with span("load_series", kind="duckdb") as sp:
+        df = fetch_frame(con, "SELECT time_period, metric_value FROM canonical_metrics WHERE state=? AND metric_name=? AND domain=? ORDER BY time_period ASC",
+            [config.entity_filter, config.metric_name, config.domain])
+        sp.rows_out = len(df)
     con.close()
     df["time_period"] = pd.to_datetime(df["time_period"])
     return df.dropna(subset=["metric_value"])
 
-def run_forecast_agent(config=None):
+def run_forecast_agent(config=None, output_dir="."):
     if config is None:
         config = get_default_config()
     print("="*55)
@@ -32,15 +37,22 @@ def run_forecast_agent(config=None):
         from prophet import Prophet
     except ImportError:
         print("  Forecast Agent: Prophet not available — skipping forecast")
-        return {"status": "skipped", "message": "Prophet not installed", "forecast": [], "trend": {"direction": "unknown", "pct_change": 0.0}}
+        skipped = {"status": "skipped", "message": "Prophet not installed", "forecast": [], "trend": {"direction": "unknown", "pct_change": 0.0}}
+        # Still write the record so each run directory is self-consistent for Chanakya
+        with open(Path(output_dir) / OUTPUT_FILE, "w") as f:
+            json.dump(skipped, f, indent=2)
+        return skipped
     prophet_df = df.rename(columns={"time_period": "ds", "metric_value": "y"})
     prophet_df = prophet_df.iloc[:-config.lag_periods].copy()
     model = Prophet(yearly_seasonality=True, weekly_seasonality=False,
         daily_seasonality=False, seasonality_mode="additive",
         interval_width=0.95, changepoint_prior_scale=0.05)
-    model.fit(prophet_df)
-    future = model.make_future_dataframe(periods=config.forecast_horizon, freq="W")
-    forecast = model.predict(future)
+    with span("prophet_fit", kind="fit", rows_in=len(prophet_df)):
+        model.fit(prophet_df)
+    with span("prophet_predict", kind="fit") as sp:
+        future = model.make_future_dataframe(periods=config.forecast_horizon, freq="W")
+        forecast = model.predict(future)
+        sp.rows_out = len(forecast)
     fcast_rows = forecast.tail(config.forecast_horizon)[["ds","yhat","yhat_lower","yhat_upper"]].reset_index(drop=True)
     last_actual = df.iloc[-(config.lag_periods+1)]
     first_f = float(fcast_rows.iloc[0]["yhat"])
@@ -62,10 +74,11 @@ def run_forecast_agent(config=None):
         "trend": {"direction": trend, "pct_change": round(pct,2), "start_value": round(first_f), "end_value": round(last_f)},
         "tarka_note": f"Prophet forecast with 95% CI. Final {config.lag_periods} periods excluded for reporting lag."
     }
-    with open(OUTPUT_FILE, "w") as f:
+    out_path = Path(output_dir) / OUTPUT_FILE
+    with open(out_path, "w") as f:
         json.dump(output, f, indent=2)
     print(f"  Trend: {trend} ({pct:+.1f}%)")
     for fc in forecasts:
         print(f"  {fc['period_ending']}  {fc['forecast']:>8,}  [{fc['lower_95']:,} - {fc['upper_95']:,}]")
-    print(f"Forecast saved -> {OUTPUT_FILE}")
+    print(f"Forecast saved -> {out_path}")
     return output
@@ -0,0 +1,171 @@
+"""
+OSIS – Glossary Index (v1.0)
+=============================
+Domain-term lookup for conversation_agent.contextualize.
+
+Terms live in glossary.json (term, aliases, category, definition) so the
+glossary can grow to thousands of entries — ICD codes, jurisdictions,
+Sanskrit layer names — without code changes. Loading builds three indexes
+over every normalized term and alias:
+
+  - exact : dict key → entry                     O(1)
+  - trie  : prefix → best keys, for as-you-type   O(len(prefix))
+  - gram  : character trigram → keys, fuzzy match ranked by Dice overlap
+
+Normalization lowercases, strips diacritics ("pañcavayava" == "pancavayava")
+and folds "_" / "-" to spaces. The index is rebuilt when the file's mtime
+changes.
+"""
+
+import functools
+import heapq
+import json
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+GLOSSARY_PATH  = "glossary.json"
+TRIE_TOP       = 8      # completions kept per trie node
+FUZZY_MIN      = 0.45   # Dice coefficient floor for a fuzzy hit
+MIN_PREFIX_LEN = 3      # shorter input only matches exactly
+
+
+@dataclass
+class Entry:
+    term: str
+    definition: str
+    category: str = "general"
+    aliases: list = field(default_factory=list)
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return re.sub(r"\s+", " ", re.sub(r"[_\-]+", " ", text)).strip(" ?!.,:;'\"")
+
+
+def _trigrams(key: str) -> list:
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class GlossaryIndex:
+    def __init__(self, entries: list):
+        self.entries = entries
+        self.exact = {}          # key → entry index
+        self.trie = {}           # nested dicts; "" holds the node's best keys
+        self.keys = []           # key id → key
+        self.grams = {}          # trigram → tuple of key ids
+        self.gram_count = []     # key id → number of distinct trigrams
+        for i, e in enumerate(entries):
+            for raw in [e.term, *e.aliases]:
+                key = normalize(raw)
+                if key and key not in self.exact:   # first definition of a key wins
+                    self.exact[key] = i
+        for key in sorted(self.exact, key=lambda k: (len(k), k)):   # shortest completions first
+            node = self.trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+                best = node.setdefault("", [])
+                if len(best) < TRIE_TOP:
+                    best.append(key)
+            grams = set(_trigrams(key))
+            self.gram_count.append(len(grams))
+            for g in grams:
+                self.grams.setdefault(g, []).append(len(self.keys))
+            self.keys.append(key)
+        self.grams = {g: tuple(ids) for g, ids in self.grams.items()}
+        # Streamlit reruns repeat the same lookup on every widget interaction
+        self.lookup = functools.lru_cache(maxsize=1024)(self._lookup)
+
+    def get(self, term: str) -> Optional[Entry]:
+        i = self.exact.get(normalize(term))
+        return self.entries[i] if i is not None else None
+
+    def complete(self, prefix: str, k: int = TRIE_TOP) -> list:
+        """Terms starting with prefix, shortest first — one trie walk per keystroke."""
+        node = self.trie
+        for ch in normalize(prefix):
+            node = node.get(ch)
+            if node is None:
+                return []
+        return self._dedupe(node.get("", []), k)
+
+    def fuzzy(self, text: str, k: int = 5, min_score: float = FUZZY_MIN) -> list:
+        """[(score, Entry)] ranked by trigram Dice coefficient."""
+        q = normalize(text)
+        if not q:
+            return []
+        grams = set(_trigrams(q))
+        overlap = Counter()
+        for g in grams:
+            overlap.update(self.grams.get(g, ()))   # C-level counting over posting lists
+        # n shared grams can reach min_score only if n >= min_score*|q|/(2-min_score)
+        floor = min_score * len(grams) / (2 - min_score)
+        scored = [(2 * n / (len(grams) + self.gram_count[kid]), kid) for kid, n in overlap.items() if n >= floor]
+        out, seen = [], set()
+        for score, kid in heapq.nlargest(4 * k, scored, key=lambda t: (t[0], -len(self.keys[t[1]]))):
+            i = self.exact[self.keys[kid]]
+            if score < min_score or len(out) >= k:
+                break
+            if i not in seen:
+                seen.add(i)
+                out.append((round(score, 3), self.entries[i]))
+        return out
+
+    def _lookup(self, text: str) -> tuple:
+        """
+        Best entry for free text → (Entry | None, method). Tries the whole
+        input exactly, then any 1–3 word phrase inside it ("what is a z-score"),
+        then a unique prefix, then fuzzy.
+        """
+        q = normalize(text)
+        if not q:
+            return None, None
+        if q in self.exact:
+            return self.entries[self.exact[q]], "exact"
+        words = q.split()
+        for n in (3, 2, 1):
+            for i in range(len(words) - n + 1):
+                phrase = " ".join(words[i:i + n])
+                if phrase in self.exact and (n > 1 or len(phrase) >= MIN_PREFIX_LEN):
+                    return self.entries[self.exact[phrase]], "phrase"
+        if len(q) >= MIN_PREFIX_LEN:
+            completions = self.complete(q, k=2)
+            if len(completions) == 1:
+                return completions[0], "prefix"
+            hits = self.fuzzy(q, k=1)
+            if hits:
+                return hits[0][1], "fuzzy"
+        return None, None
+
+    def _dedupe(self, keys, k) -> list:
+        out, seen = [], set()
+        for key in keys:
+            i = self.exact[key]
+            if i not in seen:
+                seen.add(i)
+                out.append(self.entries[i])
+            if len(out) >= k:
+                break
+        return out
+
+
+_indexes = {}      # resolved path → (mtime_ns, GlossaryIndex)
+
+
+def load_glossary(path: str = GLOSSARY_PATH) -> GlossaryIndex:
+    """The index for path, rebuilt only when that file changes."""
+    p = Path(path).resolve()
+    mtime = p.stat().st_mtime_ns if p.exists() else None
+    cached = _indexes.get(p)
+    if cached is None or cached[0] != mtime:
+        raw = json.loads(p.read_text()) if p.exists() else {"terms": []}
+        index = GlossaryIndex([Entry(term=t["term"], definition=t["definition"],
+                                     category=t.get("category", "general"), aliases=t.get("aliases", []))
+                               for t in raw["terms"]])
+        cached = _indexes[p] = (mtime, index)
+    return cached[1]
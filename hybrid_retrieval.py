@@ -0,0 +1,167 @@
+"""
+OSIS – Hybrid Retrieval (v1.0)
+===============================
+BM25 + vector search over a LocalVectorIndex, with a query result cache.
+
+  - BM25 runs over an inverted index of the same documents, using the same
+    tokenizer as the hashed embedder. That tokenizer keeps dates
+    ("2023-01-07") and word bigrams ("new york") whole, so exact-term
+    queries match literally instead of through a hashed vector.
+  - The two rankings are fused with weighted Reciprocal Rank Fusion.
+    Ranks, not raw scores, are combined, so BM25's unbounded scores and
+    cosine similarities need no calibration.
+  - Results are kept in an LRU keyed on (normalized query, k, weights,
+    filters). The cache is cleared whenever the index version changes —
+    any process appending rows or rebuilding IVF bumps the manifest.
+  - The inverted index is extended incrementally with rows appended since
+    it was last built; nothing is re-tokenized.
+"""
+
+import math
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from local_vectors import LocalVectorIndex, _tokens
+
+K1, B       = 1.2, 0.75
+RRF_K       = 60
+CANDIDATES  = 50      # per-ranker depth fed into fusion
+CACHE_SIZE  = 512
+
+
+class BM25Index:
+    def __init__(self):
+        self.postings = {}        # token → ([doc ids], [term freqs])
+        self.doc_len = []
+        self.total_len = 0
+        self._arrays = {}         # token → numpy postings, dropped when the token gains docs
+        self._dl = None
+
+    def __len__(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, texts) -> None:
+        for text in texts:
+            doc_id = len(self.doc_len)
+            counts = {}
+            toks = _tokens(text)
+            for t in toks:
+                counts[t] = counts.get(t, 0) + 1
+            for t, c in counts.items():
+                ids, tfs = self.postings.setdefault(t, ([], []))
+                ids.append(doc_id)
+                tfs.append(c)
+                self._arrays.pop(t, None)
+            self.doc_len.append(len(toks))
+            self.total_len += len(toks)
+        self._dl = None
+
+    def search(self, query: str, k: int = CANDIDATES) -> list:
+        """[(doc id, score)] best first."""
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        if self._dl is None:
+            self._dl = np.asarray(self.doc_len, dtype=np.float32)
+        dl = self._dl
+        avgdl = self.total_len / n or 1.0
+        for t in set(_tokens(query)):
+            if t not in self.postings:
+                continue
+            if t not in self._arrays:
+                ids, tfs = self.postings[t]
+                self._arrays[t] = (np.asarray(ids), np.asarray(tfs, dtype=np.float32))
+            ids, tf = self._arrays[t]
+            idf = math.log(1.0 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl[ids] / avgdl))
+        hit = np.flatnonzero(scores)
+        if len(hit) == 0:
+            return []
+        top = hit[np.argsort(-scores[hit])[:k]]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class HybridRetriever:
+    def __init__(self, index: LocalVectorIndex, cache_size: int = CACHE_SIZE):
+        self.index = index
+        self.bm25 = BM25Index()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._version = None
+        self._row_of = {}
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        """Follow the index: clear the cache on any version change, index only the new rows."""
+        self.index.reload()
+        version = self.index.version()
+        if version == self._version:
+            return
+        self._cache.clear()
+        meta = self.index.meta()
+        if len(self.bm25) > len(meta):
+            self.bm25, self._row_of = BM25Index(), {}    # index was rebuilt smaller — start over
+        start = len(self.bm25)
+        self.bm25.add(m["text"] for m in meta[start:])
+        self._row_of.update((m["id"], row) for row, m in enumerate(meta[start:], start))
+        self._version = version
+
+    def search(self, query: str, k: int = 5, bm25_weight: float = 1.0, vector_weight: float = 1.0,
+               **filters) -> list:
+        """
+        Fused top-k as {"id", "text", "metadata", "score", "bm25_rank", "vector_rank"}.
+        filters are metadata equality constraints (e.g. doc_type="justification").
+        """
+        with self._lock:
+            self._sync()
+            key = (re.sub(r"\s+", " ", query.lower()).strip(), k, bm25_weight, vector_weight,
+                   tuple(sorted(filters.items())))
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return [dict(h) for h in self._cache[key]]
+
+            depth = max(CANDIDATES, k * 8) if filters else max(CANDIDATES, k)
+            meta = self.index.meta()
+            lexical = [i for i, _ in self.bm25.search(query, depth)]
+            semantic = [self._row_of[h["id"]] for h in self.index.search(query, k=depth)]
+
+            fused = {}
+            for weight, ranking, name in ((bm25_weight, lexical, "bm25_rank"), (vector_weight, semantic, "vector_rank")):
+                for rank, row in enumerate(ranking, 1):
+                    entry = fused.setdefault(row, {"score": 0.0, "bm25_rank": None, "vector_rank": None})
+                    entry["score"] += weight / (RRF_K + rank)
+                    entry[name] = rank
+            hits = []
+            for row, f in sorted(fused.items(), key=lambda t: -t[1]["score"]):
+                md = meta[row].get("metadata") or {}
+                if any(md.get(name) != value for name, value in filters.items()):
+                    continue
+                hits.append({**meta[row], **f, "score": round(f["score"], 6)})
+                if len(hits) >= k:
+                    break
+
+            self._cache[key] = hits
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return [dict(h) for h in hits]
+
+
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_retriever(index: LocalVectorIndex) -> HybridRetriever:
+    """
+    One retriever (and BM25 index + cache) per index directory and embedder,
+    shared by the process. Callers may open a fresh LocalVectorIndex for each
+    query: the retriever keeps its own handle and follows the on-disk version,
+    so appends through any handle are picked up without a rebuild.
+    """
+    with _retrievers_lock:
+        key = (str(index.path.resolve()), index.embedder.name)
+        if key not in _retrievers:
+            _retrievers[key] = HybridRetriever(index)
+        return _retrievers[key]
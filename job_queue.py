@@ -0,0 +1,353 @@
+"""
+OSIS – Job Queue (v1.0)
+========================
+Local queue for dashboard-triggered pipeline runs.
+
+    app.py ──submit()──▶ jobs table (SQLite) ◀──progress── worker processes
+              ◀─get()───        ▲
+                                └── dispatcher thread: schedules, reaps, logs to Citta
+
+  - Identical requests are deduplicated: a queued or running job for the same
+    (dataset, entity, use_llm, refresh) is returned instead of a new one, and a
+    finished job is reused while the entity's data version is unchanged.
+  - Jobs run in a spawned process pool, each into its own runs/jobs/<job_id>/
+    directory, so concurrent jobs never share Vaikhari files.
+  - Workers write per-stage progress straight into the jobs table; app.py polls
+    get(job_id). SQLite (not DuckDB) backs the queue because several worker
+    processes write to it at once — DuckDB allows one writer process per file.
+  - A refresh job re-ingests canonical_metrics, so it waits for running jobs to
+    drain and nothing else starts until it finishes.
+  - Only the dispatcher (in the app process) opens osis.db, to log finished runs.
+
+Usage:
+    q = JobQueue().start()
+    job_id = q.submit("cdc_mortality", "Texas")
+    q.get(job_id)   # → {"status": "running", "progress": {"logic": "ok", ...}, ...}
+"""
+
+import json
+import multiprocessing
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import stage_cache
+
+QUEUE_DB      = ".osis_jobs.sqlite"
+JOBS_DIR      = "runs/jobs"
+WORKERS       = 2
+POLL_S        = 0.5
+KEEP_FINISHED = 200
+
+ACTIVE   = ("queued", "running")
+FINISHED = ("done", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id       TEXT PRIMARY KEY,
+    dedup_key    TEXT NOT NULL,
+    result_key   TEXT,
+    dataset_id   TEXT NOT NULL,
+    entity       TEXT,
+    use_llm      INTEGER NOT NULL,
+    refresh      INTEGER NOT NULL,
+    status       TEXT NOT NULL,
+    progress     TEXT NOT NULL DEFAULT '{}',
+    result       TEXT,
+    error        TEXT,
+    run_dir      TEXT,
+    submitted_at TEXT NOT NULL,
+    started_at   TEXT,
+    finished_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedup  ON jobs (dedup_key, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_result ON jobs (result_key, status);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    con = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    return con
+
+
+def _result_key(dataset_id: str, entity: str, use_llm: bool, data_version: Optional[str]) -> Optional[str]:
+    if data_version is None:
+        return None
+    return stage_cache.fingerprint("job_result", dataset_id, entity, bool(use_llm), data_version)
+
+
+def _execute(db_path: str, job_id: str, config, run_dir: str, use_llm: bool, refresh: bool) -> dict:
+    """Worker process: run one job, streaming per-stage progress into the jobs table."""
+    import fanout_runner
+    con = _connect(db_path)
+    progress = {}
+    lock = threading.Lock()
+
+    def report(stage, state):
+        with lock:   # stages finish on several DAG threads
+            progress[stage] = state
+            con.execute("UPDATE jobs SET progress=? WHERE job_id=?", [json.dumps(progress), job_id])
+
+    try:
+        return fanout_runner._run_target(config, run_dir, use_llm, force=False,
+                                         skip_db=not refresh, progress=report)
+    finally:
+        con.close()
+
+
+def _warm_worker():
+    # import the pipeline once per worker, not once per job
+    import main  # noqa: F401
+
+
+class JobQueue:
+    def __init__(self, db_path: str = QUEUE_DB, workers: int = WORKERS, jobs_dir: str = JOBS_DIR,
+                 citta: bool = True):
+        self.db_path = db_path
+        self.workers = workers
+        self.jobs_dir = Path(jobs_dir)
+        self.citta = citta
+        self._submit_lock = threading.Lock()
+        self._futures = {}
+        self._pool = None
+        self._thread = None
+        self._stop = threading.Event()
+        con = _connect(db_path)
+        try:
+            con.executescript(_SCHEMA)
+            # running jobs from a previous app process can never report back
+            con.execute("UPDATE jobs SET status='failed', error='interrupted', finished_at=? "
+                        "WHERE status='running'", [_now()])
+        finally:
+            con.close()
+
+    # ── Public API ────────────────────────────────────────────────────────────
+    def start(self) -> "JobQueue":
+        if self._thread is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            self._thread = threading.Thread(target=self._dispatch_loop, name="osis-jobs", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, dataset_id: str, entity: Optional[str] = None, use_llm: bool = True,
+               refresh: bool = False) -> str:
+        """Queue a run and return its job id — or the id of an identical queued, running or finished job."""
+        import fanout_runner
+        cfg = fanout_runner.resolve_config(fanout_runner.Target(dataset_id, entity),
+                                           fanout_runner.load_registry())
+        entity = cfg.entity_filter
+        dedup_key = stage_cache.fingerprint("job", dataset_id, entity, bool(use_llm), bool(refresh))
+
+        with self._submit_lock:
+            con = _connect(self.db_path)
+            try:
+                row = con.execute("SELECT job_id FROM jobs WHERE dedup_key=? AND status IN ('queued','running') "
+                                  "ORDER BY submitted_at DESC LIMIT 1", [dedup_key]).fetchone()
+                if row:
+                    return row["job_id"]
+                if not refresh:
+                    try:
+                        data_ver = stage_cache.data_version(cfg)
+                    except Exception:
+                        data_ver = None   # table missing or mid-ingest — run rather than guess
+                    row = self._finished(con, dataset_id, entity, use_llm, data_ver)
+                    if row:
+                        return row["job_id"]
+
+                job_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+                con.execute("INSERT INTO jobs (job_id, dedup_key, dataset_id, entity, use_llm, refresh, "
+                            "status, run_dir, submitted_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                            [job_id, dedup_key, dataset_id, entity, int(use_llm), int(refresh),
+                             str(self.jobs_dir / job_id), _now()])
+                return job_id
+            finally:
+                con.close()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        con = _connect(self.db_path)
+        try:
+            row = con.execute("SELECT * FROM jobs WHERE job_id=?", [job_id]).fetchone()
+        finally:
+            con.close()
+        return self._row(row) if row else None
+
+    def finished(self, dataset_id: str, entity: str, use_llm: bool, data_version: Optional[str]) -> Optional[dict]:
+        """The newest successful job for exactly this (dataset, entity, use_llm, data version), if any."""
+        con = _connect(self.db_path)
+        try:
+            row = self._finished(con, dataset_id, entity, use_llm, data_version)
+        finally:
+            con.close()
+        return self._row(row) if row else None
+
+    @staticmethod
+    def _finished(con, dataset_id, entity, use_llm, data_version):
+        rkey = _result_key(dataset_id, entity, use_llm, data_version)
+        return rkey and con.execute("SELECT * FROM jobs WHERE result_key=? AND status='done' "
+                                    "ORDER BY finished_at DESC LIMIT 1", [rkey]).fetchone()
+
+    def latest(self, dataset_id: str, entity: Optional[str] = None) -> Optional[dict]:
+        """Most recent finished-successfully job for a dataset (and entity) — shared by every session."""
+        sql, params = "SELECT * FROM jobs WHERE status='done' AND dataset_id=?", [dataset_id]
+        if entity:
+            sql, params = sql + " AND entity=?", params + [entity]
+        con = _connect(self.db_path)
+        try:
+            row = con.execute(sql + " ORDER BY finished_at DESC LIMIT 1", params).fetchone()
+        finally:
+            con.close()
+        return self._row(row) if row else None
+
+    def jobs(self, limit: int = 20) -> list:
+        con = _connect(self.db_path)
+        try:
+            rows = con.execute("SELECT * FROM jobs ORDER BY submitted_at DESC LIMIT ?", [limit]).fetchall()
+        finally:
+            con.close()
+        return [self._row(r) for r in rows]
+
+    @staticmethod
+    def _row(row) -> dict:
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"] or "{}")
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # ── Dispatcher ────────────────────────────────────────────────────────────
+    def _dispatch_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._reap()
+                self._schedule()
+            except Exception:
+                traceback.print_exc()
+            self._stop.wait(POLL_S)
+
+    def _schedule(self) -> None:
+        con = _connect(self.db_path)
+        try:
+            running = con.execute("SELECT job_id, refresh FROM jobs WHERE status='running'").fetchall()
+            if any(r["refresh"] for r in running):
+                return   # re-ingest in progress — canonical_metrics is being rebuilt
+            for job in con.execute("SELECT * FROM jobs WHERE status='queued' ORDER BY submitted_at").fetchall():
+                if job["refresh"]:
+                    if not running:
+                        self._start(con, job)
+                    return   # nothing may overtake a waiting refresh
+                if len(running) >= self.workers:
+                    return
+                self._start(con, job)
+                running.append(job)
+        finally:
+            con.close()
+
+    def _start(self, con, job) -> None:
+        import fanout_runner
+        cfg = fanout_runner.resolve_config(fanout_runner.Target(job["dataset_id"], job["entity"]),
+                                           fanout_runner.load_registry())
+        con.execute("UPDATE jobs SET status='running', started_at=? WHERE job_id=?", [_now(), job["job_id"]])
+        fut = self._pool.submit(_execute, self.db_path, job["job_id"], cfg, job["run_dir"],
+                                bool(job["use_llm"]), bool(job["refresh"]))
+        self._futures[fut] = (job["job_id"], cfg)
+
+    def _reap(self) -> None:
+        for fut in [f for f in self._futures if f.done()]:
+            job_id, cfg = self._futures.pop(fut)
+            job = self.get(job_id)
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            ok = res.get("status") in ("ok", "partial")
+            spans = res.pop("spans", None) or []
+            if ok and self.citta:
+                self._log_to_citta(cfg, job["run_dir"], res, spans)
+            rkey = _result_key(job["dataset_id"], job["entity"], job["use_llm"], res.get("data_version")) if ok else None
+            con = _connect(self.db_path)
+            try:
+                con.execute("UPDATE jobs SET status=?, result=?, error=?, result_key=?, finished_at=? "
+                            "WHERE job_id=?",
+                            ["done" if ok else "failed", json.dumps(res, default=str),
+                             None if ok else json.dumps(res.get("errors") or res.get("error"), default=str),
+                             rkey, _now(), job_id])
+            finally:
+                con.close()
+            self.prune()
+
+    def _log_to_citta(self, cfg, run_dir: str, res: dict, spans: list) -> None:
+        import contextlib
+        import main
+        import tracing
+        fact_packet = res.get("fact_packet") or {}
+        if fact_packet.get("status") != "success":
+            return
+        with open(Path(run_dir) / "pipeline.log", "a") as log, contextlib.redirect_stdout(log):
+            main.log_run_to_citta(cfg, fact_packet, run_dir, res.get("wall_ms"), res.get("run_id"),
+                                  [tracing.Span(**d) for d in spans])
+
+    def prune(self, keep: int = KEEP_FINISHED) -> int:
+        """Delete finished jobs (and their run directories) beyond the newest `keep`."""
+        con = _connect(self.db_path)
+        try:
+            rows = con.execute("SELECT job_id, run_dir FROM jobs WHERE status IN ('done','failed') "
+                               "ORDER BY finished_at DESC LIMIT -1 OFFSET ?", [keep]).fetchall()
+            for r in rows:
+                if r["run_dir"]:
+                    shutil.rmtree(r["run_dir"], ignore_errors=True)
+                con.execute("DELETE FROM jobs WHERE job_id=?", [r["job_id"]])
+        finally:
+            con.close()
+        return len(rows)
+
+
+def wait_for(queue: JobQueue, job_id: str, timeout: float = 600.0) -> dict:
+    """Block until a job finishes (CLI and scripts; the dashboard polls get() instead)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job is None or job["status"] in FINISHED or time.monotonic() > deadline:
+            return job
+        time.sleep(POLL_S)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Submit OSIS runs to the local job queue and wait")
+    parser.add_argument("targets", nargs="+", help="dataset[:entity]")
+    parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--refresh", action="store_true")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    q = JobQueue(workers=args.workers).start()
+    ids = []
+    for spec in args.targets:
+        ds, _, ent = spec.partition(":")
+        ids.append(q.submit(ds, ent or None, use_llm=not args.no_llm, refresh=args.refresh))
+    for job_id in dict.fromkeys(ids):
+        job = wait_for(q, job_id)
+        print(f"  {job['status']:<7} {job_id}  {job['dataset_id']}:{job['entity']}  {job['progress']}")
+    q.stop()
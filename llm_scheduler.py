@@ -0,0 +1,258 @@
+"""
+OSIS – LLM Request Scheduler (v1.0)
+====================================
+One local Ollama instance serves every narration. Callers submit work here
+instead of firing requests ad hoc:
+
+  - Priority queue ordered by Chanakya urgency: CRITICAL first, MONITOR
+    last, FIFO within a level.
+  - At most `concurrency` requests in flight (default 1 — Ollama serializes
+    generation on one model anyway; more only adds queueing inside it).
+  - Every request carries a deadline. Before each dispatch, the scheduler
+    estimates when each queued request would start from an EWMA of recent
+    call latency. Requests that cannot finish by their deadline are shed
+    from the lowest priority up. Nothing is shed on estimates until one
+    call has completed; until then, requests only expire at dispatch. Queued and shed requests never reach the
+    model, so a slow model degrades to deterministic output instead of
+    stalling the batch.
+  - Shed, expired and failed requests resolve to their fallback value.
+    For narration that is the deterministic fallback from
+    narration_firewall.narrate_with_budget.
+
+Batch use:
+    from llm_scheduler import narrate_many
+    results = narrate_many(chanakya_outputs, budget_s=60)
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Optional
+
+URGENCY_PRIORITY = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "MONITOR": 4}
+CONCURRENCY      = 1
+DEADLINE_S       = 120.0
+EWMA_ALPHA       = 0.3
+
+
+class Ticket:
+    """Handle for one submitted request. status: queued → running → done | shed | expired | error."""
+
+    def __init__(self, fn, fallback, priority: int, deadline: float, label: str):
+        self.fn, self.fallback = fn, fallback
+        self.priority, self.deadline, self.label = priority, deadline, label
+        self.status = "queued"
+        self.value = None
+        self.error: Optional[str] = None
+        self.latency_ms: Optional[float] = None
+        self._done = threading.Event()
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def result(self, timeout: Optional[float] = None):
+        self._done.wait(timeout)
+        return self.value
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _resolve(self, status: str, value=None, error: Optional[str] = None) -> None:
+        self.status, self.error = status, error
+        if status != "done":
+            try:
+                value = self.fallback() if self.fallback else None
+            except Exception as e:
+                value, self.error = None, f"fallback failed: {e}"
+        self.value = value
+        self._done.set()
+
+
+class LLMScheduler:
+    def __init__(self, concurrency: int = CONCURRENCY, default_deadline_s: float = DEADLINE_S):
+        self.concurrency = max(1, int(concurrency))
+        self.default_deadline_s = default_deadline_s
+        self.est_s = None           # EWMA call latency; None until a call completes
+        self._heap = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._running = 0
+        self._workers = []
+        self._stopped = False
+        self.stats = {"done": 0, "shed": 0, "expired": 0, "error": 0}
+
+    def start(self) -> "LLMScheduler":
+        with self._cv:
+            if not self._workers:
+                self._stopped = False
+                self._workers = [threading.Thread(target=self._loop, name=f"llm-sched-{i}", daemon=True)
+                                 for i in range(self.concurrency)]
+                for w in self._workers:
+                    w.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop accepting work; everything still queued resolves to its fallback."""
+        with self._cv:
+            self._stopped = True
+            pending, self._heap = self._heap, []
+            self._cv.notify_all()
+        for *_, t in pending:
+            self._finish(t, "shed", error="scheduler stopped")
+        for w in self._workers:
+            w.join(timeout=1)
+        self._workers = []
+
+    def submit(self, fn: Callable[[float], object], urgency: str = "MONITOR", deadline_s: Optional[float] = None,
+               fallback: Optional[Callable[[], object]] = None, label: str = "") -> Ticket:
+        """
+        fn(timeout_s) runs the request and must honour timeout_s (the time
+        left before its deadline). fallback() supplies the value when the
+        request is shed, expires, or raises.
+        """
+        deadline = time.monotonic() + (deadline_s if deadline_s is not None else self.default_deadline_s)
+        t = Ticket(fn, fallback, URGENCY_PRIORITY.get(str(urgency).upper(), len(URGENCY_PRIORITY)), deadline, label)
+        self.start()
+        with self._cv:
+            if self._stopped:
+                stopped = True
+            else:
+                stopped = False
+                heapq.heappush(self._heap, (t.priority, next(self._seq), t))
+                self._cv.notify()
+        if stopped:
+            self._finish(t, "shed", error="scheduler stopped")
+        return t
+
+    def pending(self) -> int:
+        with self._cv:
+            return len(self._heap)
+
+    def _shed(self) -> list:
+        """Drop queued tickets whose estimated start + one call overruns their deadline. Call under _cv."""
+        if self.est_s is None:
+            return []
+        now, keep, shed = time.monotonic(), [], []
+        free = max(0, self.concurrency - self._running)
+        for pos, entry in enumerate(sorted(self._heap)):
+            t = entry[-1]
+            # queue position → waves of `concurrency` calls ahead of this one
+            waves = 0 if pos < free else 1 + (pos - free) // self.concurrency
+            if now + (waves + 1) * self.est_s > t.deadline:
+                shed.append(t)
+            else:
+                keep.append(entry)
+        if shed:
+            self._heap = keep
+            heapq.heapify(self._heap)
+        return shed
+
+    def _loop(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap and not self._stopped:
+                    self._cv.wait()
+                if self._stopped:
+                    return
+                shed = self._shed()
+                t = heapq.heappop(self._heap)[-1] if self._heap else None
+                if t is not None:
+                    self._running += 1
+                    t.status = "running"
+            for s in shed:
+                self._finish(s, "shed", error="deadline budget exhausted")
+            if t is None:
+                continue
+            t0 = time.monotonic()
+            ran = False
+            try:
+                remaining = t.remaining()
+                if remaining <= 0:
+                    self._finish(t, "expired")
+                else:
+                    ran = True
+                    value = t.fn(remaining)
+                    if time.monotonic() > t.deadline:
+                        self._finish(t, "expired")
+                    else:
+                        self._finish(t, "done", value)
+            except Exception as e:
+                self._finish(t, "error", error=str(e)[:120])
+            finally:
+                elapsed = time.monotonic() - t0
+                with self._cv:
+                    self._running -= 1
+                    # tickets that expired before dispatch say nothing about call latency
+                    if ran and t.status in ("done", "expired"):
+                        self.est_s = elapsed if self.est_s is None \
+                            else (1 - EWMA_ALPHA) * self.est_s + EWMA_ALPHA * elapsed
+                    t.latency_ms = round(elapsed * 1000, 1)
+
+    def _finish(self, t: Ticket, status: str, value=None, error: Optional[str] = None) -> None:
+        t._resolve(status, value, error)
+        with self._cv:
+            self.stats[status] = self.stats.get(status, 0) + 1
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide scheduler shared by every narration caller."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler().start()
+        return _scheduler
+
+
+def schedule_narration(chanakya_data: dict, deadline_s: Optional[float] = None,
+                       scheduler: Optional[LLMScheduler] = None, stats: Optional[list] = None) -> Ticket:
+    """
+    Queue one Chanakya narration at its urgency. The ticket's value is
+    (text, firewall status) from narrate_with_budget. It is deterministic
+    fallback text whenever the model cannot answer in time. The PromptStats
+    of each generation attempt are appended to `stats` when given.
+    """
+    from chanakya_agent import render_request_for, render_narration
+    from narration_firewall import narrate_with_budget
+    scheduler = scheduler or get_scheduler()
+    render_request = render_request_for(chanakya_data)
+
+    def run(timeout_s):
+        deadline = time.monotonic() + timeout_s
+
+        def render(rr, stricter=False):
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return None   # retry budget spent — narrate_with_budget falls back
+            text, prompt_stats = render_narration(rr, stricter=stricter, timeout=left)
+            if stats is not None:
+                stats.append(prompt_stats)
+            return text
+        return narrate_with_budget(render, render_request, chanakya_data)
+
+    def fallback():
+        return narrate_with_budget(lambda rr, stricter=False: None, render_request, chanakya_data)
+
+    label = f"{chanakya_data.get('entity_filter', '')}:{chanakya_data.get('urgency', '')}"
+    return scheduler.submit(run, urgency=chanakya_data.get("urgency", "MONITOR"),
+                            deadline_s=deadline_s, fallback=fallback, label=label)
+
+
+def narrate_many(chanakya_outputs: list, budget_s: float = DEADLINE_S,
+                 scheduler: Optional[LLMScheduler] = None) -> list:
+    """
+    Narrate many Chanakya outputs under one shared deadline. Returns one
+    {"entity", "urgency", "narration", "firewall", "status", "latency_ms"}
+    per output, in input order.
+    """
+    tickets = [schedule_narration(c, deadline_s=budget_s, scheduler=scheduler) for c in chanakya_outputs]
+    out = []
+    for c, t in zip(chanakya_outputs, tickets):
+        text, firewall = t.result(timeout=max(0.0, t.remaining()) + 5) or (None, None)
+        out.append({"entity": c.get("entity_filter"), "urgency": c.get("urgency"), "narration": text,
+                    "firewall": firewall, "status": t.status, "latency_ms": t.latency_ms})
+    return out
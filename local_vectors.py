@@ -0,0 +1,347 @@
+"""
+OSIS – Local Vector Index (v1.0)
+=================================
+Air-gapped retrieval backend for vector_database.py: no network, no API key.
+
+Embedding:
+  - SentenceTransformerEmbedder — a CPU model loaded from local files only,
+    used when sentence-transformers is installed and OSIS_EMBED_MODEL names
+    a model directory or cached model.
+  - HashedTfidfEmbedder — the always-available fallback. Word unigrams and
+    bigrams are hashed (crc32) into DIM signed buckets with sublinear TF and
+    L2-normalized. IDF is applied on the query side from document
+    frequencies kept with the index, so stored vectors never go stale as
+    the corpus grows.
+
+Storage (one directory per index):
+    vectors.f32     raw float32 rows, append-only, read through np.memmap
+    meta.jsonl      one {"id", "text", "metadata"} line per row
+    df.npy          per-bucket document frequencies (hashed embedder)
+    manifest.json   dim, row count, embedder name, IVF state
+    ivf.npz         optional coarse partition (centroids + row lists)
+
+Search is a batched matrix product over the memmap in CHUNK_ROWS blocks with
+argpartition top-k, so memory stays flat however large the index grows.
+build_ivf() adds k-means partitioning: queries then scan only the NPROBE
+nearest lists plus any rows added after the build.
+"""
+
+import json
+import os
+import re
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:   # Windows: single-writer use only
+    fcntl = None
+
+DIM        = 1024
+CHUNK_ROWS = 65536
+NPROBE     = 8
+IVF_MIN    = 20000   # below this a full scan is already fast
+_TOKEN     = re.compile(r"[a-z0-9_.%+-]*[a-z0-9%]")
+
+
+# ── Embedders ─────────────────────────────────────────────────────────────────
+def _tokens(text: str) -> list:
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    words = _TOKEN.findall(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashedTfidfEmbedder:
+    name = "hashed_tfidf"
+
+    def __init__(self, dim: int = DIM):
+        self.dim = dim
+
+    def _buckets(self, text: str) -> dict:
+        counts = {}
+        for tok in _tokens(text):
+            h = zlib.crc32(tok.encode("utf-8"))
+            b = h % self.dim
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            counts[b] = counts.get(b, 0.0) + sign
+        return counts
+
+    def embed(self, texts: list, idf: Optional[np.ndarray] = None) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for b, c in self._buckets(text).items():
+                out[i, b] = np.sign(c) * (1.0 + np.log(abs(c))) if c else 0.0
+        if idf is not None:
+            out *= idf
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms == 0, 1.0, norms)
+
+    def doc_buckets(self, vectors: np.ndarray) -> np.ndarray:
+        """Which buckets each document touches — feeds the document-frequency counts."""
+        return (vectors != 0).sum(axis=0)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu", local_files_only=True)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def embed(self, texts: list, idf=None) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=64, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+def get_embedder(name: Optional[str] = None):
+    """'hashed_tfidf', 'st:<model>' or None (auto: OSIS_EMBED_MODEL if loadable, else hashed)."""
+    name = name or (f"st:{os.environ['OSIS_EMBED_MODEL']}" if os.environ.get("OSIS_EMBED_MODEL") else None)
+    if name and name.startswith("st:"):
+        try:
+            return SentenceTransformerEmbedder(name[3:])
+        except Exception as e:
+            print(f"  ⚠️  Embedding model unavailable ({e}) — using hashed TF-IDF")
+    return HashedTfidfEmbedder()
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+class LocalVectorIndex:
+    def __init__(self, path: str, embedder=None):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest and embedder is None:
+            embedder = get_embedder(manifest["embedder"])
+        self.embedder = embedder or get_embedder()
+        if manifest and manifest["embedder"] != self.embedder.name:
+            raise ValueError(f"Index at {path} was built with {manifest['embedder']}, "
+                             f"not {self.embedder.name} — rebuild it or open with the same embedder")
+        self.dim = self.embedder.dim
+        self.count = manifest["count"] if manifest else 0
+        self.ivf_rows = manifest.get("ivf_rows", 0) if manifest else 0
+        self._df = np.load(self.path / "df.npy") if (self.path / "df.npy").exists() \
+            else np.zeros(self.dim, dtype=np.float64)
+        self._meta = None
+        self._ids = None
+        self._mm = None
+        self._ivf = None
+
+    # ── Files ─────────────────────────────────────────────────────────────────
+    def _read_manifest(self) -> Optional[dict]:
+        p = self.path / "manifest.json"
+        return json.loads(p.read_text()) if p.exists() else None
+
+    def _write_manifest(self) -> None:
+        tmp = self.path / f"manifest.{os.getpid()}.tmp"
+        tmp.write_text(json.dumps({"dim": self.dim, "count": self.count, "embedder": self.embedder.name,
+                                   "ivf_rows": self.ivf_rows}))
+        tmp.replace(self.path / "manifest.json")
+
+    def _matrix(self) -> np.ndarray:
+        if self.count == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        if self._mm is None or self._mm.shape[0] != self.count:
+            self._mm = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode="r",
+                                 shape=(self.count, self.dim))
+        return self._mm
+
+    def meta(self) -> list:
+        if self._meta is None:
+            p = self.path / "meta.jsonl"
+            lines = p.read_text().splitlines()[:self.count] if p.exists() else []
+            self._meta = [json.loads(line) for line in lines]
+            self._ids = {m["id"]: i for i, m in enumerate(self._meta)}
+        return self._meta
+
+    def __contains__(self, id_) -> bool:
+        self.meta()
+        return id_ in self._ids
+
+    def __len__(self) -> int:
+        return self.count
+
+    # ── Write ─────────────────────────────────────────────────────────────────
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive lock across processes (advisory flock where available)."""
+        with open(self.path / ".lock", "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def version(self) -> tuple:
+        """Changes whenever any process appends rows or rebuilds the IVF."""
+        try:
+            return (self.path / "manifest.json").stat().st_mtime_ns, self.count, self.ivf_rows
+        except FileNotFoundError:
+            return 0, self.count, self.ivf_rows
+
+    def reload(self) -> bool:
+        """Pick up rows another process appended. Returns True when anything changed."""
+        manifest = self._read_manifest()
+        count = manifest["count"] if manifest else 0
+        ivf_rows = manifest.get("ivf_rows", 0) if manifest else 0
+        if (count, ivf_rows) == (self.count, self.ivf_rows):
+            return False
+        self.count, self.ivf_rows = count, ivf_rows
+        self._df = np.load(self.path / "df.npy") if (self.path / "df.npy").exists() \
+            else np.zeros(self.dim, dtype=np.float64)
+        self._meta = self._mm = self._ivf = None
+        return True
+
+    def _refresh(self) -> None:
+        """reload(), then drop any tail a crashed writer left behind. Call under the write lock."""
+        self.reload()
+        count = self.count
+        vec_path, meta_path = self.path / "vectors.f32", self.path / "meta.jsonl"
+        if vec_path.exists() and vec_path.stat().st_size > count * self.dim * 4:
+            self._mm = None
+            os.truncate(vec_path, count * self.dim * 4)
+        if meta_path.exists():
+            lines = meta_path.read_text().splitlines(keepends=True)
+            if len(lines) > count:
+                meta_path.write_text("".join(lines[:count]))
+                self._meta = None
+
+    def add_texts(self, texts: list, ids: Optional[list] = None, metadatas: Optional[list] = None,
+                  batch_size: int = 256) -> list:
+        """Embed and append in batches. Ids already in the index are skipped. Returns the ids added."""
+        with self._write_lock():
+            self._refresh()
+            return self._append(texts, ids, metadatas, batch_size)
+
+    def _append(self, texts, ids, metadatas, batch_size) -> list:
+        self.meta()
+        ids = list(ids) if ids is not None else [None] * len(texts)
+        metadatas = list(metadatas) if metadatas is not None else [None] * len(texts)
+        rows, seen = [], set()
+        for i, (text, id_, md) in enumerate(zip(texts, ids, metadatas)):
+            id_ = id_ if id_ is not None else f"doc-{self.count + i}"
+            if id_ in self._ids or id_ in seen:
+                continue
+            seen.add(id_)
+            rows.append((str(text), id_, md))
+        added = []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            vecs = self.embedder.embed([t for t, _, _ in batch])
+            with open(self.path / "vectors.f32", "ab") as f:
+                f.write(np.ascontiguousarray(vecs, dtype=np.float32).tobytes())
+            with open(self.path / "meta.jsonl", "a") as f:
+                for text, id_, md in batch:
+                    f.write(json.dumps({"id": id_, "text": text, "metadata": md}, default=str) + "\n")
+                    self._ids[id_] = len(self._meta)
+                    self._meta.append({"id": id_, "text": text, "metadata": md})
+            if hasattr(self.embedder, "doc_buckets"):
+                self._df += self.embedder.doc_buckets(vecs)
+            self.count += len(batch)
+            added.extend(id_ for _, id_, _ in batch)
+        if added:
+            if hasattr(self.embedder, "doc_buckets"):
+                np.save(self.path / "df.npy", self._df)
+            self._write_manifest()
+        return added
+
+    def build_ivf(self, nlist: Optional[int] = None, iters: int = 10, sample: int = 50000, seed: int = 0) -> int:
+        """Spherical k-means partitioning of the current rows. Returns the number of lists."""
+        with self._write_lock():
+            self._refresh()
+            return self._build_ivf(nlist, iters, sample, seed)
+
+    def _build_ivf(self, nlist, iters, sample, seed) -> int:
+        X = self._matrix()
+        n = X.shape[0]
+        if n == 0:
+            return 0
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        train = np.asarray(X[np.sort(rng.choice(n, size=min(n, sample), replace=False))])
+        centroids = train[rng.choice(len(train), size=min(nlist, len(train)), replace=False)].copy()
+        for _ in range(iters):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = train[assign == c]
+                if len(members):
+                    v = members.sum(axis=0)
+                    centroids[c] = v / (np.linalg.norm(v) or 1.0)
+        assign = np.concatenate([np.argmax(X[s:s + CHUNK_ROWS] @ centroids.T, axis=1)
+                                 for s in range(0, n, CHUNK_ROWS)])
+        order = np.argsort(assign, kind="stable")
+        offsets = np.searchsorted(assign[order], np.arange(len(centroids) + 1))
+        np.savez(self.path / "ivf.npz", centroids=centroids, order=order, offsets=offsets)
+        self.ivf_rows = n
+        self._ivf = None
+        self._write_manifest()
+        return len(centroids)
+
+    # ── Read ──────────────────────────────────────────────────────────────────
+    def _query_vectors(self, texts: list) -> np.ndarray:
+        if isinstance(self.embedder, HashedTfidfEmbedder):
+            idf = np.log((1.0 + self.count) / (1.0 + self._df)).astype(np.float32) + 1.0
+            return self.embedder.embed(texts, idf=idf)
+        return self.embedder.embed(texts)
+
+    def _load_ivf(self):
+        if self._ivf is None and self.ivf_rows and (self.path / "ivf.npz").exists():
+            z = np.load(self.path / "ivf.npz")
+            self._ivf = (z["centroids"], z["order"], z["offsets"])
+        return self._ivf
+
+    def search(self, queries, k: int = 5, nprobe: int = NPROBE, use_ivf: Optional[bool] = None) -> list:
+        """
+        Top-k for one query string or a batch. Returns one list per query of
+        {"id", "text", "metadata", "score"} (a single list for a single string).
+        """
+        single = isinstance(queries, str)
+        texts = [queries] if single else list(queries)
+        if self.count == 0 or not texts:
+            return [] if single else [[] for _ in texts]
+        Q = self._query_vectors(texts)
+        k = min(k, self.count)
+        X = self._matrix()
+        ivf = self._load_ivf() if (use_ivf if use_ivf is not None else self.ivf_rows >= IVF_MIN) else None
+
+        best_s = np.full((len(texts), k), -np.inf, dtype=np.float32)
+        best_i = np.full((len(texts), k), -1, dtype=np.int64)
+
+        def merge(rows_idx, block):
+            nonlocal best_s, best_i
+            s = Q @ block.T                                  # (m, rows)
+            take = min(k, s.shape[1])
+            part = np.argpartition(-s, take - 1, axis=1)[:, :take]
+            cand_s = np.concatenate([best_s, np.take_along_axis(s, part, axis=1)], axis=1)
+            cand_i = np.concatenate([best_i, rows_idx[part]], axis=1)
+            top = np.argsort(-cand_s, axis=1)[:, :k]
+            best_s = np.take_along_axis(cand_s, top, axis=1)
+            best_i = np.take_along_axis(cand_i, top, axis=1)
+
+        if ivf is not None:
+            centroids, order, offsets = ivf
+            probe = np.unique(np.argsort(-(Q @ centroids.T), axis=1)[:, :nprobe])
+            if len(probe) > len(centroids) // 2:
+                ivf = None   # a large batch touches most lists — a sequential scan is cheaper than gathers
+        if ivf is None:
+            for s in range(0, self.count, CHUNK_ROWS):
+                merge(np.arange(s, min(s + CHUNK_ROWS, self.count)), X[s:s + CHUNK_ROWS])
+        else:
+            rows = np.unique(np.concatenate(
+                [order[offsets[c]:offsets[c + 1]] for c in probe] +
+                [np.arange(self.ivf_rows, self.count)]))        # rows added since the build
+            for s in range(0, len(rows), CHUNK_ROWS):
+                idx = rows[s:s + CHUNK_ROWS]
+                merge(idx, X[idx])
+
+        meta = self.meta()
+        results = [[{**meta[i], "score": round(float(sc), 4)} for sc, i in zip(srow, irow) if i >= 0]
+                   for srow, irow in zip(best_s, best_i)]
+        return results[0] if single else results
@@ -1,16 +1,31 @@
-from citta import init_citta, append_memory
-from rajas_escalation import evaluate_rajas
+from citta import init_citta, append_memory, compact_citta, log_spans
+from rajas_escalation import evaluate_rajas_batch
 import argparse
 import sys
+from pathlib import Path
 from dataset_config import get_default_config
 from database_init import initialize_osis_db
 from analysis import run_logic_audit
 from forecast_agent import run_forecast_agent
+import stage_cache
+import precedent_index
+import tracing
+import pipeline_dag
+from pipeline_dag import Stage, CONTINUE
 
-def run_pipeline(config=None, skip_db=False, use_llm=True):
+def run_pipeline(config=None, skip_db=False, use_llm=True, force=False, profile=False,
+                 output_dir=".", citta=True, progress=None):
+    """
+    Run one (dataset, entity, metric) target. Stage outputs land in output_dir.
+    citta=False leaves osis.db untouched so a parent process can log serially
+    (see fanout_runner — DuckDB allows one writer process per file).
+    progress(stage, state) receives per-stage updates (see job_queue).
+    """
     if config is None:
         config = get_default_config()
-    init_citta()
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    if citta:
+        init_citta()
     print("="*55)
     print("  OSIS Pipeline v2.0")
     print("="*55)
@@ -19,53 +34,233 @@ def run_pipeline(config=None, skip_db=False, use_llm=True):
     print(f"  Metric : {config.metric_name}")
     print(f"  Entity : {config.entity_filter}")
     print("="*55)
-    if not skip_db:
+
+    def out(name):
+        return str(Path(output_dir) / name)
+
+    def ingest(r):
+        if skip_db:
+            print("\nSTEP 1 -- Skipped")
+            return config
         print("\nSTEP 1 -- Data Ingestion")
-        config = initialize_osis_db(config)
-        if config is None:
-            print("Ingestion failed"); sys.exit(1)
-    else:
-        print("\nSTEP 1 -- Skipped")
-    print("\nSTEP 2 -- Logic Agent")
-    fact_packet = run_logic_audit(config=config, export_json=True)
-    if fact_packet.get("status") != "success":
-        print(f"Logic Agent failed: {fact_packet.get('message')}"); sys.exit(1)
-    print("\nSTEP 3 -- Inference Agent")
-    try:
-        import requests
-        requests.get("http://127.0.0.1:11434/", timeout=3)
-        llm_available = True
-    except Exception:
-        llm_available = False
-    if use_llm and llm_available:
-        from summarization import generate_strategic_brief
-        generate_strategic_brief(input_file="logic_output.json", export=True)
-    else:
-        print("  Ollama unavailable -- deterministic brief only")
-    print("\nSTEP 4 -- Forecast Agent")
-    run_forecast_agent(config=config)
-    
-    print("\nSTEP 5 -- Chanakya Layer (Mimamsa Minister)")
-    from chanakya_agent import run_chanakya_agent
-    run_chanakya_agent(config=config)
+        return initialize_osis_db(config)
+
+    def fingerprint(r):
+        try:
+            return stage_cache.data_version(r["ingest"])
+        except Exception as e:
+            print(f"  Stage cache: disabled — {e}")
+            return None
+
+    def llm_probe(r):
+        if not use_llm:
+            return False  # no probe, no `requests` import
+        try:
+            import requests
+            requests.get("http://127.0.0.1:11434/", timeout=3)
+            return True
+        except Exception:
+            return False
+
+    def logic(r):
+        print("\nSTEP 2 -- Logic Agent")
+        cfg, data_ver = r["ingest"], r["fingerprint"]
+        key = stage_cache.fingerprint("logic", data_ver, stage_cache.code_version("analysis"),
+            stage_cache.config_fields(cfg, "domain", "metric_name", "entity_filter", "rolling_window",
+                                      "anomaly_threshold", "critical_threshold", "schema_version"))
+        fact_packet, hit = stage_cache.run_cached("logic", key,
+            lambda: run_logic_audit(config=cfg, export_json=True, output_dir=output_dir),
+            outputs=[out("logic_output.json")], force=force or data_ver is None,
+            cacheable=lambda res: res.get("status") == "success")
+        if hit: print("  Cache hit -- logic_output.json restored")
+        if fact_packet.get("status") != "success":
+            print(f"Logic Agent failed: {fact_packet.get('message')}")
+        return {"key": key, "fact_packet": fact_packet}
+
+    def brief(r):
+        print("\nSTEP 3 -- Inference Agent")
+        from summarization import generate_strategic_brief, commentary_cached, MODEL_NAME, COMMENTARY_CACHE
+        fact_packet = r["logic"]["fact_packet"]
+        # a warmed commentary cache answers without Ollama
+        warm = fact_packet.get("status") == "success" and commentary_cached(fact_packet["payload"])
+        if not (use_llm and (r["llm_probe"] or warm)):
+            print("  Ollama unavailable -- deterministic brief only")
+            return None
+        key = stage_cache.fingerprint("brief", r["logic"]["key"], MODEL_NAME,
+                                      stage_cache.code_version("summarization"),
+                                      warm and stage_cache.file_version(COMMENTARY_CACHE))
+        text, hit = stage_cache.run_cached("brief", key,
+            lambda: generate_strategic_brief(input_file=out("logic_output.json"), export=True,
+                                             output_file=out("strategic_brief.txt")),
+            outputs=[out("strategic_brief.txt")], force=force, cacheable=bool)
+        if hit: print("  Cache hit -- strategic_brief.txt restored")
+        return text
+
+    def forecast(r):
+        print("\nSTEP 4 -- Forecast Agent")
+        cfg, data_ver = r["ingest"], r["fingerprint"]
+        key = stage_cache.fingerprint("forecast", data_ver, stage_cache.code_version("forecast_agent"),
+            stage_cache.config_fields(cfg, "domain", "metric_name", "entity_filter", "forecast_horizon",
+                                      "lag_periods", "schema_version"))
+        # Prophet fit is CPU-bound — run it in a worker process, not a thread
+        result, hit = stage_cache.run_cached("forecast", key,
+            lambda: pipeline_dag.in_process(run_forecast_agent, cfg, output_dir),
+            outputs=[out("forecast_output.json")], force=force or data_ver is None,
+            cacheable=lambda res: res.get("status") == "success")
+        if hit: print("  Cache hit -- forecast_output.json restored")
+        return result
+
+    def chanakya(r):
+        print("\nSTEP 5 -- Chanakya Layer (Mimamsa Minister)")
+        from chanakya_agent import run_chanakya_agent
+        cfg = r["ingest"]
+        # Chanakya reads forecast_output.json and the precedent index from disk — key on what is actually there
+        key = stage_cache.fingerprint("chanakya", r["logic"]["key"], stage_cache.file_version(out("forecast_output.json")),
+            precedent_index.index_version(cfg.domain, cfg.metric_name),
+            use_llm and r["llm_probe"],
+            stage_cache.code_version("chanakya_agent"),
+            cfg.entity_filter, cfg.schema_version)
+        result, hit = stage_cache.run_cached("chanakya", key,
+            lambda: run_chanakya_agent(config=cfg, output_dir=output_dir),
+            outputs=[out("chanakya_output.json")], force=force,
+            cacheable=lambda res: res.get("status") == "success")
+        if hit: print("  Cache hit -- chanakya_output.json restored")
+        return result
+
+    stages = [
+        Stage("ingest",      ingest,      check=lambda cfg: cfg is not None),
+        Stage("llm_probe",   llm_probe,   on_failure=CONTINUE),
+        Stage("fingerprint", fingerprint, deps=("ingest",)),
+        Stage("logic",       logic,       deps=("fingerprint",),
+              check=lambda res: res["fact_packet"].get("status") == "success"),
+        Stage("brief",       brief,       deps=("logic", "llm_probe"), on_failure=CONTINUE),
+        Stage("forecast",    forecast,    deps=("fingerprint",), on_failure=CONTINUE),
+        Stage("chanakya",    chanakya,    deps=("logic", "forecast"), on_failure=CONTINUE),
+    ]
+    run_id = tracing.reset()
+    profile_dir = f"{tracing.PROFILE_DIR}/{run_id}" if profile else None
+    with tracing.span("osis_pipeline", kind="pipeline", entity=config.entity_filter) as root:
+        report = pipeline_dag.run_dag(stages, profile_dir=profile_dir, on_progress=progress)
+    pipeline_dag.print_report(report)
+    if report.status.get("logic") != "ok":
+        print("\nOSIS Pipeline aborted")
+        return report
+    config = report.results["ingest"]
+    fact_packet = report.results["logic"]["fact_packet"]
+    spans = tracing.spans()
+    if citta:
+        evaluate_rajas_runs([(config, fact_packet, output_dir)])
+        log_run_to_citta(config, fact_packet, output_dir, int(root.wall_ms), run_id, spans)
+    if profile_dir:
+        tracing.write_collapsed(f"{profile_dir}/spans.collapsed", spans)
+        print(f"  Profile: {profile_dir}/ (per-stage profiles + spans.collapsed flamegraph)")
+    print("\nOSIS Pipeline Complete")
+    print(f"  {Path(output_dir, 'logic_output.json')}    -> LogicAgent Fact Packet")
+    print(f"  {Path(output_dir, 'strategic_brief.txt')}  -> Governed Strategic Brief")
+    print(f"  {Path(output_dir, 'forecast_output.json')} -> Prophet Forecast")
+    return report
+
+def evaluate_rajas_runs(runs):
+    """
+    Update Rajas streaks for finished runs — [(config, fact_packet, output_dir)] —
+    with one Citta transaction per domain. A reporting-lag Sutra counts as a
+    known cause. Streaks advance once per observed period (payload.timestamp),
+    so re-running unchanged data never escalates. Returns {metric_key: RajasResult}.
+    """
+    import json as _j
+    by_domain = {}
+    for config, fact_packet, output_dir in runs:
+        try: action = _j.loads(Path(output_dir, "chanakya_output.json").read_text()).get("sutra_applied", {}).get("action", "")
+        except Exception: action = ""
+        key = f"{config.domain}:{config.metric_name}:{config.entity_filter}"
+        payload = fact_packet.get("payload", {})
+        z = payload.get("analysis", {}).get("z_score") or 0.0
+        by_domain.setdefault(config.domain, {})[key] = (key, z, action == "flag_reporting_lag",
+                                                        payload.get("timestamp"))
+    results = {}
+    for domain, obs in by_domain.items():
+        try:
+            results.update(zip(obs, evaluate_rajas_batch(obs.values(), domain)))
+        except Exception as e:
+            print(f"  Rajas: skipped for {domain} — {e}")
+    escalated = [k for k, r in results.items() if r.escalate]
+    if results:
+        print(f"  Rajas: {len(results)} streaks updated" + (f", escalated: {', '.join(escalated)}" if escalated else ""))
+    return results
+
+def log_run_to_citta(config, fact_packet, output_dir, execution_ms, run_id, spans):
+    """Write one run's agent_memory row, trace spans and retrieval documents, then apply retention."""
     try:
         import hashlib, json as _j
         _lh = hashlib.sha256(_j.dumps(fact_packet, sort_keys=True, default=str).encode()).hexdigest()
         _cd = {}
-        try: _cd = _j.loads(open("chanakya_output.json").read())
+        try: _cd = _j.loads(Path(output_dir, "chanakya_output.json").read_text())
         except: pass
-        append_memory(agent_id="osis_pipeline",domain=config.domain,metric=config.metric_name,entity=config.entity_filter,schema_version=config.schema_version,input_hash=_lh[:16],output_hash=_cd.get("payload_hash","unknown")[:16],tarka_result=_cd.get("narration_firewall","UNKNOWN"),guna_state=_cd.get("finding",{}).get("systemic_state","UNKNOWN"),urgency=_cd.get("urgency"),z_score=fact_packet.get("payload",{}).get("analysis",{}).get("z_score"),severity=fact_packet.get("payload",{}).get("analysis",{}).get("severity"),anomalies_found=fact_packet.get("payload",{}).get("total_anomalies"),escalate=_cd.get("escalate",False),sutra_action=_cd.get("sutra_applied",{}).get("action"),pancavayava_complete=_cd.get("pancavayava_complete",False))
+        append_memory(agent_id="osis_pipeline",domain=config.domain,metric=config.metric_name,entity=config.entity_filter,schema_version=config.schema_version,input_hash=_lh[:16],output_hash=_cd.get("payload_hash","unknown")[:16],tarka_result=_cd.get("narration_firewall","UNKNOWN"),guna_state=_cd.get("finding",{}).get("systemic_state","UNKNOWN"),urgency=_cd.get("urgency"),z_score=fact_packet.get("payload",{}).get("analysis",{}).get("z_score"),severity=fact_packet.get("payload",{}).get("analysis",{}).get("severity"),anomalies_found=fact_packet.get("payload",{}).get("total_anomalies"),escalate=_cd.get("escalate",False),sutra_action=_cd.get("sutra_applied",{}).get("action"),pancavayava_complete=_cd.get("pancavayava_complete",False),execution_ms=execution_ms)
         print("  Citta: logged")
     except Exception as e:
         print(f"  Citta: skipped — {e}")
-    print("\nOSIS Pipeline Complete")
-    print("  logic_output.json    -> LogicAgent Fact Packet")
-    print("  strategic_brief.txt  -> Governed Strategic Brief")
-    print("  forecast_output.json -> Prophet Forecast")
+    try:
+        log_spans(run_id, config.domain, spans)
+        print(f"  Citta: {len(spans)} trace spans logged (run {run_id})")
+        for sp in tracing.summary(spans, top=5):
+            print(f"    {sp.kind:<8} {sp.name:<18} wall {sp.wall_ms:9.1f}ms  cpu {sp.cpu_ms:9.1f}ms")
+    except Exception as e:
+        print(f"  Tracing: skipped — {e}")
+    try:
+        from doc_index import index_run
+        stats = index_run(output_dir)
+        print(f"  Retrieval index: {stats['added']} new documents ({stats['skipped']} already indexed)")
+    except Exception as e:
+        print(f"  Retrieval index: skipped — {e}")
+    try:
+        moved = compact_citta()
+        if any(moved.values()):
+            print(f"  Citta: archived {moved} -> citta_archive/")
+    except Exception as e:
+        print(f"  Citta compaction: skipped — {e}")
+
+def startup_report(top=15, module="main"):
+    """
+    Print the `python -X importtime` breakdown for importing `module` in a fresh
+    interpreter: the slowest top-level imports by cumulative time, plus the total.
+    """
+    import subprocess
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=str(Path(__file__).resolve().parent))
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # header row
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((cum_us, self_us, depth, name.strip()))
+    total = next((r[0] for r in rows if r[3] == module and r[2] == 0), sum(r[1] for r in rows))
+    print("="*55)
+    print(f"  OSIS Startup Report -- import {module}")
+    print("="*55)
+    print(f"  Total import time : {total/1000:8.1f} ms   ({len(rows)} modules)")
+    print(f"  {'cumulative':>12} {'self':>9}  module")
+    for cum_us, self_us, depth, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cum_us/1000:10.1f}ms {self_us/1000:7.1f}ms  {'  '*min(depth, 4)}{name}")
+    return total
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--skip-db", action="store_true")
     parser.add_argument("--no-llm", action="store_true")
+    parser.add_argument("--force", action="store_true", help="ignore the stage cache and re-run every stage")
+    parser.add_argument("--profile", action="store_true", help="profile each stage and write a flamegraph under profiles/")
+    parser.add_argument("--startup-report", action="store_true", help="print the -X importtime breakdown and exit")
     args = parser.parse_args()
-    run_pipeline(config=get_default_config(), skip_db=args.skip_db, use_llm=not args.no_llm)
+    if args.startup_report:
+        startup_report()
+        sys.exit(0)
+    report = run_pipeline(config=get_default_config(), skip_db=args.skip_db, use_llm=not args.no_llm,
+                          force=args.force, profile=args.profile)
+    sys.exit(1 if report.aborted else 0)
@@ -0,0 +1,346 @@
+"""
+OSIS – Compact Metric Store (v1.1)
+===================================
+Dictionary-encoded, vintage-versioned storage behind canonical_metrics.
+
+    metric_dim      metric_id SMALLINT → domain, metric_name, source_table, schema_version
+    entity_dim      entity_id INTEGER  → state
+    metric_facts    current snapshot (metric_id, entity_id, time_period, metric_value, ingested_at)
+                    sorted by (metric_id, entity_id, time_period)
+    metric_vintages delta log (metric_id, entity_id, time_period, metric_value, ingested_at),
+                    appended in key order, one sorted block per ingest
+
+canonical_metrics is a view that joins the three back into the original
+columns, so every reader's SQL is unchanged. A filter on domain, metric
+and state resolves to one metric_id and one entity_id on the small
+dimension side. DuckDB pushes the matching key range into the fact scan.
+Rows are written in key order, so each row group covers a narrow key range
+and zone maps skip the rest. That holds both for the initial load and for
+the deltas that later ingests append.
+
+Ingest replaces one (domain, metric) at a time, so many-metric archives
+keep their other series. Dimension ids are stable across ingests: new names
+are appended and existing ids are never renumbered.
+
+Vintages: each ingest is one vintage, stamped with a single UTC ingested_at.
+Only rows whose value differs from the current snapshot are appended to
+metric_vintages. A period that disappeared from the source is logged with a
+NULL value (a tombstone). An unchanged re-ingest writes nothing at all. The
+snapshot is updated by the same delta: changed keys are deleted and their
+new values appended, so the write scales with the change, not the archive. series_sql(as_of)
+rebuilds one entity's series as it stood at any past moment: the latest
+vintage per period at or before as_of, read from that entity's slice of
+the log only. (metric, entity, time_period) is the key; duplicate source
+rows for one key keep the largest value, so repeated ingests agree.
+
+Python readers use fetch_frame(): the low-cardinality label columns are
+cast to ENUMs over the dimension values in SQL and come back as pandas
+categoricals (integer codes plus one copy of each label), never as one
+string per row; numeric and date columns are plain NumPy arrays.
+
+SOVEREIGNTY RULE: only database_init calls the write functions here.
+"""
+
+from datetime import date, datetime, time
+from typing import Optional
+
+FACT_TABLE  = "metric_facts"
+VINTAGES    = "metric_vintages"
+METRIC_DIM  = "metric_dim"
+ENTITY_DIM  = "entity_dim"
+VIEW        = "canonical_metrics"
+STAGE       = "_canonical_stage"
+CATEGORICAL = ("domain", "metric_name", "state", "source_table", "schema_version", "grain")
+# label column → the dimension holding every value it can take
+LABEL_DIMS  = {"domain": METRIC_DIM, "metric_name": METRIC_DIM, "source_table": METRIC_DIM,
+               "schema_version": METRIC_DIM, "state": ENTITY_DIM}
+
+_VIEW_SQL = f"""
+    CREATE OR REPLACE VIEW {VIEW} AS
+    SELECT m.domain, m.metric_name, f.time_period, f.metric_value, e.state,
+           m.source_table, m.schema_version, f.ingested_at
+    FROM {FACT_TABLE} f
+    JOIN {METRIC_DIM} m USING (metric_id)
+    JOIN {ENTITY_DIM} e USING (entity_id)
+"""
+
+
+def _relation_type(con, name: str):
+    row = con.execute("SELECT table_type FROM information_schema.tables WHERE table_name = ?", [name]).fetchone()
+    return row[0] if row else None
+
+
+def ensure_layout(con) -> None:
+    """
+    Create the encoded tables and the canonical_metrics view. A legacy
+    canonical_metrics table (one VARCHAR row per observation) is migrated
+    into the encoded tables.
+    """
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {METRIC_DIM} (
+            metric_id      SMALLINT PRIMARY KEY,
+            domain         VARCHAR NOT NULL,
+            metric_name    VARCHAR NOT NULL,
+            source_table   VARCHAR,
+            schema_version VARCHAR DEFAULT '1.0',
+            UNIQUE (domain, metric_name)
+        )""")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ENTITY_DIM} (
+            entity_id INTEGER PRIMARY KEY,
+            state     VARCHAR NOT NULL UNIQUE
+        )""")
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {FACT_TABLE} (
+            metric_id    SMALLINT,
+            entity_id    INTEGER,
+            time_period  DATE,
+            metric_value DOUBLE,
+            ingested_at  TIMESTAMP
+        )""")
+    con.execute(f"CREATE TABLE IF NOT EXISTS {VINTAGES} AS SELECT * FROM {FACT_TABLE} LIMIT 0")
+    # an ART index only serves point lookups, never the as-of range scan;
+    # key-ordered appends let zone maps prune instead
+    con.execute(f"DROP INDEX IF EXISTS {VINTAGES}_key")
+    if not con.execute(f"SELECT COUNT(*) FROM {VINTAGES}").fetchone()[0]:
+        # archives written before vintages existed: their snapshot is the first vintage
+        con.execute(f"INSERT INTO {VINTAGES} SELECT * FROM {FACT_TABLE} ORDER BY ALL")
+    if _relation_type(con, VIEW) == "BASE TABLE":
+        con.execute(f"ALTER TABLE {VIEW} RENAME TO {STAGE}")
+        for domain, metric_name in con.execute(f"SELECT DISTINCT domain, metric_name FROM {STAGE}").fetchall():
+            _replace_metric(con, domain, metric_name)
+        con.execute(f"DROP TABLE {STAGE}")
+    con.execute(_VIEW_SQL)
+
+
+def _metric_id(con, domain: str, metric_name: str) -> int:
+    row = con.execute(f"SELECT metric_id FROM {METRIC_DIM} WHERE domain = ? AND metric_name = ?",
+                      [domain, metric_name]).fetchone()
+    if row:
+        return row[0]
+    metric_id = con.execute(f"SELECT COALESCE(MAX(metric_id) + 1, 0) FROM {METRIC_DIM}").fetchone()[0]
+    con.execute(f"INSERT INTO {METRIC_DIM} (metric_id, domain, metric_name) VALUES (?, ?, ?)",
+                [metric_id, domain, metric_name])
+    return metric_id
+
+
+def _replace_metric(con, domain: str, metric_name: str) -> int:
+    """Swap one (domain, metric)'s facts for the STAGE rows carrying it. Returns rows written."""
+    metric_id = _metric_id(con, domain, metric_name)
+    labels = con.execute(f"""
+        SELECT any_value(source_table), COALESCE(any_value(schema_version), '1.0')
+        FROM {STAGE} WHERE domain = ? AND metric_name = ?
+    """, [domain, metric_name]).fetchone()
+    con.execute(f"UPDATE {METRIC_DIM} SET source_table = ?, schema_version = ? WHERE metric_id = ?",
+                [labels[0], labels[1], metric_id])
+    con.execute(f"""
+        INSERT INTO {ENTITY_DIM}
+        SELECT (SELECT COALESCE(MAX(entity_id) + 1, 0) FROM {ENTITY_DIM}) + ROW_NUMBER() OVER (ORDER BY state) - 1,
+               state
+        FROM (SELECT DISTINCT state FROM {STAGE} WHERE domain = ? AND metric_name = ?
+              EXCEPT SELECT state FROM {ENTITY_DIM})
+    """, [domain, metric_name])
+    params = {"metric_id": metric_id, "domain": domain, "metric_name": metric_name}
+    # Delta against the current snapshot: changed, new and vanished periods only.
+    # A stage row's own ingested_at (legacy migration) wins over this vintage's stamp.
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE _vintage_delta AS
+        WITH new AS (
+            SELECT e.entity_id, s.time_period, max(s.metric_value) AS metric_value,
+                   max(s.ingested_at) AS ingested_at
+            FROM {STAGE} s JOIN {ENTITY_DIM} e USING (state)
+            WHERE s.domain = $domain AND s.metric_name = $metric_name
+            GROUP BY ALL
+        ),
+        cur AS (SELECT entity_id, time_period, metric_value FROM {FACT_TABLE} WHERE metric_id = $metric_id)
+        SELECT $metric_id::SMALLINT AS metric_id, entity_id, time_period, new.metric_value,
+               COALESCE(new.ingested_at, (now() AT TIME ZONE 'UTC')::TIMESTAMP) AS ingested_at
+        FROM new FULL JOIN cur USING (entity_id, time_period)
+        WHERE new.metric_value IS DISTINCT FROM cur.metric_value
+    """, params)
+    try:
+        if con.execute("SELECT COUNT(*) FROM _vintage_delta").fetchone()[0]:
+            con.execute(f"INSERT INTO {VINTAGES} SELECT * FROM _vintage_delta ORDER BY entity_id, time_period")
+            con.execute(f"""
+                DELETE FROM {FACT_TABLE} f USING _vintage_delta d
+                WHERE f.metric_id = d.metric_id AND f.entity_id = d.entity_id AND f.time_period = d.time_period
+            """)
+            # appended in key order: the new row groups span this metric's key range only
+            con.execute(f"""
+                INSERT INTO {FACT_TABLE}
+                SELECT * FROM _vintage_delta WHERE metric_value IS NOT NULL
+                ORDER BY entity_id, time_period
+            """)
+    finally:
+        con.execute("DROP TABLE IF EXISTS _vintage_delta")
+    return con.execute(f"SELECT COUNT(*) FROM {FACT_TABLE} WHERE metric_id = ?", [metric_id]).fetchone()[0]
+
+
+def write_metric(con, select_sql: str, domain: str, metric_name: str) -> int:
+    """
+    Replace one (domain, metric) series with the rows of select_sql, which
+    yields canonical_metrics columns (domain, metric_name, time_period,
+    metric_value, state, source_table[, schema_version, ingested_at]).
+    Other metrics are kept. Returns the rows now stored for the metric.
+    """
+    ensure_layout(con)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {STAGE} (
+            domain VARCHAR, metric_name VARCHAR, time_period DATE, metric_value DOUBLE, state VARCHAR,
+            source_table VARCHAR, schema_version VARCHAR, ingested_at TIMESTAMP
+        )""")
+    try:
+        con.execute(f"INSERT INTO {STAGE} BY NAME {select_sql}")
+        return _replace_metric(con, domain, metric_name)
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS {STAGE}")
+
+
+def _cutoff(as_of) -> datetime:
+    """as_of → inclusive UTC cutoff. A bare date means the end of that day."""
+    if isinstance(as_of, datetime):
+        return as_of
+    text = str(as_of)
+    if len(text) <= 10:
+        return datetime.combine(date.fromisoformat(text), time.max)
+    return datetime.fromisoformat(text)
+
+
+def series_sql(as_of=None) -> tuple:
+    """
+    (relation, extra_params): one entity's (time_period, metric_value, state,
+    ingested_at) as a parenthesised subquery, filtered by the parameters
+    domain, metric_name, state followed by extra_params. as_of=None reads the
+    current snapshot. Otherwise metric_vintages is read. The entity and metric
+    ids resolved on the dimension side are pushed into that scan as dynamic
+    filters, and since vintages are appended in key order, zone maps skip the
+    row groups of other entities.
+    """
+    if as_of is None:
+        return (f"(SELECT time_period, metric_value, state, ingested_at FROM {VIEW} "
+                f"WHERE domain = ? AND metric_name = ? AND state = ?)"), []
+    return f"""(
+        SELECT time_period, metric_value, state, ingested_at FROM (
+            SELECT v.time_period, v.metric_value, e.state, v.ingested_at
+            FROM {VINTAGES} v
+            JOIN {METRIC_DIM} m USING (metric_id)
+            JOIN {ENTITY_DIM} e USING (entity_id)
+            WHERE m.domain = ? AND m.metric_name = ? AND e.state = ? AND v.ingested_at <= ?
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY v.time_period ORDER BY v.ingested_at DESC) = 1
+        ) WHERE metric_value IS NOT NULL
+    )""", [_cutoff(as_of)]
+
+
+def revisions(con, domain: str, metric_name: str, state: str):
+    """
+    Periods revised after first publication, oldest first: first and latest
+    value, number of vintages and the relative revision. Reporting-lag
+    analytics start here.
+    """
+    return fetch_frame(con, f"""
+        SELECT v.time_period,
+               arg_min(v.metric_value, v.ingested_at) AS first_value,
+               arg_max(v.metric_value, v.ingested_at) AS latest_value,
+               COUNT(*)                               AS n_vintages,
+               MIN(v.ingested_at)                     AS first_seen,
+               MAX(v.ingested_at)                     AS last_revised,
+               arg_max(v.metric_value, v.ingested_at) / NULLIF(arg_min(v.metric_value, v.ingested_at), 0) - 1
+                                                      AS revision_pct
+        FROM {VINTAGES} v
+        JOIN {METRIC_DIM} m USING (metric_id)
+        JOIN {ENTITY_DIM} e USING (entity_id)
+        WHERE m.domain = ? AND m.metric_name = ? AND e.state = ?
+        GROUP BY v.time_period
+        HAVING COUNT(*) > 1
+        ORDER BY v.time_period
+    """, [domain, metric_name, state])
+
+
+def fetch_frame(con, sql: str, params=None, labels: Optional[dict] = None):
+    """
+    Run sql and return a DataFrame with the label columns (CATEGORICAL)
+    as pandas categoricals. Numeric and date columns keep their NumPy dtypes.
+
+    Label columns are cast in SQL to an ENUM over their dimension's values
+    (LABEL_DIMS) or over labels[column], so DuckDB hands pandas integer codes
+    plus one copy of each label, never one string per row. A label column
+    with no known vocabulary is converted after the fetch.
+    """
+    import duckdb
+    from pandas.api.types import is_string_dtype
+    rel = con.sql(sql, params=params or None)
+    wanted = [c for c, t in zip(rel.columns, rel.types) if c in CATEGORICAL and str(t) == "VARCHAR"]
+    enums = _label_enums(con, wanted, labels or {})
+    df = None
+    if enums:
+        try:
+            df = rel.select(", ".join(f"CAST({_ident(c)} AS {enums[c]}) AS {_ident(c)}" if c in enums
+                                      else _ident(c) for c in rel.columns)).df()
+        except duckdb.ConversionException:
+            # a label computed in the query rather than read from its dimension
+            enums = {}
+    if df is None:
+        df = rel.df()
+    for col in CATEGORICAL:
+        if col in enums:
+            # the ENUM spans the whole dimension and is ordered; match what astype would give
+            df[col] = df[col].cat.remove_unused_categories().cat.as_unordered()
+        elif col in df.columns and is_string_dtype(df[col]):
+            df[col] = df[col].astype("category")
+    return df
+
+
+_dim_enum_cache = {}     # database file → ((mtime_ns, size), {label column: ENUM type})
+
+
+def _label_enums(con, columns: list, labels: dict) -> dict:
+    """column → ENUM type over its vocabulary, for the label columns whose vocabulary is known."""
+    enums = {c: _enum_type(labels[c]) for c in columns if c in labels}
+    rest = [c for c in columns if c in LABEL_DIMS and c not in enums]
+    if rest:
+        dims = _dim_enums(con)
+        enums.update((c, dims[c]) for c in rest if c in dims)
+    return enums
+
+
+def _dim_enums(con) -> dict:
+    """
+    ENUM types over every label in the dimension tables. Only ingest changes
+    the dimensions, so a stat of the database file gates the reload. A stale
+    entry is harmless: extra labels are dropped after the fetch, and a missing
+    one makes fetch_frame fall back to a plain fetch.
+    """
+    import os
+    import duckdb
+    row = con.execute("SELECT path FROM duckdb_databases() WHERE database_name = current_database()").fetchone()
+    path = row[0] if row else None
+    version = None
+    if path and os.path.exists(path):
+        st = os.stat(path)
+        version = (st.st_mtime_ns, st.st_size)
+        cached = _dim_enum_cache.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+    sql = " UNION ALL ".join(
+        f"SELECT '{col}', list(DISTINCT {col} ORDER BY {col}) FILTER (WHERE {col} IS NOT NULL) FROM {dim}"
+        for col, dim in LABEL_DIMS.items())
+    try:
+        enums = {col: _enum_type(values) for col, values in con.execute(sql).fetchall() if values}
+    except duckdb.CatalogException:
+        enums = {}
+    if version is not None:
+        _dim_enum_cache[path] = (version, enums)
+    return enums
+
+
+def _enum_type(values) -> str:
+    return "ENUM(" + ", ".join(_literal(v) for v in sorted(set(values))) + ")"
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
@@ -0,0 +1,173 @@
+"""
+OSIS – Multi-Resolution Period Rollups (v1.0)
+==============================================
+Month, quarter and year aggregates of canonical_metrics, so coarse-grain
+consumers (dashboard resolutions, query_engine period breakdowns,
+processing.load_yearly) never scan weekly history.
+
+period_rollups holds one row per (domain, metric, entity, grain, period):
+
+    n_obs, sum_value, mean_value, min_value, max_value
+    n_anomalies, n_critical   rolling-window z-score counts, same z as analysis.py
+    fingerprint               BIT_XOR(HASH(time_period, metric_value)) of the period's rows
+
+All three grains come out of one GROUPING SETS pass. database_init refreshes
+the table after every ingest, and only for touched periods:
+
+  1. Month fingerprints from the fresh facts are compared with the stored ones.
+     A changed, new or vanished month marks its entity dirty from the start of
+     that month's year. Z-scores look back rolling_window rows, so everything
+     after the first change is recomputed.
+  2. Only those entities' rollups from that point on are deleted and rebuilt.
+
+An unchanged re-ingest rewrites nothing. A change of rolling window or
+thresholds rebuilds the (domain, metric).
+"""
+
+from typing import Optional
+
+DB_NAME = "osis_strategic_archives.db"
+TABLE   = "period_rollups"
+GRAINS  = ("month", "quarter", "year")
+DIRTY   = "_period_dirty"
+
+
+def _scored_sql(rolling_window: int, anomaly: float, critical: float) -> str:
+    """One GROUPING SETS pass over the dirty entities' rows from their dirty_from on."""
+    rw, anomaly, critical = int(rolling_window), float(anomaly), float(critical)
+    return f"""
+        WITH src AS (
+            SELECT c.state, c.time_period, c.metric_value, d.dirty_from,
+                   AVG(c.metric_value)    OVER w AS rolling_mean,
+                   STDDEV(c.metric_value) OVER w AS rolling_std
+            FROM canonical_metrics c
+            JOIN {DIRTY} d USING (state)
+            WHERE c.domain = $domain AND c.metric_name = $metric_name
+            WINDOW w AS (PARTITION BY c.state ORDER BY c.time_period
+                         ROWS BETWEEN {rw} PRECEDING AND 1 PRECEDING)
+        ),
+        scored AS (
+            SELECT state, time_period, metric_value,
+                   CASE WHEN rolling_mean IS NULL OR rolling_std IS NULL THEN NULL
+                        WHEN rolling_std > 0 THEN ROUND((metric_value - rolling_mean) / rolling_std, 4)
+                        ELSE 0.0 END AS z_score,
+                   date_trunc('month',   time_period)::DATE AS month,
+                   date_trunc('quarter', time_period)::DATE AS quarter,
+                   date_trunc('year',    time_period)::DATE AS year
+            FROM src WHERE time_period >= dirty_from
+        )
+        SELECT $domain AS domain, $metric_name AS metric_name, state,
+               CASE WHEN GROUPING(month) = 0 THEN 'month'
+                    WHEN GROUPING(quarter) = 0 THEN 'quarter' ELSE 'year' END AS grain,
+               COALESCE(month, quarter, year)              AS period_start,
+               COUNT(*)                                    AS n_obs,
+               SUM(metric_value)                           AS sum_value,
+               ROUND(AVG(metric_value), 2)                 AS mean_value,
+               MIN(metric_value)                           AS min_value,
+               MAX(metric_value)                           AS max_value,
+               COUNT(*) FILTER (WHERE ABS(z_score) >= {anomaly})  AS n_anomalies,
+               COUNT(*) FILTER (WHERE ABS(z_score) >= {critical}) AS n_critical,
+               BIT_XOR(HASH(time_period, metric_value))    AS fingerprint,
+               {rw} AS rolling_window, {anomaly} AS anomaly_threshold, {critical} AS critical_threshold
+        FROM scored
+        GROUP BY GROUPING SETS ((state, month), (state, quarter), (state, year))
+    """
+
+
+def build_period_rollups(con, config) -> int:
+    """Refresh touched periods on a writable connection. Returns rollup rows written."""
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            domain VARCHAR, metric_name VARCHAR, state VARCHAR, grain VARCHAR, period_start DATE,
+            n_obs BIGINT, sum_value DOUBLE, mean_value DOUBLE, min_value DOUBLE, max_value DOUBLE,
+            n_anomalies BIGINT, n_critical BIGINT, fingerprint UBIGINT,
+            rolling_window INTEGER, anomaly_threshold DOUBLE, critical_threshold DOUBLE
+        )""")
+    key = {"domain": config.domain, "metric_name": config.metric_name}
+    stale = con.execute(f"""
+        SELECT COUNT(*) FROM {TABLE}
+        WHERE domain = $domain AND metric_name = $metric_name
+          AND (rolling_window <> $rw OR anomaly_threshold <> $anomaly OR critical_threshold <> $critical)
+    """, {**key, "rw": int(config.rolling_window), "anomaly": float(config.anomaly_threshold),
+          "critical": float(config.critical_threshold)}).fetchone()[0]
+    if stale:
+        con.execute(f"DELETE FROM {TABLE} WHERE domain = $domain AND metric_name = $metric_name", key)
+
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {DIRTY} AS
+        WITH cur AS (
+            SELECT state, date_trunc('month', time_period)::DATE AS period_start,
+                   COUNT(*) AS n_obs, BIT_XOR(HASH(time_period, metric_value)) AS fingerprint
+            FROM canonical_metrics
+            WHERE domain = $domain AND metric_name = $metric_name
+            GROUP BY ALL
+        ),
+        old AS (
+            SELECT state, period_start, n_obs, fingerprint FROM {TABLE}
+            WHERE domain = $domain AND metric_name = $metric_name AND grain = 'month'
+        )
+        SELECT state, date_trunc('year', MIN(period_start))::DATE AS dirty_from
+        FROM cur FULL JOIN old USING (state, period_start)
+        WHERE cur.n_obs IS DISTINCT FROM old.n_obs OR cur.fingerprint IS DISTINCT FROM old.fingerprint
+        GROUP BY state
+    """, key)
+    try:
+        con.execute(f"""
+            DELETE FROM {TABLE} t USING {DIRTY} d
+            WHERE t.domain = $domain AND t.metric_name = $metric_name
+              AND t.state = d.state AND t.period_start >= d.dirty_from
+        """, key)
+        before = con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+        con.execute(f"INSERT INTO {TABLE} BY NAME "
+                    + _scored_sql(config.rolling_window, config.anomaly_threshold, config.critical_threshold)
+                    + " ORDER BY state, grain, period_start", key)
+        return con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0] - before
+    finally:
+        con.execute(f"DROP TABLE IF EXISTS {DIRTY}")
+
+
+def query_periods(con, config, grain: str, entities=None, since: Optional[str] = None):
+    """
+    Rollup rows for one grain as a DataFrame (labels as categoricals), oldest
+    first. entities defaults to the config's entity; since bounds period_start.
+    """
+    from metric_store import fetch_frame
+    if grain not in GRAINS:
+        raise ValueError(f"grain must be one of {GRAINS}, got {grain!r}")
+    entities = list(entities or [config.entity_filter])
+    sql = f"""
+        SELECT state, grain, period_start, n_obs, sum_value, mean_value, min_value, max_value,
+               n_anomalies, n_critical
+        FROM {TABLE}
+        WHERE domain = ? AND metric_name = ? AND grain = ? AND list_contains(?::VARCHAR[], state)
+    """
+    params = [config.domain, config.metric_name, grain, entities]
+    if since:
+        sql += " AND period_start >= ?::DATE"
+        params.append(str(since)[:10])
+    return fetch_frame(con, sql + " ORDER BY state, period_start", params, labels={"grain": GRAINS})
+
+
+if __name__ == "__main__":
+    import argparse
+    import duckdb
+    from dataset_config import get_default_config
+    parser = argparse.ArgumentParser(description="Refresh or show month/quarter/year rollups")
+    parser.add_argument("--build", action="store_true", help="refresh touched periods from canonical_metrics")
+    parser.add_argument("--grain", choices=GRAINS, default="year")
+    parser.add_argument("--entity", default=None)
+    args = parser.parse_args()
+    cfg = get_default_config()
+    if args.entity:
+        cfg.entity_filter = args.entity
+    if args.build:
+        con = duckdb.connect(DB_NAME)
+        try:
+            print(f"  {TABLE}: {build_period_rollups(con, cfg):,} rows refreshed")
+        finally:
+            con.close()
+    con = duckdb.connect(DB_NAME, read_only=True)
+    try:
+        print(query_periods(con, cfg, args.grain).to_string(index=False))
+    finally:
+        con.close()
@@ -0,0 +1,226 @@
+"""
+OSIS – Stage DAG Executor (v1.0)
+=================================
+Runs pipeline stages as a dependency graph instead of a linear script.
+
+  - Each Stage declares the stages it depends on; a stage starts as soon as
+    all of its dependencies have succeeded, so independent stages overlap and
+    end-to-end latency drops to the critical path.
+  - Stages are scheduled on threads (right for I/O-bound LLM calls). A
+    CPU-bound stage offloads its heavy call with in_process(), which runs it
+    in a spawned worker process.
+  - Failure policy is per stage. ABORT stops scheduling new work but lets
+    running siblings finish; CONTINUE records the failure and only skips the
+    failed stage's dependents. Nothing here calls sys.exit.
+"""
+
+import contextvars
+import json
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import tracing
+
+ABORT    = "abort"
+CONTINUE = "continue"
+
+PROCESS_WORKERS = max(1, multiprocessing.cpu_count() // 2)
+
+_process_pool = None
+_process_lock = threading.Lock()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[dict], Any]                  # receives results of completed stages
+    deps: tuple = ()
+    on_failure: str = ABORT
+    check: Optional[Callable[[Any], bool]] = None   # False → stage counts as failed
+
+
+@dataclass
+class DagReport:
+    results: dict = field(default_factory=dict)
+    status: dict  = field(default_factory=dict)   # ok | failed | skipped | cancelled
+    errors: dict  = field(default_factory=dict)
+    elapsed: dict = field(default_factory=dict)   # seconds per stage
+    aborted: bool = False
+    wall_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return all(s == "ok" for s in self.status.values())
+
+
+def process_pool() -> ProcessPoolExecutor:
+    """The shared worker pool, created on first use and reused for the life of the process."""
+    global _process_pool
+    with _process_lock:
+        if _process_pool is None:
+            # spawn, not fork — parent threads may hold DuckDB/HTTP locks mid-run
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    return _process_pool
+
+
+def warm_process_pool(modules=("forecast_agent",)) -> ProcessPoolExecutor:
+    """
+    Pre-import heavy modules in the workers so the first CPU-bound stage skips
+    that cost. Best effort: one task per worker, failures (e.g. prophet not
+    installed) are ignored — the stage itself reports them.
+    """
+    import importlib
+    pool = process_pool()
+    futures = [pool.submit(importlib.import_module, m) for m in modules for _ in range(PROCESS_WORKERS)]
+    for fut in futures:
+        try:
+            fut.result()
+        except Exception:
+            pass
+    return pool
+
+
+def in_process(fn, *args, **kwargs):
+    """
+    Run a picklable top-level function in the shared worker process pool and wait.
+    Inside a worker process already (e.g. a fanout_runner target) it runs inline:
+    a nested pool would gain no isolation and its idle children block worker exit.
+    """
+    if multiprocessing.parent_process() is not None:
+        with tracing.span(getattr(fn, "__name__", "call"), kind="process"):
+            return fn(*args, **kwargs)
+    result, child_spans = process_pool().submit(
+        _traced_call, tracing.current_span_id(), fn, args, kwargs).result()
+    tracing.adopt(child_spans)
+    return result
+
+
+def _traced_call(parent_id, fn, args, kwargs):
+    """Worker-process side of in_process: run fn and return its spans with the result."""
+    tracing.reset()
+    with tracing.span(getattr(fn, "__name__", "call"), kind="process", parent_id=parent_id):
+        result = fn(*args, **kwargs)
+    return result, tracing.export_spans()
+
+
+def _validate(stages: list) -> None:
+    names = [s.name for s in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    known = set(names)
+    for s in stages:
+        missing = [d for d in s.deps if d not in known]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stages: {missing}")
+    # Kahn's algorithm — any leftover node sits on a cycle
+    indegree = {s.name: len(s.deps) for s in stages}
+    children = {s.name: [c.name for c in stages if s.name in c.deps] for s in stages}
+    queue = [n for n, d in indegree.items() if d == 0]
+    seen = 0
+    while queue:
+        n = queue.pop()
+        seen += 1
+        for c in children[n]:
+            indegree[c] -= 1
+            if indegree[c] == 0:
+                queue.append(c)
+    if seen != len(stages):
+        raise ValueError("Stage graph contains a cycle")
+
+
+def run_dag(stages: list, max_workers: int = 4, profile_dir: Optional[str] = None,
+            on_progress: Optional[Callable[[str, str], None]] = None) -> DagReport:
+    """
+    Execute stages respecting dependencies. Returns a DagReport; never raises for stage errors.
+    Every stage runs inside a tracing span; profile_dir enables per-stage profiling.
+    on_progress(stage, state) is called with pending, running and each final status.
+    """
+    _validate(stages)
+    report = DagReport()
+    pending = {s.name: s for s in stages}
+    running = {}
+    started = {}
+    t0 = time.perf_counter()
+
+    def _notify(name, state):
+        if on_progress is None:
+            return
+        try:
+            on_progress(name, state)
+        except Exception:
+            traceback.print_exc()   # progress reporting never fails a run
+
+    for name in pending:
+        _notify(name, "pending")
+
+    def _call(stage, upstream):
+        with tracing.span(stage.name, kind="stage") as sp, tracing.profiled(stage.name, profile_dir):
+            result = stage.fn(upstream)
+            try:
+                sp.payload_bytes = len(json.dumps(result, default=str))
+            except (TypeError, ValueError):
+                pass
+            return result
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="osis-stage") as pool:
+        while pending or running:
+            # Skip stages whose inputs can never arrive
+            for name, s in list(pending.items()):
+                if any(report.status.get(d) in ("failed", "skipped", "cancelled") for d in s.deps):
+                    report.status[name] = "skipped"
+                    _notify(name, "skipped")
+                    del pending[name]
+            if not report.aborted:
+                for name, s in list(pending.items()):
+                    if all(report.status.get(d) == "ok" for d in s.deps):
+                        started[name] = time.perf_counter()
+                        # copied context → stage span nests under the caller's span
+                        ctx = contextvars.copy_context()
+                        running[pool.submit(ctx.run, _call, s, dict(report.results))] = s
+                        _notify(name, "running")
+                        del pending[name]
+            else:
+                for name in pending:
+                    report.status[name] = "cancelled"
+                    _notify(name, "cancelled")
+                pending.clear()
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                s = running.pop(fut)
+                report.elapsed[s.name] = round(time.perf_counter() - started[s.name], 3)
+                try:
+                    result = fut.result()
+                    if s.check is not None and not s.check(result):
+                        raise RuntimeError(f"check failed: {str(result)[:120]}")
+                    report.results[s.name] = result
+                    report.status[s.name] = "ok"
+                except Exception as e:
+                    report.status[s.name] = "failed"
+                    report.errors[s.name] = f"{type(e).__name__}: {e}"
+                    traceback.print_exc()
+                    if s.on_failure == ABORT:
+                        report.aborted = True
+                _notify(s.name, report.status[s.name])
+
+    report.wall_s = round(time.perf_counter() - t0, 3)
+    return report
+
+
+def print_report(report: DagReport) -> None:
+    print(f"\n  Stage timings (wall {report.wall_s:.2f}s):")
+    for name, state in report.status.items():
+        secs = report.elapsed.get(name)
+        timing = f"{secs:7.2f}s" if secs is not None else "      —"
+        extra = f"  {report.errors[name]}" if name in report.errors else ""
+        print(f"    {name:<12} {state:<9} {timing}{extra}")
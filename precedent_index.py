@@ -0,0 +1,291 @@
+"""
+OSIS – Udāharaṇa Precedent Index (v1.0)
+========================================
+k-NN search over historical windows, so Chanakya's udāharaṇa cites real
+precedents instead of a fixed sentence.
+
+precedent_windows holds one row per (domain, metric, entity, time_period),
+scored with the same rolling-window z-score as analysis.py, plus:
+
+    rel_dev   observed / rolling mean − 1
+    trend     change in the rolling mean over TREND_LAG periods
+    season    day-of-year angle, stored as sin/cos so late Dec ≈ early Jan
+
+database_init appends to it after every ingest, for the ingested (domain,
+metric) only. Rows are only scored past each entity's watermark, using
+rolling_window + TREND_LAG periods of lookback context. Revised history
+pulls the watermark back: every row carries scored_at, the newest
+metric_vintages stamp it was built from, and an entity with vintages newer
+than that loses its rows from the earliest changed period on, so they are
+rescored with the revised values. A change of rolling window, or rows built
+before scored_at existed, rebuild the (domain, metric).
+
+Searches run over an in-memory matrix per (domain, metric). Each feature is
+z-normalized and weighted by FEATURE_WEIGHTS, and a search is one brute-force
+distance pass. A few thousand anomaly windows take well under a millisecond.
+The matrix reloads only when the table's row count or watermark changes;
+an unchanged database file is detected with a stat, not a connection.
+Precedents must predate the query window, so a finding never cites itself or
+the future.
+"""
+
+import math
+import threading
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+DB_NAME         = "osis_strategic_archives.db"
+TABLE           = "precedent_windows"
+TREND_LAG       = 4
+FEATURES        = ("z_score", "rel_dev", "trend", "season_sin", "season_cos")
+FEATURE_WEIGHTS = np.array([2.0, 1.0, 1.0, 0.5, 0.5])
+CLIP            = 10.0     # z / rel_dev outliers shouldn't dominate the normalization
+TOP_K           = 3
+
+
+def _scored_sql(rolling_window: int) -> str:
+    """One (domain, metric)'s new windows past each entity's watermark, with just enough lookback for the stats."""
+    rw = int(rolling_window)
+    return f"""
+        WITH wm AS (
+            SELECT domain, metric_name, state, MAX(time_period) AS watermark FROM {TABLE}
+            WHERE domain = $domain AND metric_name = $metric_name
+            GROUP BY ALL
+        ),
+        src AS (
+            SELECT c.domain, c.metric_name, c.state, c.time_period, c.metric_value, wm.watermark,
+                   COUNT(*) FILTER (WHERE wm.watermark IS NULL OR c.time_period > wm.watermark)
+                       OVER (PARTITION BY c.domain, c.metric_name, c.state) AS n_new,
+                   ROW_NUMBER() OVER (PARTITION BY c.domain, c.metric_name, c.state
+                                      ORDER BY c.time_period DESC) AS rn_desc
+            FROM canonical_metrics c
+            LEFT JOIN wm USING (domain, metric_name, state)
+            WHERE c.domain = $domain AND c.metric_name = $metric_name
+        ),
+        ctx AS (
+            SELECT * FROM src WHERE n_new > 0 AND rn_desc <= n_new + {rw + TREND_LAG}
+        ),
+        stats AS (
+            SELECT *,
+                   AVG(metric_value)    OVER w AS rolling_mean,
+                   STDDEV(metric_value) OVER w AS rolling_std
+            FROM ctx
+            WINDOW w AS (PARTITION BY domain, metric_name, state ORDER BY time_period
+                         ROWS BETWEEN {rw} PRECEDING AND 1 PRECEDING)
+        ),
+        trended AS (
+            SELECT *, LAG(rolling_mean, {TREND_LAG}) OVER (PARTITION BY domain, metric_name, state
+                                                           ORDER BY time_period) AS prior_mean
+            FROM stats
+        )
+        SELECT domain, metric_name, state, time_period, metric_value,
+               ROUND(rolling_mean, 2) AS rolling_mean,
+               CASE WHEN rolling_std > 0 THEN ROUND((metric_value - rolling_mean) / rolling_std, 4)
+                    ELSE 0.0 END AS z_score,
+               metric_value / rolling_mean - 1 AS rel_dev,
+               COALESCE(rolling_mean / NULLIF(prior_mean, 0) - 1, 0.0) AS trend,
+               sin(2 * pi() * dayofyear(time_period) / 365.25) AS season_sin,
+               cos(2 * pi() * dayofyear(time_period) / 365.25) AS season_cos,
+               {rw} AS rolling_window, $scored_at::TIMESTAMP AS scored_at
+        FROM trended
+        WHERE (watermark IS NULL OR time_period > watermark)
+          AND rolling_mean IS NOT NULL AND rolling_std IS NOT NULL AND rolling_mean > 0
+    """
+
+
+def build_precedent_windows(con, config) -> int:
+    """Rescore revised history, then append windows newer than each entity's watermark. Returns rows added."""
+    from metric_store import ENTITY_DIM, METRIC_DIM, VINTAGES
+    con.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE} (
+            domain VARCHAR, metric_name VARCHAR, state VARCHAR, time_period DATE,
+            metric_value DOUBLE, rolling_mean DOUBLE, z_score DOUBLE, rel_dev DOUBLE, trend DOUBLE,
+            season_sin DOUBLE, season_cos DOUBLE, rolling_window INTEGER, scored_at TIMESTAMP
+        )""")
+    con.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS scored_at TIMESTAMP")
+    key = {"domain": config.domain, "metric_name": config.metric_name}
+    stale = con.execute(f"""
+        SELECT COUNT(*) FROM {TABLE}
+        WHERE domain = $domain AND metric_name = $metric_name AND (rolling_window <> $rw OR scored_at IS NULL)
+    """, {**key, "rw": int(config.rolling_window)}).fetchone()[0]
+    if stale:
+        con.execute(f"DELETE FROM {TABLE} WHERE domain = $domain AND metric_name = $metric_name", key)
+
+    # Vintages logged since the last build: drop each touched entity's rows from
+    # its earliest changed period on. Later z-scores look back rolling_window
+    # rows, so everything after the change is rescored, not just the period.
+    con.execute(f"""
+        DELETE FROM {TABLE} t USING (
+            SELECT e.state, MIN(v.time_period) AS dirty_from
+            FROM {VINTAGES} v
+            JOIN {METRIC_DIM} m USING (metric_id)
+            JOIN {ENTITY_DIM} e USING (entity_id)
+            WHERE m.domain = $domain AND m.metric_name = $metric_name
+              AND v.ingested_at > (SELECT MAX(scored_at) FROM {TABLE}
+                                   WHERE domain = $domain AND metric_name = $metric_name)
+            GROUP BY e.state
+        ) d
+        WHERE t.domain = $domain AND t.metric_name = $metric_name
+          AND t.state = d.state AND t.time_period >= d.dirty_from
+    """, key)
+    scored_at = con.execute(f"""
+        SELECT MAX(v.ingested_at) FROM {VINTAGES} v JOIN {METRIC_DIM} m USING (metric_id)
+        WHERE m.domain = $domain AND m.metric_name = $metric_name
+    """, key).fetchone()[0]
+    before = con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+    con.execute(f"INSERT INTO {TABLE} BY NAME " + _scored_sql(config.rolling_window),
+                {**key, "scored_at": scored_at})
+    return con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0] - before
+
+
+def _season(ts) -> tuple:
+    d = date.fromisoformat(str(ts)[:10])
+    angle = 2 * math.pi * d.timetuple().tm_yday / 365.25
+    return math.sin(angle), math.cos(angle)
+
+
+class PrecedentIndex:
+    """Normalized feature matrix for one (domain, metric)."""
+
+    def __init__(self, rows: list):
+        self.rows = rows
+        self.periods = np.array([str(r["time_period"])[:10] for r in rows], dtype="U10")
+        self.states = np.array([r["state"] for r in rows], dtype=object)
+        self.pos = {(r["state"], p): i for i, (r, p) in enumerate(zip(rows, self.periods))}
+        self.abs_z = np.array([abs(r["z_score"]) for r in rows])
+        raw = np.clip(np.array([[r[f] for f in FEATURES] for r in rows], dtype=np.float64).reshape(-1, len(FEATURES)),
+                      -CLIP, CLIP)
+        self.mu = raw.mean(axis=0) if len(rows) else np.zeros(len(FEATURES))
+        self.sd = raw.std(axis=0) if len(rows) else np.ones(len(FEATURES))
+        self.sd[self.sd == 0] = 1.0
+        self.X = (raw - self.mu) / self.sd * FEATURE_WEIGHTS
+
+    def _vector(self, features: dict) -> np.ndarray:
+        v = np.clip(np.array([features.get(f, 0.0) or 0.0 for f in FEATURES], dtype=np.float64), -CLIP, CLIP)
+        return (v - self.mu) / self.sd * FEATURE_WEIGHTS
+
+    def query(self, features: dict, k: int = TOP_K, before: Optional[str] = None,
+              min_abs_z: float = 0.0, exclude_entity: Optional[str] = None) -> list:
+        mask = self.abs_z >= min_abs_z
+        if before:
+            mask &= self.periods < str(before)[:10]
+        if exclude_entity:
+            mask &= self.states != exclude_entity
+        idx = np.flatnonzero(mask)
+        if len(idx) == 0:
+            return []
+        d = np.sqrt(((self.X[idx] - self._vector(features)) ** 2).sum(axis=1))
+        near = np.argpartition(d, k)[:k] if len(idx) > k else np.arange(len(idx))
+        near = near[np.argsort(d[near])]
+        return [{**self.rows[idx[j]], "distance": round(float(d[j]), 4)} for j in near]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _table_version(con, domain: str, metric_name: str) -> tuple:
+    # scored_at moves whenever revised history is rescored at an unchanged count and watermark
+    return con.execute(f"SELECT COUNT(*), MAX(time_period), MAX(scored_at) FROM {TABLE} "
+                       "WHERE domain = ? AND metric_name = ?", [domain, metric_name]).fetchone()
+
+
+def index_version(domain: str, metric_name: str, db_path: str = DB_NAME) -> Optional[tuple]:
+    """(row count, watermark, newest scored_at) for one (domain, metric); None before the table exists."""
+    import os
+    import duckdb
+    if not os.path.exists(db_path):
+        return None
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        return _table_version(con, domain, metric_name)
+    except duckdb.CatalogException:
+        return None
+    finally:
+        con.close()
+
+
+def get_index(domain: str, metric_name: str, db_path: str = DB_NAME) -> PrecedentIndex:
+    """
+    Cached index. A stat of the database file gates the reload; only a
+    changed file costs a connection, and the matrix is rebuilt only when
+    the table itself changed.
+    """
+    import os
+    key = (db_path, domain, metric_name)
+    st = os.stat(db_path)
+    file_version = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == file_version:
+            return cached[2]
+    import duckdb
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        version = _table_version(con, domain, metric_name)
+        if cached and cached[1] == version:
+            index = cached[2]
+        else:
+            cur = con.execute(f"SELECT * FROM {TABLE} WHERE domain = ? AND metric_name = ? ORDER BY time_period, state",
+                              [domain, metric_name])
+            cols = [c[0] for c in cur.description]
+            index = PrecedentIndex([dict(zip(cols, r)) for r in cur.fetchall()])
+    finally:
+        con.close()
+    with _cache_lock:
+        _cache[key] = (file_version, version, index)
+    return index
+
+
+def find_precedents(domain: str, metric_name: str, entity: str, timestamp: str, z_score: float,
+                    observed: Optional[float] = None, rolling_mean: Optional[float] = None,
+                    anomaly_threshold: float = 2.0, k: int = TOP_K, db_path: str = DB_NAME) -> list:
+    """
+    Top-k historical windows most like the current finding, nearest first.
+    Features come from the indexed row for (entity, timestamp) when present,
+    else from the fact-packet values. Anomalous findings only match anomalous
+    windows.
+    """
+    index = get_index(domain, metric_name, db_path)
+    ts = str(timestamp)[:10]
+    if (entity, ts) in index.pos:
+        features = index.rows[index.pos[(entity, ts)]]
+    else:
+        sin_, cos_ = _season(ts)
+        features = {"z_score": z_score, "season_sin": sin_, "season_cos": cos_, "trend": 0.0,
+                    "rel_dev": observed / rolling_mean - 1 if observed and rolling_mean else 0.0}
+    min_abs_z = anomaly_threshold if abs(z_score) >= anomaly_threshold else 0.0
+    return index.query(features, k=k, before=ts, min_abs_z=min_abs_z)
+
+
+if __name__ == "__main__":
+    import argparse
+    import duckdb
+    from dataset_config import get_default_config
+    parser = argparse.ArgumentParser(description="Build or query the Udāharaṇa precedent index")
+    parser.add_argument("--build", action="store_true", help="append new windows from canonical_metrics")
+    parser.add_argument("--entity", default="United States")
+    parser.add_argument("--date")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+    cfg = get_default_config()
+    if args.build:
+        con = duckdb.connect(DB_NAME)
+        try:
+            print(f"  {TABLE}: {build_precedent_windows(con, cfg):,} new windows")
+        finally:
+            con.close()
+    con = duckdb.connect(DB_NAME, read_only=True)
+    try:
+        row = con.execute(f"SELECT time_period, z_score FROM {TABLE} WHERE state = ? "
+                          + ("AND time_period = ?" if args.date else "ORDER BY time_period DESC LIMIT 1"),
+                          [args.entity] + ([args.date] if args.date else [])).fetchone()
+    finally:
+        con.close()
+    if row:
+        for p in find_precedents(cfg.domain, cfg.metric_name, args.entity, str(row[0]), row[1],
+                                 anomaly_threshold=cfg.anomaly_threshold, k=args.k):
+            print(f"  {p['distance']:.3f}  {p['state']:<20} {p['time_period']}  z={p['z_score']:+.2f}  "
+                  f"trend={p['trend']:+.1%}")
@@ -1,3 +1,21 @@
 def filter_recent_years(df, year=2020):
     df_filtered = df[df['Year'] >= year]
     return df_filtered
+
+
+def load_yearly(config=None, db_path="osis_strategic_archives.db"):
+    """Yearly totals per entity from period_rollups, with a 'Year' column for filter_recent_years."""
+    import duckdb
+    from dataset_config import get_default_config
+    from metric_store import fetch_frame
+    config = config or get_default_config()
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        return fetch_frame(con, """
+            SELECT state, year(period_start) AS Year, n_obs, sum_value, mean_value, n_anomalies, n_critical
+            FROM period_rollups
+            WHERE domain = ? AND metric_name = ? AND grain = 'year'
+            ORDER BY state, Year
+        """, [config.domain, config.metric_name])
+    finally:
+        con.close()
@@ -0,0 +1,175 @@
+"""
+OSIS – Compact Prompt Builder (v1.0)
+=====================================
+Token-budgeted prompts for local Ollama calls.
+
+On a small local model, time-to-first-token grows with prompt length.
+Pretty-printed JSON spends tokens on indentation, quoting and braces, and
+the old narrate prompt carried its instruction twice. A PromptSpec names
+the fields a template actually needs, in priority order. build_prompt
+renders them as compact "key: value" lines under the instruction:
+
+    severity: CRITICAL
+    z_score: -4.31
+    actions: Do not act — validate reporting pipeline first. | ...
+
+If the prompt exceeds its token budget, optional fields are dropped from
+the lowest priority up, then the longest remaining values are truncated.
+Required fields are never dropped.
+
+Tokens are counted with the model's own tokenizer when OSIS_TOKENIZER
+names a tokenizer.json and the `tokenizers` package is installed.
+Otherwise a fast approximation is used. It counts word pieces and
+punctuation and errs slightly high for English, which is the safe
+direction for a budget.
+
+Every build returns PromptStats; callers attach latency once the model
+answers, and tracing spans carry both.
+"""
+
+import json
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+DEFAULT_BUDGET = 384        # prompt tokens per call
+MIN_VALUE_CHARS = 40        # truncation never cuts a value shorter than this
+
+_PIECE = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+
+
+@lru_cache(maxsize=1)
+def _model_tokenizer():
+    path = os.environ.get("OSIS_TOKENIZER")
+    if not path:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        return Tokenizer.from_file(path)
+    except Exception as e:
+        print(f"  ⚠️  Tokenizer unavailable ({e}) — using approximate token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    tok = _model_tokenizer()
+    if tok is not None:
+        return len(tok.encode(text).ids)
+    # long words split into ~6-char pieces, digits into ~3, each symbol one token
+    return len(_PIECE.findall(text))
+
+
+@dataclass
+class PromptSpec:
+    instruction: str
+    fields: tuple                       # (name, dotted path into the source) — highest priority first
+    required: tuple = ()
+    suffix: str = ""
+    budget: int = DEFAULT_BUDGET
+
+
+@dataclass
+class PromptStats:
+    prompt_tokens: int
+    prompt_chars: int
+    budget: int
+    dropped: list = field(default_factory=list)
+    truncated: list = field(default_factory=list)
+    baseline_tokens: Optional[int] = None    # what the uncompacted prompt would have cost
+    latency_ms: Optional[float] = None
+    eval_tokens: Optional[int] = None        # model-reported, when the backend returns it
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _get(source: dict, path: str):
+    """Dotted lookup; a list along the path maps the rest of it over its items."""
+    value = source
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [v.get(part) for v in value if isinstance(v, dict)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def compact_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}" if abs(value) < 1e5 else f"{value:,.0f}"
+    if isinstance(value, dict):
+        return "; ".join(f"{k}={compact_value(v)}" for k, v in value.items() if v not in (None, "", [], {}))
+    if isinstance(value, (list, tuple)):
+        return " | ".join(compact_value(v) for v in value if v not in (None, "", [], {}))
+    return str(value)
+
+
+def build_prompt(spec: PromptSpec, source: dict, budget: Optional[int] = None,
+                 baseline: Optional[str] = None) -> tuple:
+    """(prompt, PromptStats) with at most budget tokens where the required fields allow."""
+    budget = budget or spec.budget
+    lines = []
+    for name, path in spec.fields:
+        value = _get(source, path)
+        if value not in (None, "", [], {}):
+            lines.append([name, compact_value(value)])
+
+    def render():
+        body = "\n".join(f"{k}: {v}" for k, v in lines)
+        return f"{spec.instruction}\n\n{body}" + (f"\n\n{spec.suffix}" if spec.suffix else "")
+
+    prompt, dropped, truncated = render(), [], []
+    tokens = count_tokens(prompt)
+    while tokens > budget:
+        optional = [i for i, (k, _) in enumerate(lines) if k not in spec.required]
+        if optional:
+            dropped.append(lines.pop(optional[-1])[0])
+        else:
+            longest = max(lines, key=lambda kv: len(kv[1]), default=None)
+            if longest is None or len(longest[1]) <= MIN_VALUE_CHARS:
+                break   # required fields alone exceed the budget — send as is
+            longest[1] = longest[1][:max(MIN_VALUE_CHARS, len(longest[1]) * 3 // 4)].rstrip() + "…"
+            if longest[0] not in truncated:
+                truncated.append(longest[0])
+        prompt = render()
+        tokens = count_tokens(prompt)
+    stats = PromptStats(prompt_tokens=tokens, prompt_chars=len(prompt), budget=budget,
+                        dropped=dropped, truncated=truncated,
+                        baseline_tokens=count_tokens(baseline) if baseline else None)
+    return prompt, stats
+
+
+class timed:
+    """with timed(stats): ... — records the block's wall time as stats.latency_ms."""
+
+    def __init__(self, stats: PromptStats):
+        self.stats = stats
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self.stats
+
+    def __exit__(self, *exc):
+        self.stats.latency_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+        return False
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Show the compact narrate prompt for a chanakya_output.json")
+    parser.add_argument("path", nargs="?", default="chanakya_output.json")
+    parser.add_argument("--budget", type=int)
+    args = parser.parse_args()
+    from chanakya_agent import NARRATE_SPEC, render_request_for, legacy_prompt
+    with open(args.path) as f:
+        rr = render_request_for(json.load(f))
+    prompt, stats = build_prompt(NARRATE_SPEC, rr["render_request"], budget=args.budget,
+                                 baseline=legacy_prompt(rr))
+    print(prompt)
+    print(f"\n  {stats.prompt_tokens} tokens ({stats.prompt_chars} chars) vs {stats.baseline_tokens} "
+          f"uncompacted; budget {stats.budget}; dropped {stats.dropped or '-'}; truncated {stats.truncated or '-'}")
@@ -0,0 +1,253 @@
+"""
+OSIS – Structured Query Executor (v1.0)
+========================================
+Executes the structured queries produced by conversation_agent.translate_query
+against canonical_metrics:
+
+    {"dataset_id": "cdc_mortality", "entity_filter": "Texas",
+     "time_filter": "1y", "analysis_type": "anomaly"}
+
+Answers come from window_rollups — one precomputed row per (domain, metric,
+entity, time window) holding counts, value stats, the latest z-score and the
+top anomalies, built with the same rolling-window z-score as analysis.py.
+database_init rebuilds it after every ingest, so "worst anomaly this year" is a
+single indexed lookup. Windows are anchored on each entity's latest
+observation, not on today: archives lag real time.
+
+If the rollup is missing or was built with different thresholds than the
+dataset's config, the same aggregate runs live over canonical_metrics.
+
+Entity "all" ranks every entity in the dataset by its worst anomaly.
+
+Single-entity answers for the coarser windows also carry "periods", a
+breakdown from period_rollups at PERIOD_GRAINS[time_filter] (monthly for
+90d/1y, yearly for all), so no weekly rows are scanned for it.
+"""
+
+import json
+import time
+from typing import Optional
+
+DB_NAME      = "osis_strategic_archives.db"
+ROLLUP_TABLE = "window_rollups"
+WINDOWS      = {"7d": 7, "30d": 30, "90d": 90, "1y": 365, "all": None}
+ALL_ENTITIES = ("all", "*", "every", "all entities")
+TOP_N        = 5
+PERIOD_GRAINS = {"90d": "month", "1y": "month", "all": "year"}
+
+
+def _windows_sql(time_filters) -> str:
+    rows = ", ".join(f"('{tf}', {WINDOWS[tf] if WINDOWS[tf] is not None else 'NULL'})" for tf in time_filters)
+    return f"(VALUES {rows}) AS w(time_filter, days)"
+
+
+def _rollup_select(rolling_window: int, anomaly: float, critical: float, time_filters=tuple(WINDOWS)) -> str:
+    """
+    Per (domain, metric, entity, window) aggregate for one (domain, metric) —
+    shared by the rollup build and the live fallback. Takes the domain and
+    metric name as its first two positional parameters.
+    """
+    rolling_window, anomaly, critical = int(rolling_window), float(anomaly), float(critical)
+    return f"""
+        WITH base AS (
+            SELECT domain, metric_name, state, time_period, metric_value,
+                   AVG(metric_value)    OVER w AS rolling_mean,
+                   STDDEV(metric_value) OVER w AS rolling_std
+            FROM canonical_metrics
+            WHERE domain = ? AND metric_name = ?
+            WINDOW w AS (PARTITION BY domain, metric_name, state ORDER BY time_period
+                         ROWS BETWEEN {rolling_window} PRECEDING AND 1 PRECEDING)
+        ),
+        scored AS (
+            SELECT *, CASE WHEN rolling_std > 0 THEN ROUND((metric_value - rolling_mean) / rolling_std, 4)
+                           ELSE 0.0 END AS z_score
+            FROM base WHERE rolling_mean IS NOT NULL AND rolling_std IS NOT NULL
+        ),
+        latest AS (
+            SELECT domain, metric_name, state, MAX(time_period) AS as_of FROM scored GROUP BY ALL
+        )
+        SELECT s.domain, s.metric_name, s.state, w.time_filter, l.as_of,
+               {rolling_window} AS rolling_window, {anomaly} AS anomaly_threshold, {critical} AS critical_threshold,
+               COUNT(*)                            AS n_obs,
+               MIN(s.time_period)                  AS first_period,
+               ROUND(AVG(s.metric_value), 2)       AS mean_value,
+               MIN(s.metric_value)                 AS min_value,
+               MAX(s.metric_value)                 AS max_value,
+               arg_max(s.metric_value, s.time_period) AS latest_value,
+               arg_max(s.z_score, s.time_period)   AS latest_z,
+               COUNT(*) FILTER (WHERE ABS(s.z_score) >= {anomaly})  AS n_anomalies,
+               COUNT(*) FILTER (WHERE ABS(s.z_score) >= {critical}) AS n_critical,
+               max_by({{'time_period': s.time_period, 'value': s.metric_value,
+                        'rolling_mean': ROUND(s.rolling_mean, 2), 'z_score': s.z_score}},
+                      ABS(s.z_score), {TOP_N}) FILTER (WHERE ABS(s.z_score) >= {anomaly}) AS top_anomalies
+        FROM scored s
+        JOIN latest l USING (domain, metric_name, state)
+        CROSS JOIN {_windows_sql(time_filters)}
+        WHERE w.days IS NULL OR s.time_period > l.as_of - w.days
+        GROUP BY ALL
+    """
+
+
+def build_window_rollups(con, config) -> int:
+    """
+    Rebuild the config's (domain, metric) rows of window_rollups on a writable
+    connection; other datasets' rows are left alone. Called by database_init
+    after ingest. Returns rows written.
+    """
+    key = [config.domain, config.metric_name]
+    select = _rollup_select(config.rolling_window, config.anomaly_threshold, config.critical_threshold)
+    con.execute(f"CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} AS {select} LIMIT 0", key)
+    con.begin()
+    try:
+        con.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE domain = ? AND metric_name = ?", key)
+        n = con.execute(f"INSERT INTO {ROLLUP_TABLE} BY NAME {select} ORDER BY time_filter, state",
+                        key).fetchone()[0]
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    return n
+
+
+def _severity(z, config) -> str:
+    if z is None:
+        return "NORMAL"
+    az = abs(z)
+    if az >= config.critical_threshold: return "CRITICAL"
+    elif az >= config.anomaly_threshold: return "WARNING"
+    return "NORMAL"
+
+
+def _fetch(con, sql: str, params: list) -> list:
+    cur = con.execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+
+def execute_query(structured: dict, config=None, registry: Optional[dict] = None,
+                  db_path: str = DB_NAME, limit: int = 10) -> dict:
+    """
+    Run a structured query. Returns {"answer", "rows", "source", "elapsed_ms", ...};
+    "rows" holds one summary per entity, worst anomaly first.
+    """
+    import duckdb
+    import fanout_runner
+    t0 = time.perf_counter()
+    registry = registry or fanout_runner.load_registry()
+    dataset_id = structured.get("dataset_id") or next(iter(registry))
+    entity = str(structured.get("entity_filter") or "default").strip()
+    all_entities = entity.lower() in ALL_ENTITIES
+    if config is None:
+        named = None if all_entities or entity.lower() == "default" else entity
+        config = fanout_runner.resolve_config(fanout_runner.Target(dataset_id, named), registry)
+    time_filter = structured.get("time_filter") if structured.get("time_filter") in WINDOWS else "30d"
+    analysis_type = structured.get("analysis_type") or "both"
+
+    where = "domain = ? AND metric_name = ? AND time_filter = ?"
+    params = [config.domain, config.metric_name, time_filter]
+    if not all_entities:
+        where += " AND state = ?"
+        params.append(config.entity_filter)
+    order = (f"ORDER BY COALESCE(list_max(list_transform(top_anomalies, a -> ABS(a.z_score))), 0) DESC, "
+             f"state LIMIT {int(limit)}")
+
+    con = duckdb.connect(db_path, read_only=True)
+    try:
+        rows, source = [], "rollup"
+        try:
+            rows = _fetch(con, f"""
+                SELECT * FROM {ROLLUP_TABLE}
+                WHERE {where} AND rolling_window = ? AND anomaly_threshold = ? AND critical_threshold = ?
+                {order}""", params + [config.rolling_window, config.anomaly_threshold, config.critical_threshold])
+        except duckdb.CatalogException:
+            pass   # never built — fall through to the live aggregate
+        if not rows:
+            source = "live"
+            live = _rollup_select(config.rolling_window, config.anomaly_threshold,
+                                  config.critical_threshold, time_filters=(time_filter,))
+            rows = _fetch(con, f"SELECT * FROM ({live}) WHERE {where} {order}",
+                          [config.domain, config.metric_name] + params)
+
+        periods, grain = [], PERIOD_GRAINS.get(time_filter)
+        if grain and rows and not all_entities:
+            from period_rollups import TABLE as PERIOD_TABLE
+            days = WINDOWS[time_filter]
+            try:
+                periods = _fetch(con, f"""
+                    SELECT period_start, n_obs, sum_value, mean_value, min_value, max_value,
+                           n_anomalies, n_critical
+                    FROM {PERIOD_TABLE}
+                    WHERE domain = ? AND metric_name = ? AND state = ? AND grain = ?
+                      AND rolling_window = ? AND anomaly_threshold = ? AND critical_threshold = ?
+                      AND (?::INTEGER IS NULL OR period_start >= date_trunc('{grain}', ?::DATE - ?::INTEGER))
+                    ORDER BY period_start""",
+                    [config.domain, config.metric_name, config.entity_filter, grain, config.rolling_window,
+                     config.anomaly_threshold, config.critical_threshold, days, rows[0]["as_of"], days])
+            except duckdb.CatalogException:
+                pass   # built before period rollups existed — the window summary still answers
+    finally:
+        con.close()
+
+    for r in rows:
+        r["latest_severity"] = _severity(r.get("latest_z"), config)
+        for a in r.get("top_anomalies") or []:
+            a["severity"] = _severity(a["z_score"], config)
+    result = {
+        "query": structured,
+        "dataset_id": dataset_id,
+        "domain": config.domain,
+        "metric_name": config.metric_name,
+        "entity": "all" if all_entities else config.entity_filter,
+        "time_filter": time_filter,
+        "analysis_type": analysis_type,
+        "source": source,
+        "rows": rows,
+        "periods": periods,
+        "period_grain": grain if periods else None,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2),
+    }
+    result["answer"] = _answer(result, config)
+    return result
+
+
+def _answer(result: dict, config) -> str:
+    """Deterministic one-line answer — numbers only from the rows, no LLM."""
+    rows = result["rows"]
+    window = "all history" if result["time_filter"] == "all" else f"the last {result['time_filter']}"
+    if not rows:
+        return f"No {config.metric_name} data for {result['entity']} in {window}."
+    top = rows[0]
+    worst = (top.get("top_anomalies") or [None])[0]
+    scope = top["state"] if result["entity"] != "all" else f"{top['state']} (worst of {len(rows)} entities shown)"
+    if result["analysis_type"] == "forecast":
+        return (f"{scope}: latest {config.metric_name} {top['latest_value']:,.0f} "
+                f"(z={top['latest_z']:+.2f}, {top['latest_severity']}) as of {top['as_of']}. "
+                f"Forecast comes from the pipeline run.")
+    if worst is None:
+        return (f"{scope}: no anomalies in {window} up to {top['as_of']} "
+                f"({top['n_obs']} observations, latest z={top['latest_z']:+.2f}).")
+    return (f"{scope}: worst anomaly in {window} was {worst['time_period']} — "
+            f"{worst['value']:,.0f} vs rolling mean {worst['rolling_mean']:,.0f} (z={worst['z_score']:+.2f}, "
+            f"{worst['severity']}). {top['n_anomalies']} anomalies, {top['n_critical']} critical, "
+            f"as of {top['as_of']}.")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a structured OSIS query or rebuild window_rollups")
+    parser.add_argument("query", nargs="?", default="show me the worst anomaly this year")
+    parser.add_argument("--build", action="store_true", help="rebuild window_rollups for the default dataset")
+    args = parser.parse_args()
+    if args.build:
+        import duckdb
+        from dataset_config import get_default_config
+        con = duckdb.connect(DB_NAME)
+        try:
+            print(f"  window_rollups: {build_window_rollups(con, get_default_config())} rows")
+        finally:
+            con.close()
+    from conversation_agent import translate_query
+    import fanout_runner
+    structured = translate_query(args.query, list(fanout_runner.load_registry().values()))
+    res = execute_query(structured)
+    print(json.dumps({k: res[k] for k in ("answer", "source", "elapsed_ms")}, indent=2))
@@ -1,5 +1,5 @@
 
-from citta import get_streak, update_streak
+from citta import get_streak, update_streak, update_streaks
 from dataclasses import dataclass
 
 RAJAS_THRESHOLD = 3  # periods before escalation
@@ -13,25 +13,43 @@ class RajasResult:
     candidate_action: str = ""
 
 def evaluate_rajas(z_score: float, sutra_matched: bool,
-                   metric_key: str, domain: str) -> RajasResult:
+                   metric_key: str, domain: str, period: str = None) -> RajasResult:
     """
     Evaluate whether a signal is known (SATTVA), artifact (TAMAS),
     or persistent unexplained deviation requiring human review (RAJAS).
     Never invents a cause. Never suppresses silently.
+    period (the observed time period) makes re-evaluating the same observation a no-op.
     """
+    increment = _is_unmapped(z_score, sutra_matched)
+    streak, _ = update_streak(metric_key, domain, z_score, increment=increment, period=period)
+    return _build_result(z_score, sutra_matched, streak)
+
+def evaluate_rajas_batch(observations, domain: str) -> list[RajasResult]:
+    """
+    Evaluate every (metric_key, z_score, sutra_matched[, period]) observation in
+    one Citta transaction. A streak only advances when its period is new.
+    Returns RajasResults in input order.
+    """
+    observations = list(observations)
+    streaks = update_streaks(
+        [(key, z, _is_unmapped(z, matched), *period) for key, z, matched, *period in observations],
+        domain, rajas_threshold=RAJAS_THRESHOLD,
+    )
+    return [_build_result(z, matched, streaks[key][0]) for key, z, matched, *_ in observations]
+
+def _is_unmapped(z_score: float, sutra_matched: bool) -> bool:
+    return not sutra_matched and abs(z_score) > 2.0
+
+def _build_result(z_score: float, sutra_matched: bool, streak: int) -> RajasResult:
     if sutra_matched:
-        update_streak(metric_key, domain, z_score, increment=False)
         return RajasResult(state="SATTVA", escalate=False, streak=0,
                            note="Known cause — Sutra matched.")
 
     if abs(z_score) <= 2.0:
-        update_streak(metric_key, domain, z_score, increment=False)
         return RajasResult(state="TAMAS", escalate=False, streak=0,
                            note="Within normal range — no action required.")
 
-    # Unmapped anomaly — increment streak in Citta
-    streak, guna = update_streak(metric_key, domain, z_score, increment=True)
-
+    # Unmapped anomaly — streak already incremented in Citta
     if streak < RAJAS_THRESHOLD:
         return RajasResult(
             state="UNMAPPED", escalate=False, streak=streak,
@@ -71,4 +89,8 @@ if __name__ == "__main__":
     for i in range(4):
         r = evaluate_rajas(z_score=3.5, sutra_matched=False, metric_key=key, domain="public_health")
         print(f"Run {i+1}: state={r.state} streak={r.streak} escalate={r.escalate}")
+    # Batch: whole entity x metric sweep in one statement
+    batch = [(f"public_health:test_metric_{i}", 3.5 if i % 2 else 0.4, False) for i in range(6)]
+    for (k, _, _), r in zip(batch, evaluate_rajas_batch(batch, "public_health")):
+        print(f"Batch {k}: state={r.state} streak={r.streak}")
     print("Rajas escalation working correctly")
@@ -0,0 +1,155 @@
+"""
+OSIS – Stage Cache (v1.0)
+==========================
+Content-addressed cache for pipeline stage outputs.
+
+Each stage is keyed by a sha256 over everything it reads:
+  - data version   : fingerprint of the canonical_metrics slice it analyses
+  - config fields  : only the DatasetConfig fields the stage actually uses
+  - code version   : hash of the stage's source module(s) and the local modules they import
+  - upstream keys  : downstream stages chain the keys (or file hashes) of what they consume
+
+A hit restores the stage's Vaikhari output files and returns the cached
+result, so downstream agents see exactly what a fresh run would have written.
+Entries live in CACHE_DIR as one JSON file per key; least-recently-used
+entries are evicted beyond MAX_ENTRIES.
+"""
+
+import ast
+import json
+import hashlib
+import os
+from pathlib import Path
+
+CACHE_DIR   = ".osis_cache"
+MAX_ENTRIES = 128
+DB_NAME     = "osis_strategic_archives.db"
+_ROOT       = Path(__file__).resolve().parent
+
+
+def fingerprint(*parts) -> str:
+    """sha256 over a JSON encoding of the given parts."""
+    serialized = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(serialized).hexdigest()
+
+
+def code_version(*modules: str) -> str:
+    """
+    Hash the source of the named top-level modules (e.g. 'analysis') and of every
+    repo-local module they import, directly or transitively, including imports
+    made inside functions. Editing metric_store therefore invalidates the logic
+    stage even though only 'analysis' is named.
+    """
+    h = hashlib.sha256()
+    for name in sorted(_local_closure(modules)):
+        path = _ROOT / f"{name}.py"
+        h.update(name.encode())
+        h.update(path.read_bytes() if path.exists() else b"")
+    return h.hexdigest()
+
+
+def _local_closure(modules) -> set:
+    seen, todo = set(), list(modules)
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        path = _ROOT / f"{name}.py"
+        if not path.exists():
+            continue
+        for node in ast.walk(ast.parse(path.read_bytes(), filename=str(path))):
+            if isinstance(node, ast.Import):
+                found = [alias.name.split(".")[0] for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                found = [node.module.split(".")[0]]
+            else:
+                continue
+            todo.extend(m for m in found if (_ROOT / f"{m}.py").exists())
+    return seen
+
+
+def file_version(*paths: str) -> str:
+    """Hash the current contents of on-disk stage inputs (missing files hash as empty)."""
+    h = hashlib.sha256()
+    for name in paths:
+        path = Path(name)
+        h.update(name.encode())
+        h.update(path.read_bytes() if path.exists() else b"")
+    return h.hexdigest()
+
+
+def data_version(config) -> str:
+    """
+    Order-independent content fingerprint of one entity's canonical_metrics
+    slice. Ignores ingested_at, so re-ingesting identical data is a cache hit.
+    """
+    import duckdb
+    con = duckdb.connect(DB_NAME, read_only=True)
+    try:
+        row = con.execute("""
+            SELECT COUNT(*), MIN(time_period), MAX(time_period),
+                   BIT_XOR(HASH(time_period, metric_value))
+            FROM canonical_metrics
+            WHERE domain = ? AND metric_name = ? AND state = ?
+        """, [config.domain, config.metric_name, config.entity_filter]).fetchone()
+    finally:
+        con.close()
+    return fingerprint(list(row), duckdb.__version__)
+
+
+def config_fields(config, *fields: str) -> dict:
+    return {f: getattr(config, f) for f in fields}
+
+
+def run_cached(stage: str, key: str, fn, outputs=(), force=False,
+               cacheable=lambda result: True, cache_dir: str = CACHE_DIR):
+    """
+    Return (result, hit). On a hit, restore `outputs` files and skip `fn`.
+    On a miss (or force=True), run `fn()`, snapshot `outputs`, store the entry
+    if cacheable(result) — failed or skipped stages are never cached.
+    """
+    entry_path = Path(cache_dir) / f"{stage}-{key[:32]}.json"
+
+    if not force and entry_path.exists():
+        try:
+            entry = json.loads(entry_path.read_text())
+            if entry.get("key") == key:
+                # files are stored by basename so a hit restores into this run's output_dir
+                for name in outputs:
+                    content = entry["files"].get(Path(name).name)
+                    if content is not None:
+                        Path(name).write_text(content)
+                os.utime(entry_path)  # LRU touch
+                return entry["result"], True
+        except (OSError, ValueError, KeyError):
+            pass  # corrupt entry — fall through and recompute
+
+    result = fn()
+    if cacheable(result):
+        files = {Path(name).name: Path(name).read_text() for name in outputs if Path(name).exists()}
+        Path(cache_dir).mkdir(exist_ok=True)
+        tmp = entry_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"stage": stage, "key": key, "result": result, "files": files},
+                                  default=str))
+        tmp.replace(entry_path)
+        evict(cache_dir)
+    return result, False
+
+
+def evict(cache_dir: str = CACHE_DIR, max_entries: int = MAX_ENTRIES) -> int:
+    """Drop least-recently-used entries beyond max_entries. Returns count removed."""
+    def _mtime(p):
+        try:
+            return p.stat().st_mtime
+        except FileNotFoundError:   # evicted concurrently by another run
+            return 0.0
+    entries = sorted(Path(cache_dir).glob("*.json"), key=_mtime)
+    stale = entries[:max(len(entries) - max_entries, 0)]
+    for p in stale:
+        p.unlink(missing_ok=True)
+    return len(stale)
+
+
+def clear(cache_dir: str = CACHE_DIR) -> int:
+    return evict(cache_dir, max_entries=0) if Path(cache_dir).exists() else 0
@@ -1,122 +1,363 @@
 """
-OSIS – Inference Agent / Summarization Layer (v1.5)
+OSIS – Inference Agent / Summarization Layer (v1.7)
 ====================================================
 Enhancements:
   - Adds confidence scoring and Tarka validation
   - Generates hash of the payload for auditability
   - Maintains deterministic brief as ground truth
+  - Batch briefs: per-domain templates compiled once render every entity's
+    fact packet in one call (python summarization.py --batch briefs.jsonl)
+  - Commentary cache: the LLM only ever answers one of three fixed
+    questions (one per z-score regime), so each answer is stored with its
+    filter result, keyed by (question, model, options). A cached question
+    never waits on Ollama. Warm all three offline:
+        python summarization.py --warm
 """
 
 import json
+import os
 import re
-import requests
+import string
 import hashlib
+import threading
 from datetime import datetime, timezone
+from pathlib import Path
+from tracing import span
+
+try:
+    import fcntl
+except ImportError:   # Windows: single-writer use only
+    fcntl = None
 
 OLLAMA_URL  = "http://127.0.0.1:11434/api/chat"
 MODEL_NAME = "phi3:mini"
 INPUT_FILE  = "logic_output.json"
 OUTPUT_FILE = "strategic_brief.txt"
+BATCH_OUTPUT_FILE = "briefs.jsonl"
+COMMENTARY_CACHE = ".osis_cache/commentary.json"
 
+SYSTEM_PROMPT = ("You are a public health expert. "
+                 "Answer in exactly one complete sentence under 180 characters. "
+                 "Do not mention COVID-19 specifically. "
+                 "Do not use bullet points or lists.")
+COMMENTARY_OPTIONS = {"temperature": 0.2, "num_predict": 60}
+REGIME_QUESTIONS = {
+    "negative": "In one sentence, why do CDC mortality reports show lower death counts in the most recent weeks compared to earlier weeks?",
+    "positive": "In one sentence, why does excess all-cause mortality require epidemiological investigation beyond just counting deaths?",
+    "normal":   "In one sentence, why is routine mortality surveillance valuable even when no anomalies are detected?",
+}
 
-def deterministic_brief(payload: dict) -> str:
-    state  = payload["state"]
-    date   = payload["timestamp"][:10]
-    value  = int(payload["observed_value"])
-    z      = payload["analysis"]["z_score"]
-    mean   = int(payload["baseline_stats"]["rolling_mean"])
-    n_crit = payload["analysis"]["total_critical_in_history"]
-    n_anom = payload["analysis"]["total_anomalies_in_history"]
-
-    if z < -2.0:
-        s1 = (f"For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
-              f"which is {abs(z):.2f} standard deviations below the 4-week rolling mean of {mean:,}.")
-        s2 = ("In CDC mortality surveillance, a strongly negative Z-score in the most recent "
-              "weeks is characteristic of data reporting lag — death certificates are still "
-              "being processed and have not yet been fully counted, not a genuine mortality decline.")
-        s3 = (f"Do not act on this figure as a real trend; validate the reporting pipeline "
-              f"and reassess in 4 to 6 weeks when the data matures "
-              f"(this dataset contains {n_crit} prior CRITICAL events across {n_anom} total anomalies).")
-    elif z > 2.0:
-        s1 = (f"For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
-              f"which is {z:.2f} standard deviations above the 4-week rolling mean of {mean:,}.")
-        s2 = (f"This positive deviation represents genuine excess mortality; "
-              f"the historical record shows {n_crit} prior CRITICAL events in this dataset, "
-              f"confirming that surges of this magnitude have occurred before and require immediate attention.")
-        s3 = ("Escalate to epidemiological review immediately, cross-reference with cause-specific "
-              "mortality data, and prepare resource surge protocols for affected jurisdictions.")
-    else:
-        s1 = (f"For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
-              f"with a Z-score of {z:.2f} relative to the 4-week rolling mean of {mean:,}.")
-        s2 = ("This observation falls within normal statistical bounds, "
-              "indicating stable mortality patterns with no significant deviation from baseline.")
-        s3 = (f"Continue routine surveillance monitoring; "
-              f"note that this dataset has recorded {n_crit} CRITICAL events historically, "
-              "so ongoing vigilance remains appropriate.")
+_commentary = None          # (file version, entries) as last read or written
+_commentary_lock = threading.Lock()
+
+
+# Brief templates per domain and z-score regime: three sentences each, as
+# str.format templates over the fields built in _brief_fields. Joined and
+# checked once at import (see _BRIEFS), rendered with format_map.
+BRIEF_TEMPLATES = {
+    "public_health": {
+        "negative": (
+            "For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
+            "which is {abs_z:.2f} standard deviations below the {window}-week rolling mean of {mean:,}.",
+            "In CDC mortality surveillance, a strongly negative Z-score in the most recent "
+            "weeks is characteristic of data reporting lag — death certificates are still "
+            "being processed and have not yet been fully counted, not a genuine mortality decline.",
+            "Do not act on this figure as a real trend; validate the reporting pipeline "
+            "and reassess in 4 to 6 weeks when the data matures "
+            "(this dataset contains {n_crit} prior CRITICAL events across {n_anom} total anomalies).",
+        ),
+        "positive": (
+            "For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
+            "which is {z:.2f} standard deviations above the {window}-week rolling mean of {mean:,}.",
+            "This positive deviation represents genuine excess mortality; "
+            "the historical record shows {n_crit} prior CRITICAL events in this dataset, "
+            "confirming that surges of this magnitude have occurred before and require immediate attention.",
+            "Escalate to epidemiological review immediately, cross-reference with cause-specific "
+            "mortality data, and prepare resource surge protocols for affected jurisdictions.",
+        ),
+        "normal": (
+            "For the week ending {date}, {state} recorded {value:,} all-cause deaths, "
+            "with a Z-score of {z:.2f} relative to the {window}-week rolling mean of {mean:,}.",
+            "This observation falls within normal statistical bounds, "
+            "indicating stable mortality patterns with no significant deviation from baseline.",
+            "Continue routine surveillance monitoring; "
+            "note that this dataset has recorded {n_crit} CRITICAL events historically, "
+            "so ongoing vigilance remains appropriate.",
+        ),
+    },
+    "_default": {
+        "negative": (
+            "For the period ending {date}, {state} recorded {value:,} {metric}, "
+            "which is {abs_z:.2f} standard deviations below the {window}-period rolling mean of {mean:,}.",
+            "A strongly negative Z-score in the most recent periods can reflect incomplete "
+            "reporting as well as a genuine decline.",
+            "Validate data completeness before acting, and reassess when later periods arrive "
+            "(this dataset contains {n_crit} prior CRITICAL events across {n_anom} total anomalies).",
+        ),
+        "positive": (
+            "For the period ending {date}, {state} recorded {value:,} {metric}, "
+            "which is {z:.2f} standard deviations above the {window}-period rolling mean of {mean:,}.",
+            "This is an above-baseline signal; the historical record shows {n_crit} prior CRITICAL "
+            "events in this dataset.",
+            "Investigate the root cause and validate against historical patterns before escalating.",
+        ),
+        "normal": (
+            "For the period ending {date}, {state} recorded {value:,} {metric}, "
+            "with a Z-score of {z:.2f} relative to the {window}-period rolling mean of {mean:,}.",
+            "This observation falls within normal statistical bounds.",
+            "Continue routine monitoring; this dataset has recorded {n_crit} CRITICAL events historically.",
+        ),
+    },
+}
+
+# One value of each _brief_fields type: every template is test-rendered against
+# these at import, so an unknown field or a bad format spec fails immediately.
+_BRIEF_FIELD_SAMPLES = {"state": "", "date": "", "value": 0, "z": 0.0, "abs_z": 0.0, "mean": 0,
+                        "window": 0, "metric": "", "n_crit": 0, "n_anom": 0}
+
+
+def _checked_template(name: str, sentences: tuple) -> str:
+    template = " ".join(sentences)
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field is not None and field not in _BRIEF_FIELD_SAMPLES:
+            raise ValueError(f"brief template {name}: unknown field {{{field}}}")
+    template.format_map(_BRIEF_FIELD_SAMPLES)
+    return template
+
+
+_BRIEFS = {domain: {regime: _checked_template(f"{domain}/{regime}", sentences)
+                    for regime, sentences in regimes.items()}
+           for domain, regimes in BRIEF_TEMPLATES.items()}
+
+
+def _brief_fields(payload: dict) -> dict:
+    z = payload["analysis"]["z_score"]
+    return {
+        "state":  payload["state"],
+        "date":   payload["timestamp"][:10],
+        "value":  int(payload["observed_value"]),
+        "z":      z,
+        "abs_z":  abs(z),
+        "mean":   int(payload["baseline_stats"]["rolling_mean"]),
+        "window": payload["baseline_stats"].get("window_periods", 4),
+        "metric": str(payload.get("metric_name", "")).replace("_", " "),
+        "n_crit": payload["analysis"]["total_critical_in_history"],
+        "n_anom": payload["analysis"]["total_anomalies_in_history"],
+    }
 
-    return f"{s1} {s2} {s3}"
+
+def deterministic_brief(payload: dict) -> str:
+    fields = _brief_fields(payload)
+    templates = _BRIEFS.get(payload.get("domain"), _BRIEFS["_default"])
+    return templates[z_regime(fields["z"])].format_map(fields)
 
 
-def llm_commentary(payload: dict) -> tuple[str | None, float]:
+def generate_batch_briefs(fact_packets, output_file: str = BATCH_OUTPUT_FILE) -> list:
     """
-    Returns a one-sentence LLM commentary plus confidence estimate (0-1)
+    Deterministic briefs for many fact packets (e.g. analysis.run_multi_entity_audit)
+    in one call. fact_packets is a {entity: packet} dict or a list of packets;
+    failed packets are skipped. Writes JSONL, or Parquet when output_file ends
+    in .parquet, and returns the rows.
     """
-    z = payload["analysis"]["z_score"]
+    packets = fact_packets.values() if isinstance(fact_packets, dict) else fact_packets
+    generated_at = datetime.now(timezone.utc).isoformat()
+    rows = []
+    with span("batch_briefs", kind="render") as sp:
+        for packet in packets:
+            if packet.get("status") != "success":
+                continue
+            payload = packet["payload"]
+            rows.append({
+                "domain": payload["domain"],
+                "metric_name": payload["metric_name"],
+                "entity": payload["state"],
+                "timestamp": payload["timestamp"][:10],
+                "z_score": payload["analysis"]["z_score"],
+                "severity": payload["analysis"]["severity"],
+                "core_source": "deterministic",
+                "payload_hash": hash_payload(payload),
+                "generated_at": generated_at,
+                "brief": deterministic_brief(payload),
+            })
+        sp.rows_out = len(rows)
+    if output_file:
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        if str(output_file).endswith(".parquet"):
+            import duckdb
+            con = duckdb.connect()
+            try:
+                con.execute("CREATE TABLE briefs (domain VARCHAR, metric_name VARCHAR, entity VARCHAR, timestamp DATE, "
+                            "z_score DOUBLE, severity VARCHAR, core_source VARCHAR, payload_hash VARCHAR, "
+                            "generated_at TIMESTAMPTZ, brief VARCHAR)")
+                con.executemany("INSERT INTO briefs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [list(r.values()) for r in rows])
+                con.execute(f"COPY briefs TO '{Path(output_file).as_posix()}' (FORMAT PARQUET)")
+            finally:
+                con.close()
+        else:
+            with open(output_file, "w") as f:
+                for r in rows:
+                    f.write(json.dumps(r) + "\n")
+    return rows
+
+
+def z_regime(z: float) -> str:
+    if z < -2.0: return "negative"
+    elif z > 2.0: return "positive"
+    return "normal"
+
+
+def filter_commentary(sentence: str) -> tuple[bool, str]:
+    """Basic filtering of a raw LLM sentence → (passed, reason)."""
+    if not sentence or sentence[-1] not in ".!?":
+        return False, "incomplete sentence"
+    if len(sentence) > 250:
+        return False, "too long"
+    if sentence.count(".") > 2:
+        return False, "more than one sentence"
+    if any(w in sentence.lower() for w in ["covid", "coronavirus", "pandemic", "vaccine"]):
+        return False, "forbidden topic"
+    for n_str in re.findall(r"\b[\d,]+\b", sentence):
+        if n_str.replace(",", "") and int(n_str.replace(",", "")) > 500_000:
+            return False, "implausible number"
+    return True, "PASSED"
+
+
+def _commentary_key(question: str, model: str = MODEL_NAME, options: dict = COMMENTARY_OPTIONS) -> str:
+    raw = json.dumps([SYSTEM_PROMPT, question, model, options], sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _commentary_version(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-    if z < -2.0:
-        question = "In one sentence, why do CDC mortality reports show lower death counts in the most recent weeks compared to earlier weeks?"
-    elif z > 2.0:
-        question = "In one sentence, why does excess all-cause mortality require epidemiological investigation beyond just counting deaths?"
-    else:
-        question = "In one sentence, why is routine mortality surveillance valuable even when no anomalies are detected?"
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a public health expert. "
-                "Answer in exactly one complete sentence under 180 characters. "
-                "Do not mention COVID-19 specifically. "
-                "Do not use bullet points or lists."
-            )
-        },
-        {"role": "user", "content": question}
-    ]
 
+def _load_commentary() -> dict:
+    """The cache file's entries, re-read only when a stat shows another writer changed it."""
+    global _commentary
+    path = Path(COMMENTARY_CACHE)
+    version = _commentary_version(path)
+    cached = _commentary
+    if cached is not None and cached[0] == version:
+        return cached[1]
     try:
+        store = json.loads(path.read_text())
+    except (OSError, ValueError):
+        store = {}
+    _commentary = (version, store)
+    return store
+
+
+def _store_commentary(key: str, entry: dict) -> None:
+    """
+    Merge one entry into the cache file. The file is re-read under an advisory
+    lock first, so entries written by other processes since this one loaded
+    the cache are kept rather than overwritten by a stale in-memory copy.
+    """
+    global _commentary
+    path = Path(COMMENTARY_CACHE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _commentary_lock, open(path.with_suffix(".lock"), "a") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            try:
+                store = json.loads(path.read_text())
+            except (OSError, ValueError):
+                store = {}
+            store[key] = entry
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(store, indent=2))
+            tmp.replace(path)
+            _commentary = (_commentary_version(path), store)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _ask_commentary(question: str, model: str = MODEL_NAME, options: dict = COMMENTARY_OPTIONS) -> dict:
+    """One Ollama round trip → cache entry {"sentence", "passed", "reason", ...}; not stored on error."""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": question}]
+    import requests
+    with span("ollama_chat", kind="llm", model=model,
+              payload_bytes=len(json.dumps(messages))) as sp:
         response = requests.post(
             OLLAMA_URL,
-            json={
-                "model": MODEL_NAME,
-                "messages": messages,
-                "stream": False,
-                "options": {"temperature": 0.2, "num_predict": 60}
-            },
+            json={"model": model, "messages": messages, "stream": False, "options": options},
             timeout=120
         )
-        response.raise_for_status()
-        sentence = response.json()["message"]["content"].strip()
+        sp.attrs["response_bytes"] = len(response.content)
+    response.raise_for_status()
+    sentence = response.json()["message"]["content"].strip()
+    passed, reason = filter_commentary(sentence)
+    return {"question": question, "model": model, "options": options, "sentence": sentence,
+            "passed": passed, "reason": reason, "cached_at": datetime.now(timezone.utc).isoformat()}
+
+
+def cached_commentary(question: str, model: str = MODEL_NAME, options: dict = COMMENTARY_OPTIONS):
+    """The stored entry for this exact question/model/options, or None."""
+    with _commentary_lock:
+        return _load_commentary().get(_commentary_key(question, model, options))
 
-        # Basic filtering
-        if not sentence or sentence[-1] not in ".!?":
-            return None, 0.0
-        if len(sentence) > 250:
-            return None, 0.0
-        if sentence.count(".") > 2:
-            return None, 0.0
-        if any(w in sentence.lower() for w in ["covid", "coronavirus", "pandemic", "vaccine"]):
-            return None, 0.0
-        for n_str in re.findall(r"\b[\d,]+\b", sentence):
-            if int(n_str.replace(",", "")) > 500_000:
-                return None, 0.0
 
-        # Confidence heuristic: short, single-sentence, deterministic-aligned → high
-        confidence = max(0.5, 1 - abs(z)/6)  # z in [-6,6], scaled confidence
-        return sentence, confidence
+def commentary_cached(payload: dict) -> bool:
+    """True when the question for this payload's regime is already answered."""
+    return cached_commentary(REGIME_QUESTIONS[z_regime(payload["analysis"]["z_score"])]) is not None
 
-    except Exception:
+
+def llm_commentary(payload: dict, use_cache: bool = True) -> tuple[str | None, float]:
+    """
+    Returns a one-sentence LLM commentary plus confidence estimate (0-1).
+    A cached answer (accepted or rejected) is returned without contacting Ollama.
+    A fresh answer is only stored if it passed the filter; a rejected one is
+    asked again next run. Only warm_commentary_cache stores rejections, after
+    its retries.
+    """
+    z = payload["analysis"]["z_score"]
+    question = REGIME_QUESTIONS[z_regime(z)]
+
+    entry = cached_commentary(question) if use_cache else None
+    if entry is None:
+        try:
+            entry = _ask_commentary(question)
+        except Exception:
+            return None, 0.0
+        if use_cache and entry["passed"]:
+            _store_commentary(_commentary_key(question), entry)
+    if not entry["passed"]:
         return None, 0.0
 
+    # Confidence heuristic: short, single-sentence, deterministic-aligned → high
+    confidence = max(0.5, 1 - abs(z)/6)  # z in [-6,6], scaled confidence
+    return entry["sentence"], confidence
+
+
+def warm_commentary_cache(model: str = MODEL_NAME, options: dict = COMMENTARY_OPTIONS,
+                          force: bool = False, attempts: int = 3) -> dict:
+    """
+    Answer every regime question ahead of time. Rejected sentences are retried
+    up to attempts times; the last result is stored either way, so runtime
+    never re-asks. Returns {regime: entry | None}; None means Ollama was unreachable.
+    """
+    out = {}
+    for regime, question in REGIME_QUESTIONS.items():
+        entry = None if force else cached_commentary(question, model, options)
+        for _ in range(attempts):
+            if entry is not None and entry["passed"]:
+                break
+            try:
+                entry = _ask_commentary(question, model, options)
+            except Exception:
+                break
+        if entry is not None:
+            _store_commentary(_commentary_key(question, model, options), entry)
+        out[regime] = entry
+    return out
+
 
 def hash_payload(payload: dict) -> str:
     """Generate SHA256 hash of payload JSON for auditability"""
@@ -124,7 +365,8 @@ def hash_payload(payload: dict) -> str:
     return hashlib.sha256(serialized).hexdigest()
 
 
-def generate_strategic_brief(input_file: str = INPUT_FILE, export: bool = True) -> str:
+def generate_strategic_brief(input_file: str = INPUT_FILE, export: bool = True,
+                             output_file: str = OUTPUT_FILE) -> str:
     print(f"\n{'='*55}")
     print(f"  🏛️  OSIS Inference Agent — Strategic Brief v1.5")
     print(f"{'='*55}\n")
@@ -143,6 +385,7 @@ def generate_strategic_brief(input_file: str = INPUT_FILE, export: bool = True)
     payload = logic_output["payload"]
     core_brief = deterministic_brief(payload)
 
+    commentary_hit = commentary_cached(payload)
     commentary, confidence = llm_commentary(payload)
     # Tarka validation
     issues = []
@@ -180,6 +423,7 @@ def generate_strategic_brief(input_file: str = INPUT_FILE, export: bool = True)
             "model": MODEL_NAME,
             "core_source": "deterministic",
             "commentary_source": MODEL_NAME if commentary else None,
+            "commentary_cache": "hit" if commentary_hit else "miss",
             "confidence": confidence,
             "tarka_validation": {
                 "passed": passed,
@@ -189,12 +433,28 @@ def generate_strategic_brief(input_file: str = INPUT_FILE, export: bool = True)
             "payload_hash": payload_hash,
             "brief": final_brief
         }
-        with open(OUTPUT_FILE, "w") as f:
+        with open(output_file, "w") as f:
             json.dump(out, f, indent=2)
-        print(f"✅ Brief saved → {OUTPUT_FILE}\n")
+        print(f"✅ Brief saved → {output_file}\n")
 
     return final_brief
 
 
 if __name__ == "__main__":
-    generate_strategic_brief()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="OSIS Inference Agent")
+    parser.add_argument("--warm", action="store_true", help="answer all three regime questions into the commentary cache")
+    parser.add_argument("--force", action="store_true", help="with --warm, re-ask even cached questions")
+    parser.add_argument("--batch", nargs="?", const=BATCH_OUTPUT_FILE, metavar="OUT",
+                        help="deterministic briefs for every entity → OUT (.jsonl or .parquet)")
+    args = parser.parse_args()
+    if args.batch:
+        from analysis import run_multi_entity_audit
+        rows = generate_batch_briefs(run_multi_entity_audit(), output_file=args.batch)
+        print(f"✅ {len(rows)} briefs saved → {args.batch}")
+    elif args.warm:
+        for regime, entry in warm_commentary_cache(force=args.force).items():
+            status = "unreachable" if entry is None else entry["reason"]
+            print(f"  {regime:<9} {status:<22} {(entry or {}).get('sentence', '')[:80]}")
+    else:
+        generate_strategic_brief()
\ No newline at end of file
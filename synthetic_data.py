@@ -0,0 +1,136 @@
+"""
+OSIS – Synthetic Data Generator (v1.0)
+=======================================
+Deterministic N entities × T weeks series for demos and benchmarks, with the
+shapes the agents are built to find:
+
+  - seasonality  : winter peak, per-entity amplitude and phase jitter
+  - spikes       : multi-week surges (excess signal, positive z)
+  - lag dips     : the last LAG_WEEKS weeks under-reported and recovering
+                   toward the present (the CDC reporting-lag signature),
+                   plus isolated mid-series dips
+  - noise        : Poisson-like, proportional to level
+
+Same (entities, weeks, seed) → byte-identical output. Columns follow a
+DatasetConfig (date_col / entity_col / value_col), so the files ingest
+through database_init unchanged:
+
+    python synthetic_data.py --entities 50 --weeks 260 --out data/synthetic.csv
+    python synthetic_data.py --preset hospital          # writes data/hospital_admissions.csv
+
+.csv, .json (records) and .parquet are chosen by extension. generate()
+also returns the injected events as ground truth.
+"""
+
+import csv
+import json
+from dataclasses import replace
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from dataset_config import DatasetConfig, HOSPITAL_ADMISSIONS, get_default_config
+
+START_DATE     = date(2018, 1, 6)     # a Saturday, like CDC week_ending_date
+LAG_WEEKS      = 3
+SPIKES_PER_10Y = 4                    # expected surges per entity per ten years
+DIPS_PER_10Y   = 3
+
+
+def synthetic_config(source_path: str, base: DatasetConfig = None) -> DatasetConfig:
+    """A CSV-sourced copy of base (default: CDC mortality columns) pointing at source_path."""
+    base = base or get_default_config()
+    return replace(base, source_type="csv", source_path=str(source_path),
+                   source_label=f"Synthetic ({Path(source_path).name})")
+
+
+def entity_names(n: int) -> list:
+    return [f"Entity {i:03d}" for i in range(n)]
+
+
+def generate(entities: int = 10, weeks: int = 260, seed: int = 7, config: DatasetConfig = None,
+             start: date = START_DATE) -> tuple:
+    """
+    → (rows, events). rows are dicts keyed by the config's column names;
+    events are {"entity", "kind" ("spike" | "dip" | "lag"), "start", "weeks"}.
+    """
+    config = config or get_default_config()
+    rng = np.random.default_rng(seed)
+    names = entity_names(entities)
+    t = np.arange(weeks)
+    dates = [(start + timedelta(weeks=int(w))).isoformat() for w in t]
+    rows, events = [], []
+    for name in names:
+        level = float(np.exp(rng.normal(7.0, 1.0)))                     # ~100 to ~10,000 per week
+        amp = rng.uniform(0.05, 0.25)
+        phase = rng.normal(0.0, 2.0)
+        trend = rng.normal(0.0, 0.02) / 52                              # drift per week
+        mean = level * (1 + amp * np.cos(2 * np.pi * (t - phase) / 52.18)) * (1 + trend) ** t
+
+        for _ in range(rng.poisson(SPIKES_PER_10Y * weeks / 522)):
+            s, width = int(rng.integers(8, max(9, weeks - LAG_WEEKS - 8))), int(rng.integers(2, 7))
+            height = rng.uniform(0.25, 0.8)
+            shape = np.sin(np.linspace(0, np.pi, width + 2)[1:-1])
+            mean[s:s + width] *= 1 + height * shape[:len(mean[s:s + width])]
+            events.append({"entity": name, "kind": "spike", "start": dates[s], "weeks": width})
+        for _ in range(rng.poisson(DIPS_PER_10Y * weeks / 522)):
+            s = int(rng.integers(8, max(9, weeks - LAG_WEEKS - 2)))
+            mean[s] *= rng.uniform(0.3, 0.7)
+            events.append({"entity": name, "kind": "dip", "start": dates[s], "weeks": 1})
+
+        values = rng.normal(mean, np.sqrt(mean) * 1.5)
+        completeness = np.linspace(0.95, 0.45, LAG_WEEKS) * rng.uniform(0.9, 1.05)
+        values[-LAG_WEEKS:] *= np.minimum(completeness, 1.0)
+        events.append({"entity": name, "kind": "lag", "start": dates[-LAG_WEEKS], "weeks": LAG_WEEKS})
+
+        for d, v in zip(dates, np.maximum(np.round(values), 1)):
+            row = {config.date_col: d, config.value_col: int(v)}
+            if config.entity_col:
+                row[config.entity_col] = name
+            rows.append(row)
+    return rows, events
+
+
+def write(rows: list, path: str) -> Path:
+    """Write rows as CSV, JSON records or Parquet by extension."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".json":
+        path.write_text(json.dumps(rows))
+    elif path.suffix == ".parquet":
+        import duckdb
+        tmp = path.with_suffix(".tmp.json")
+        tmp.write_text(json.dumps(rows))
+        try:
+            duckdb.sql(f"COPY (SELECT * FROM read_json_auto('{tmp.as_posix()}')) "
+                       f"TO '{path.as_posix()}' (FORMAT PARQUET)")
+        finally:
+            tmp.unlink()
+    else:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic OSIS data")
+    parser.add_argument("--entities", type=int, default=10)
+    parser.add_argument("--weeks", type=int, default=260)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--preset", choices=["cdc", "hospital"], default="cdc",
+                        help="column names to use (hospital writes the demo dataset's CSV)")
+    parser.add_argument("--out", help="output path (.csv, .json or .parquet)")
+    parser.add_argument("--events", help="also write the injected events as JSON here")
+    args = parser.parse_args()
+    cfg = HOSPITAL_ADMISSIONS if args.preset == "hospital" else get_default_config()
+    out = args.out or (cfg.source_path if args.preset == "hospital" else "data/synthetic.csv")
+    rows, events = generate(args.entities, args.weeks, args.seed, config=cfg)
+    write(rows, out)
+    if args.events:
+        Path(args.events).write_text(json.dumps(events, indent=2))
+    print(f"  {len(rows):,} rows ({args.entities} entities × {args.weeks} weeks), "
+          f"{sum(e['kind'] == 'spike' for e in events)} spikes, {sum(e['kind'] == 'dip' for e in events)} dips → {out}")
@@ -0,0 +1,45 @@
+import contextlib
+import io
+
+import pytest
+
+import citta
+import rajas_escalation
+
+
+@pytest.fixture
+def citta_db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        citta.init_citta()
+    return tmp_path
+
+
+def test_streak_advances_once_per_period(citta_db):
+    def run(period):
+        return rajas_escalation.evaluate_rajas_batch([("d:m:X", 3.5, False, period)], "d")[0]
+
+    assert [run("2024-01-06").streak for _ in range(4)] == [1, 1, 1, 1]   # re-runs are not new evidence
+    assert run("2024-01-13").state == "UNMAPPED"
+    result = run("2024-01-20")
+    assert (result.state, result.streak, result.escalate) == ("RAJAS", 3, True)
+
+
+def test_known_cause_resets_streak(citta_db):
+    rajas_escalation.evaluate_rajas_batch([("d:m:X", 3.5, False, "2024-01-06")], "d")
+    result = rajas_escalation.evaluate_rajas_batch([("d:m:X", 3.5, True, "2024-01-13")], "d")[0]
+    assert result.state == "SATTVA" and citta.get_streak("d:m:X") == 0
+
+
+def test_archived_memory_reads_back_from_custom_dir(citta_db):
+    citta.append_memory("agent", "d", "m", "X", "1.0", "in", "out", "PASSED", "SATTVA")
+    con = citta._connect()
+    con.execute("UPDATE agent_memory SET execution_ts = TIMESTAMP '2024-01-10 12:00:00'")
+    con.close()
+    archive = citta_db / "elsewhere"
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert citta.compact_citta(retention_days=30, archive_dir=archive)["agent_memory"] == 1
+
+    assert citta.query_memory(start="2024-01-01") == []          # default ARCHIVE_DIR holds nothing
+    rows = citta.query_memory(start="2024-01-01", archive_dir=archive)
+    assert len(rows) == 1 and "agent" in rows[0]
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import conversation_agent as ca
+
+DATASETS = [{"id": "cdc_mortality", "label": "CDC NVSS Weekly Mortality", "domain": "public_health"},
+            {"id": "demo_hospital", "label": "Demo Hospital Admissions", "domain": "healthcare"}]
+
+
+def parse(query, entities=None):
+    return ca._parse_query(query, DATASETS, entities)
+
+
+@pytest.mark.parametrize("query, time_filter", [
+    ("worst anomaly ever in Ohio", "all"),
+    ("historical spikes in Ohio", "all"),
+    ("anomalies in Ohio every week", "7d"),       # "every" is not "ever"
+    ("anomalies this year", "1y"),
+    ("anomalies over 12 months", "1y"),
+    ("spikes over the past two quarters", "1y"),
+    ("anomalies in the last 10 days", "30d"),
+    ("forecast for the next 3 months", "90d"),
+])
+def test_time_filter(query, time_filter):
+    assert parse(query)["time_filter"] == time_filter
+
+
+@pytest.mark.parametrize("query, analysis_type", [
+    ("worst anomaly in Texas", "anomaly"),
+    ("unexpected spike in Texas", "anomaly"),     # "expected" inside "unexpected" is not a forecast
+    ("expected deaths in Texas", "forecast"),
+    ("forecasting Texas deaths", "forecast"),
+    ("predicted surge in Texas", "both"),
+])
+def test_analysis_type(query, analysis_type):
+    assert parse(query)["analysis_type"] == analysis_type
+
+
+def test_vague_query_is_left_to_the_llm():
+    assert parse("tell me about Texas") is None
+
+
+@pytest.mark.parametrize("query, entity", [
+    ("anomalies in Washington DC", "District of Columbia"),
+    ("anomalies in Washington, D.C. this year", "District of Columbia"),
+    ("anomalies in DC", "District of Columbia"),
+    ("anomalies in Washington", "Washington"),
+    ("anomalies in New York City", "New York City"),
+    ("anomalies in New York", "New York"),
+    ("anomalies nationwide", "United States"),
+    ("worst anomaly for every state", "all"),
+])
+def test_entity(query, entity):
+    assert parse(query)["entity_filter"] == entity
+
+
+def test_aliases_respect_entity_vocabulary():
+    # DC is not offered, so "Washington DC" falls back to the state that is
+    assert parse("anomalies in Washington DC", entities=["Washington", "Texas"])["entity_filter"] == "Washington"
+
+
+def test_dataset_defaults_to_first_offered():
+    assert parse("worst anomaly in Texas")["dataset_id"] == "cdc_mortality"
+    assert parse("worst anomaly for demo hospital")["dataset_id"] == "demo_hospital"
+
+
+@pytest.fixture
+def fresh_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ca, "TRANSLATION_CACHE", str(tmp_path / "translations.json"))
+    monkeypatch.setattr(ca, "_persisted", None)
+    monkeypatch.setattr(ca, "_lru", ca.OrderedDict())
+    monkeypatch.setattr(ca, "_llm_available", lambda: False)
+    return tmp_path / "translations.json"
+
+
+def test_parser_results_are_not_persisted(fresh_cache):
+    result = ca.translate_query("unexpected spike in Texas", DATASETS)
+    assert result["translation_method"] == "deterministic_parser"
+    assert not fresh_cache.exists()
+
+
+def test_stale_persisted_parse_is_ignored(fresh_cache):
+    query = "unexpected spike in Texas"
+    key = ca._cache_key(query, [d["id"] for d in DATASETS])
+    stale = {**parse(query), "analysis_type": "both"}
+    fresh_cache.write_text(json.dumps({key: stale}))
+    assert ca.translate_query(query, DATASETS)["analysis_type"] == "anomaly"
+
+
+def test_cache_is_keyed_on_entities(fresh_cache):
+    query = "anomalies in Springfield this year"
+    assert ca.translate_query(query, DATASETS)["entity_filter"] == "default"
+    assert ca.translate_query(query, DATASETS, ["Springfield"])["entity_filter"] == "Springfield"
@@ -0,0 +1,15 @@
+import json
+
+import glossary
+
+
+def write(path, term):
+    path.write_text(json.dumps({"terms": [{"term": term, "definition": f"{term} defined."}]}))
+    return str(path)
+
+
+def test_each_path_keeps_its_own_index(tmp_path):
+    first, second = write(tmp_path / "a.json", "Z-score"), write(tmp_path / "b.json", "Baseline")
+    assert [e.term for e in glossary.load_glossary(first).entries] == ["Z-score"]
+    assert [e.term for e in glossary.load_glossary(second).entries] == ["Baseline"]
+    assert glossary.load_glossary(first) is glossary.load_glossary(first)
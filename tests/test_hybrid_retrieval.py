@@ -0,0 +1,16 @@
+import hybrid_retrieval
+import vector_database
+
+
+def test_retriever_is_shared_across_index_handles(tmp_path):
+    path = str(tmp_path / "vectors")
+    first = vector_database.init_vector_db(path)
+    vector_database.add_texts_to_db(first, ["weekly deaths rose in Ohio"], ids=["a"])
+    retriever = hybrid_retrieval.get_retriever(first)
+    assert retriever.search("Ohio", k=1)[0]["id"] == "a"
+
+    second = vector_database.init_vector_db(path)
+    assert hybrid_retrieval.get_retriever(second) is retriever
+    vector_database.add_texts_to_db(second, ["hospital admissions fell in Texas"], ids=["b"])
+    assert vector_database.query_vector_db(vector_database.init_vector_db(path), "Texas", top_n=1) \
+        == ["hospital admissions fell in Texas"]
@@ -0,0 +1,206 @@
+"""Ingest-side behaviour on synthetic archives: vintages, as-of audits, period rollups."""
+import contextlib
+import io
+import json
+import time
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import duckdb
+import pytest
+
+import analysis
+import database_init
+import metric_store
+import period_rollups
+import precedent_index
+import synthetic_data
+
+ENTITY = synthetic_data.entity_names(1)[0]
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Fresh working directory: archives and caches are created relative to cwd."""
+    monkeypatch.chdir(tmp_path)
+    rows, _ = synthetic_data.generate(entities=4, weeks=120, seed=11)
+    return rows
+
+
+def ingest(rows):
+    cfg = synthetic_data.synthetic_config(synthetic_data.write(rows, "synthetic.csv"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        database_init.initialize_osis_db(replace(cfg))
+    return replace(cfg, entity_filter=ENTITY)
+
+
+def audit(cfg, as_of=None):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        packet = analysis.run_logic_audit(cfg, export_json=False, as_of=as_of)
+    assert packet["status"] == "success", packet
+    return packet["payload"]
+
+
+def revise(rows, cfg, weeks=3, factor=1.5, entity=ENTITY):
+    """Copy of rows with the entity's last `weeks` values scaled, as a late-reporting revision would."""
+    mine = [i for i, r in enumerate(rows) if r[cfg.entity_col] == entity]
+    out = [dict(r) for r in rows]
+    for i in mine[-weeks:]:
+        out[i][cfg.value_col] = int(out[i][cfg.value_col] * factor)
+    return out
+
+
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def test_unchanged_reingest_writes_no_vintage(workspace):
+    cfg = ingest(workspace)
+    con = duckdb.connect(database_init.DB_NAME, read_only=True)
+    n = con.execute(f"SELECT COUNT(*) FROM {metric_store.VINTAGES}").fetchone()[0]
+    con.close()
+    ingest(workspace)
+    con = duckdb.connect(database_init.DB_NAME, read_only=True)
+    try:
+        assert con.execute(f"SELECT COUNT(*) FROM {metric_store.VINTAGES}").fetchone()[0] == n
+    finally:
+        con.close()
+
+
+def test_as_of_audit_reproduces_earlier_vintage(workspace):
+    cfg = ingest(workspace)
+    first = audit(cfg)
+    time.sleep(0.05)
+    cutoff = utc_now()
+    time.sleep(0.05)
+    ingest(revise(workspace, cfg))
+
+    current = audit(cfg)
+    assert current["observed_value"] != first["observed_value"]
+    assert audit(cfg, as_of=cutoff) == first
+
+    con = duckdb.connect(database_init.DB_NAME, read_only=True)
+    try:
+        revised = metric_store.revisions(con, cfg.domain, cfg.metric_name, ENTITY)
+    finally:
+        con.close()
+    assert len(revised) == 3
+
+
+def test_vanished_period_is_tombstoned(workspace):
+    cfg = ingest(workspace)
+    first = audit(cfg)
+    time.sleep(0.05)
+    cutoff = utc_now()
+    time.sleep(0.05)
+    last_week = max(r[cfg.date_col] for r in workspace)
+    ingest([r for r in workspace if not (r[cfg.entity_col] == ENTITY and r[cfg.date_col] == last_week)])
+
+    assert audit(cfg)["timestamp"] < first["timestamp"]
+    assert audit(cfg, as_of=cutoff) == first
+
+
+def _rollups(con):
+    return con.execute(f"SELECT * FROM {period_rollups.TABLE} ORDER BY ALL").fetchall()
+
+
+def test_incremental_period_rollups_match_full_rebuild(workspace):
+    cfg = ingest(workspace)
+    mid = sorted({r[cfg.date_col] for r in workspace})[60]
+    changed = revise(workspace, cfg, weeks=2)
+    for r in changed:
+        if r[cfg.entity_col] == synthetic_data.entity_names(2)[1] and r[cfg.date_col] == mid:
+            r[cfg.value_col] *= 3
+    ingest(changed)
+
+    con = duckdb.connect(database_init.DB_NAME)
+    try:
+        incremental = _rollups(con)
+        assert period_rollups.build_period_rollups(con, cfg) == 0   # nothing left to refresh
+        con.execute(f"DELETE FROM {period_rollups.TABLE}")
+        period_rollups.build_period_rollups(con, cfg)
+        assert _rollups(con) == incremental
+    finally:
+        con.close()
+
+
+def test_period_rollups_agree_with_weekly_rows(workspace):
+    cfg = ingest(workspace)
+    con = duckdb.connect(database_init.DB_NAME, read_only=True)
+    try:
+        yearly = period_rollups.query_periods(con, cfg, "year")
+        weekly = con.execute("""
+            SELECT date_trunc('year', time_period)::DATE, COUNT(*), SUM(metric_value)
+            FROM canonical_metrics WHERE domain = ? AND metric_name = ? AND state = ?
+            GROUP BY ALL ORDER BY 1
+        """, [cfg.domain, cfg.metric_name, ENTITY]).fetchall()
+    finally:
+        con.close()
+    assert [(r.period_start.date(), r.n_obs, r.sum_value) for r in yearly.itertuples()] == weekly
+
+
+def test_duplicate_source_rows_keep_the_largest_value(workspace):
+    cfg = ingest(workspace)
+    first = next(r for r in workspace if r[cfg.entity_col] == ENTITY)
+    dup = {**first, cfg.value_col: first[cfg.value_col] + 1000}
+    for rows in ([dup] + workspace, workspace + [dup]):   # order of the duplicates must not matter
+        ingest(rows)
+        con = duckdb.connect(database_init.DB_NAME, read_only=True)
+        try:
+            value = con.execute("SELECT metric_value FROM canonical_metrics WHERE state = ? AND time_period = ?",
+                                [ENTITY, first[cfg.date_col]]).fetchone()[0]
+        finally:
+            con.close()
+        assert value == dup[cfg.value_col]
+
+
+def _scan_rows(profile, table):
+    if profile.get("extra_info", {}).get("Table", "").endswith(table):
+        return profile["operator_rows_scanned"]
+    return sum(_scan_rows(c, table) for c in profile.get("children", []))
+
+
+def test_as_of_read_prunes_other_entities(tmp_path):
+    """Key-ordered vintages let zone maps skip other entities' row groups."""
+    con = duckdb.connect(str(tmp_path / "zones.db"))
+    for bump in (0, 1):
+        metric_store.write_metric(con, f"""
+            SELECT 'd' AS domain, 'm' AS metric_name, DATE '2010-01-02' + INTERVAL (w * 7) DAY AS time_period,
+                   (e * 1000 + w + CASE WHEN w > 515 THEN {bump} ELSE 0 END)::DOUBLE AS metric_value,
+                   'E' || lpad(e::VARCHAR, 4, '0') AS state, 's' AS source_table
+            FROM range(600) a(e), range(520) b(w)""", "d", "m")
+    total = con.execute(f"SELECT COUNT(*) FROM {metric_store.VINTAGES}").fetchone()[0]
+    rel, extra = metric_store.series_sql(utc_now())
+    profile = tmp_path / "profile.json"
+    con.execute("PRAGMA enable_profiling = 'json'")
+    con.execute(f"PRAGMA profiling_output = '{profile}'")
+    (n,), = con.execute(f"SELECT COUNT(*) FROM {rel}", ["d", "m", "E0300", *extra]).fetchall()
+    con.execute("PRAGMA disable_profiling")
+    con.close()
+    assert n == 520
+    assert _scan_rows(json.loads(profile.read_text()), metric_store.VINTAGES) < total / 2
+
+
+def test_precedent_version_moves_with_revisions(workspace):
+    assert precedent_index.index_version("d", "m") is None          # no archive yet
+    cfg = ingest(workspace)
+    before = precedent_index.index_version(cfg.domain, cfg.metric_name)
+    assert before is not None and before[0] > 0
+    ingest(workspace)
+    assert precedent_index.index_version(cfg.domain, cfg.metric_name) == before
+    ingest(revise(workspace, cfg))
+    assert precedent_index.index_version(cfg.domain, cfg.metric_name) != before
+
+
+def test_fetch_frame_labels_arrive_as_categoricals(workspace):
+    ingest(workspace)
+    con = duckdb.connect(database_init.DB_NAME, read_only=True)
+    try:
+        df = metric_store.fetch_frame(con, "SELECT state, metric_value FROM canonical_metrics WHERE state = ?",
+                                      [ENTITY])
+        computed = metric_store.fetch_frame(con, "SELECT 'elsewhere' AS state")   # not in entity_dim
+    finally:
+        con.close()
+    assert df["state"].cat.categories.tolist() == [ENTITY] and not df["state"].cat.ordered
+    assert df["metric_value"].dtype == "float64"
+    assert computed["state"].cat.categories.tolist() == ["elsewhere"]
@@ -0,0 +1,20 @@
+import time
+
+import llm_scheduler
+
+
+def test_expired_before_dispatch_does_not_feed_latency_estimate():
+    sched = llm_scheduler.LLMScheduler()
+    try:
+        t = sched.submit(lambda timeout: "late", deadline_s=0, fallback=lambda: "fallback")
+        assert t.result(timeout=2) == "fallback" and t.status == "expired"
+        assert sched.est_s is None
+
+        t = sched.submit(lambda timeout: time.sleep(0.05) or "ok", deadline_s=5)
+        assert t.result(timeout=2) == "ok"
+        deadline = time.monotonic() + 2     # est_s is updated just after the ticket resolves
+        while sched.est_s is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sched.est_s >= 0.05
+    finally:
+        sched.stop()
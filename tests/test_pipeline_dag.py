@@ -0,0 +1,68 @@
+import contextlib
+import io
+import threading
+
+import pytest
+
+from pipeline_dag import ABORT, CONTINUE, Stage, run_dag
+
+
+def run(stages):
+    with contextlib.redirect_stderr(io.StringIO()):   # failed stages print their traceback
+        return run_dag(stages, max_workers=2)
+
+
+def boom(_):
+    raise RuntimeError("stage failed")
+
+
+def test_results_flow_to_dependents():
+    report = run([Stage("a", lambda r: 2), Stage("b", lambda r: r["a"] * 3, deps=("a",))])
+    assert report.ok and report.results == {"a": 2, "b": 6}
+
+
+def test_abort_cancels_unstarted_work_but_lets_siblings_finish():
+    release = threading.Event()
+
+    def slow(_):
+        release.wait(5)
+        return "done"
+
+    def failing(_):
+        try:
+            raise RuntimeError("stage failed")
+        finally:
+            release.set()
+
+    report = run([Stage("ingest", lambda r: 1),
+                  Stage("fail", failing, deps=("ingest",), on_failure=ABORT),
+                  Stage("sibling", slow, deps=("ingest",)),
+                  Stage("later", lambda r: 1, deps=("sibling",))])
+    assert report.aborted
+    assert report.status == {"ingest": "ok", "fail": "failed", "sibling": "ok", "later": "cancelled"}
+
+
+def test_continue_skips_only_dependents():
+    report = run([Stage("logic", lambda r: 1),
+                  Stage("forecast", boom, deps=("logic",), on_failure=CONTINUE),
+                  Stage("chanakya", lambda r: 1, deps=("forecast",)),
+                  Stage("brief", lambda r: r["logic"] + 1, deps=("logic",))])
+    assert not report.aborted
+    assert report.status == {"logic": "ok", "forecast": "failed", "chanakya": "skipped", "brief": "ok"}
+    assert "stage failed" in report.errors["forecast"]
+
+
+def test_check_failure_counts_as_failed():
+    report = run([Stage("forecast", lambda r: {"status": "skipped"}, on_failure=CONTINUE,
+                        check=lambda res: res["status"] == "success")])
+    assert report.status["forecast"] == "failed"
+
+
+@pytest.mark.parametrize("stages", [
+    [Stage("a", lambda r: 1, deps=("missing",))],
+    [Stage("a", lambda r: 1, deps=("b",)), Stage("b", lambda r: 1, deps=("a",))],
+    [Stage("a", lambda r: 1), Stage("a", lambda r: 2)],
+])
+def test_invalid_graphs_are_rejected(stages):
+    with pytest.raises(ValueError):
+        run_dag(stages)
@@ -0,0 +1,56 @@
+import json
+
+import stage_cache
+
+
+def test_miss_then_hit_restores_outputs(tmp_path):
+    out = tmp_path / "logic_output.json"
+    calls = []
+
+    def stage():
+        calls.append(1)
+        out.write_text(json.dumps({"z": 1.5}))
+        return {"status": "success"}
+
+    key = stage_cache.fingerprint("logic", "data-v1")
+    cache = str(tmp_path / "cache")
+    assert stage_cache.run_cached("logic", key, stage, outputs=[str(out)], cache_dir=cache) == ({"status": "success"}, False)
+    out.unlink()
+    assert stage_cache.run_cached("logic", key, stage, outputs=[str(out)], cache_dir=cache) == ({"status": "success"}, True)
+    assert len(calls) == 1
+    assert json.loads(out.read_text()) == {"z": 1.5}
+
+
+def test_changed_key_or_force_recomputes(tmp_path):
+    cache = str(tmp_path / "cache")
+    calls = []
+    fn = lambda: calls.append(1) or {"status": "success"}
+    stage_cache.run_cached("logic", stage_cache.fingerprint("logic", "v1"), fn, cache_dir=cache)
+    assert stage_cache.run_cached("logic", stage_cache.fingerprint("logic", "v2"), fn, cache_dir=cache)[1] is False
+    assert stage_cache.run_cached("logic", stage_cache.fingerprint("logic", "v2"), fn, cache_dir=cache,
+                                  force=True)[1] is False
+    assert len(calls) == 3
+
+
+def test_uncacheable_results_are_not_stored(tmp_path):
+    cache = str(tmp_path / "cache")
+    key = stage_cache.fingerprint("forecast", "v1")
+    skipped = lambda: {"status": "skipped"}
+    ok = lambda r: r["status"] == "success"
+    stage_cache.run_cached("forecast", key, skipped, cacheable=ok, cache_dir=cache)
+    assert stage_cache.run_cached("forecast", key, skipped, cacheable=ok, cache_dir=cache)[1] is False
+
+
+def test_eviction_keeps_most_recent(tmp_path):
+    cache = str(tmp_path / "cache")
+    for i in range(5):
+        stage_cache.run_cached("s", stage_cache.fingerprint(i), lambda: i, cache_dir=cache)
+    assert stage_cache.evict(cache, max_entries=2) == 3
+    assert stage_cache.run_cached("s", stage_cache.fingerprint(4), lambda: None, cache_dir=cache) == (4, True)
+
+
+def test_code_version_covers_imported_local_modules():
+    assert {"analysis", "metric_store"} <= stage_cache._local_closure(["analysis"])
+    assert {"prompt_builder", "llm_scheduler", "narration_firewall", "precedent_index"} \
+        <= stage_cache._local_closure(["chanakya_agent"])
+    assert stage_cache.code_version("analysis") != stage_cache.code_version("forecast_agent")
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+import summarization
+
+PAYLOAD = {"domain": "public_health", "state": "Texas", "timestamp": "2024-01-06T00:00:00",
+           "observed_value": 1234.0, "metric_name": "weekly_deaths",
+           "analysis": {"z_score": -3.1, "total_critical_in_history": 4, "total_anomalies_in_history": 9},
+           "baseline_stats": {"rolling_mean": 5000.2, "window_periods": 4}}
+
+
+def test_brief_renders_fields():
+    brief = summarization.deterministic_brief(PAYLOAD)
+    assert brief.startswith("For the week ending 2024-01-06, Texas recorded 1,234 all-cause deaths, "
+                            "which is 3.10 standard deviations below the 4-week rolling mean of 5,000.")
+    assert "4 prior CRITICAL events across 9 total anomalies" in brief
+
+
+def test_unknown_domain_uses_default_templates():
+    brief = summarization.deterministic_brief({**PAYLOAD, "domain": "retail"})
+    assert "1,234 weekly deaths" in brief
+
+
+@pytest.mark.parametrize("sentences", [("Value {valu:,}.",), ("Value {value:,.2q}.",)])
+def test_bad_templates_fail_when_checked(sentences):
+    with pytest.raises(ValueError):
+        summarization._checked_template("test", sentences)
+
+
+def test_templates_are_not_evaluated():
+    with pytest.raises((KeyError, ValueError)):
+        summarization._checked_template("test", ("{__import__('os')}",))
+
+
+def test_commentary_cache_follows_other_writers(tmp_path, monkeypatch):
+    path = tmp_path / "commentary.json"
+    monkeypatch.setattr(summarization, "COMMENTARY_CACHE", str(path))
+    monkeypatch.setattr(summarization, "_commentary", None)
+    question = summarization.REGIME_QUESTIONS["normal"]
+    assert summarization.cached_commentary(question) is None
+
+    # another process fills the cache after this one has loaded it
+    key = summarization._commentary_key(question)
+    path.write_text(json.dumps({key: {"sentence": "Surveillance is useful.", "passed": True}}))
+    assert summarization.cached_commentary(question)["sentence"] == "Surveillance is useful."
@@ -0,0 +1,200 @@
+"""
+OSIS – Tracing Layer (v1.0)
+============================
+Nested spans for pipeline stage → DuckDB query → LLM call → model fit.
+
+Each span records wall time, CPU time of the thread that ran it, rows in/out
+and payload bytes. Spans nest through a contextvar, so a DuckDB query inside
+a stage is recorded as that stage's child — including across the DAG's
+thread pool (the executor submits with a copied context) and across worker
+processes (pipeline_dag.in_process ships child spans back with the result).
+
+Spans are always collected — the cost is two clock reads per span. Opt-in
+profiling (main.py --profile) additionally captures a per-stage profile and
+writes the span tree as a collapsed-stack flamegraph file.
+
+Usage:
+    with span("zscore_query", kind="duckdb", rows_in=n) as s:
+        df = con.execute(...).df()
+        s.rows_out = len(df)
+"""
+
+import contextvars
+import itertools
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+PROFILE_DIR = "profiles"
+
+_current = contextvars.ContextVar("osis_span", default=None)
+_lock = threading.Lock()
+_spans: list = []
+_ids = itertools.count(1)
+_run_id = uuid.uuid4().hex[:12]
+
+
+@dataclass
+class Span:
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    kind: str
+    started_at: str
+    wall_ms: float = 0.0
+    cpu_ms: float = 0.0
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    payload_bytes: Optional[int] = None
+    error: Optional[str] = None
+    attrs: dict = field(default_factory=dict)
+
+
+def reset() -> str:
+    """Start a new trace. Returns the run id spans will be logged under."""
+    global _run_id
+    with _lock:
+        _spans.clear()
+        _run_id = uuid.uuid4().hex[:12]
+    return _run_id
+
+
+def run_id() -> str:
+    return _run_id
+
+
+def spans() -> list:
+    with _lock:
+        return list(_spans)
+
+
+def current_span_id() -> Optional[str]:
+    s = _current.get()
+    return s.span_id if s else None
+
+
+@contextmanager
+def span(name: str, kind: str = "block", rows_in=None, rows_out=None,
+         payload_bytes=None, parent_id=None, **attrs):
+    parent = _current.get()
+    s = Span(
+        span_id=f"{os.getpid()}-{next(_ids)}",
+        parent_id=parent_id or (parent.span_id if parent else None),
+        name=name, kind=kind,
+        started_at=datetime.now(timezone.utc).isoformat(),
+        rows_in=rows_in, rows_out=rows_out, payload_bytes=payload_bytes, attrs=attrs,
+    )
+    token = _current.set(s)
+    w0, c0 = time.perf_counter(), time.thread_time()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {str(e)[:120]}"
+        raise
+    finally:
+        s.wall_ms = round((time.perf_counter() - w0) * 1000, 3)
+        s.cpu_ms  = round((time.thread_time() - c0) * 1000, 3)
+        _current.reset(token)
+        with _lock:
+            _spans.append(s)
+
+
+def adopt(child_spans: list) -> None:
+    """Merge spans recorded in another process (see pipeline_dag.in_process)."""
+    with _lock:
+        _spans.extend(Span(**d) if isinstance(d, dict) else d for d in child_spans)
+
+
+def export_spans() -> list:
+    return [asdict(s) for s in spans()]
+
+
+# ── Flamegraph export ─────────────────────────────────────────────────────────
+def to_collapsed(span_list=None) -> list:
+    """
+    Collapsed-stack lines ("root;child;leaf <self_us>") for flamegraph.pl,
+    speedscope or inferno. Self time = wall minus children (clamped at zero,
+    since concurrent children can overlap their parent).
+    """
+    span_list = span_list if span_list is not None else spans()
+    by_id = {s.span_id: s for s in span_list}
+    child_ms = {}
+    for s in span_list:
+        if s.parent_id in by_id:
+            child_ms[s.parent_id] = child_ms.get(s.parent_id, 0.0) + s.wall_ms
+
+    def path(s):
+        parts = []
+        while s is not None:
+            parts.append(f"{s.kind}:{s.name}".replace(";", ","))
+            s = by_id.get(s.parent_id)
+        return ";".join(reversed(parts))
+
+    lines = []
+    for s in span_list:
+        self_us = int(max(s.wall_ms - child_ms.get(s.span_id, 0.0), 0.0) * 1000)
+        if self_us:
+            lines.append(f"{path(s)} {self_us}")
+    return lines
+
+
+def write_collapsed(path: str, span_list=None) -> str:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text("\n".join(to_collapsed(span_list)) + "\n")
+    return path
+
+
+def summary(span_list=None, top: int = 10) -> list:
+    """Slowest spans first — for the end-of-run printout."""
+    span_list = span_list if span_list is not None else spans()
+    return sorted(span_list, key=lambda s: s.wall_ms, reverse=True)[:top]
+
+
+# ── Opt-in profiling ──────────────────────────────────────────────────────────
+@contextmanager
+def profiled(name: str, out_dir: Optional[str]):
+    """
+    Profile the enclosed block when out_dir is set. Uses pyinstrument (speedscope
+    JSON) when installed, otherwise cProfile (.prof, open with snakeviz or pstats).
+    Both profile the calling thread only, which is one stage under the DAG.
+    """
+    if not out_dir:
+        yield None
+        return
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    try:
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import SpeedscopeRenderer
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(async_mode="disabled")
+        profiler.start()
+        try:
+            yield profiler
+        finally:
+            profiler.stop()
+            out = Path(out_dir) / f"{name}.speedscope.json"
+            out.write_text(profiler.output(renderer=SpeedscopeRenderer()))
+        return
+
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # another profiler already active (Python 3.12+ allows one at a time)
+        yield None
+        return
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(Path(out_dir) / f"{name}.prof"))
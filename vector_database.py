@@ -1,15 +1,35 @@
 # vector_database.py
 # Handle CDC data embeddings and store/query vectors.
+#
+# backend="local" (default) is the offline local_vectors index — hashed TF-IDF
+# or a local CPU embedding model, no network. backend="chroma" keeps the
+# original OpenAI + Chroma path for connected deployments.
+#
+# Local queries go through hybrid_retrieval (BM25 fused with vector scores,
+# cached until the index changes) unless hybrid=False.
 
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings
+from local_vectors import LocalVectorIndex
 
-def init_vector_db(persist_dir="chroma_db"):
-    return Chroma(persist_directory=persist_dir, embedding_function=OpenAIEmbeddings())
+LOCAL_DIR  = "vector_store"
+CHROMA_DIR = "chroma_db"
 
-def add_texts_to_db(vector_db, texts, ids=None):
-    vector_db.add_texts(texts=texts, ids=ids)
+def init_vector_db(persist_dir=None, backend="local", embedder=None):
+    if backend == "chroma":
+        from langchain_community.vectorstores import Chroma
+        from langchain_openai import OpenAIEmbeddings
+        return Chroma(persist_directory=persist_dir or CHROMA_DIR, embedding_function=OpenAIEmbeddings())
+    return LocalVectorIndex(persist_dir or LOCAL_DIR, embedder=embedder)
 
-def query_vector_db(vector_db, query_text, top_n=3):
+def add_texts_to_db(vector_db, texts, ids=None, metadatas=None):
+    if isinstance(vector_db, LocalVectorIndex):
+        return vector_db.add_texts(texts, ids=ids, metadatas=metadatas)
+    vector_db.add_texts(texts=texts, ids=ids, metadatas=metadatas)
+
+def query_vector_db(vector_db, query_text, top_n=3, hybrid=True):
+    if isinstance(vector_db, LocalVectorIndex):
+        if hybrid:
+            from hybrid_retrieval import get_retriever
+            return [r["text"] for r in get_retriever(vector_db).search(query_text, k=top_n)]
+        return [r["text"] for r in vector_db.search(query_text, k=top_n)]
     results = vector_db.similarity_search(query_text, k=top_n)
     return [r.page_content for r in results]